@@ -0,0 +1,59 @@
+"""
+Alembic environment for the app's database (``DATABASE_URL``).
+
+Migrations run on the app's sync engine. ``app.db.session.create_tables``
+runs them on startup by passing its own connection in
+``config.attributes["connection"]``.
+"""
+
+from logging.config import fileConfig
+from alembic import context
+from app.db.base import Base, engine
+from app.models import Role, User, user_roles
+from app.models.session import Session
+
+config = context.config
+
+# Only the alembic CLI configures logging; the app has its own
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+# Models register their tables on Base.metadata when imported
+_ = Role, User, user_roles, Session
+target_metadata = Base.metadata
+
+
+def _configure(**options):
+    # Batch mode recreates tables where ALTER TABLE is limited (SQLite)
+    context.configure(target_metadata=target_metadata, render_as_batch=True, **options)
+
+
+def run_migrations_offline():
+    """Emit the migration SQL instead of running it (``alembic upgrade --sql``)."""
+    _configure(
+        url=engine.url.render_as_string(hide_password=False),
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    with engine.connect() as connection:
+        _configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
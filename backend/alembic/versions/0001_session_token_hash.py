@@ -0,0 +1,98 @@
+"""Store session token digests instead of raw tokens
+
+Replaces ``sessions.token`` (the raw cookie value) with ``token_hash``, its
+SHA-256 digest, and adds the session lookup indexes. Existing sessions stay
+valid: their digests are computed from the stored tokens.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from app.models.session import TokenHash
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rows updated per executemany while backfilling
+BATCH_SIZE = 1000
+
+sessions = sa.table(
+    "sessions",
+    sa.column("id", sa.Integer),
+    sa.column("token", sa.String),
+    sa.column("token_hash", TokenHash),
+    sa.column("is_active", sa.Boolean),
+)
+
+
+def _update_in_batches(values, rows):
+    """Run ``UPDATE sessions SET ... WHERE id = :row_id`` for each row."""
+    statement = (
+        sessions.update().where(sessions.c.id == sa.bindparam("row_id")).values(values)
+    )
+    for start in range(0, len(rows), BATCH_SIZE):
+        op.get_bind().execute(statement, rows[start : start + BATCH_SIZE])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("sessions", sa.Column("token_hash", TokenHash, nullable=True))
+
+    rows = op.get_bind().execute(sa.select(sessions.c.id, sessions.c.token)).all()
+    _update_in_batches(
+        {"token_hash": sa.bindparam("digest")},
+        [
+            {"row_id": row.id, "digest": hashlib.sha256(row.token.encode()).digest()}
+            for row in rows
+        ],
+    )
+
+    with op.batch_alter_table("sessions") as batch_op:
+        batch_op.alter_column("token_hash", existing_type=TokenHash, nullable=False)
+        batch_op.drop_column("token")
+        batch_op.create_index("ix_sessions_token_hash", ["token_hash"], unique=True)
+        batch_op.create_index(
+            "ix_sessions_user_id_active",
+            ["user_id", "expires_at"],
+            postgresql_where=sa.text("is_active"),
+            sqlite_where=sa.text("is_active = 1"),
+        )
+        batch_op.create_index(
+            "ix_sessions_expires_at_active",
+            ["expires_at"],
+            postgresql_where=sa.text("is_active"),
+            sqlite_where=sa.text("is_active = 1"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema.
+
+    Raw tokens cannot be recovered from their digests, so every session is
+    revoked; the digests only fill the restored (unique) token column.
+    """
+    op.add_column("sessions", sa.Column("token", sa.String, nullable=True))
+
+    rows = op.get_bind().execute(sa.select(sessions.c.id, sessions.c.token_hash)).all()
+    _update_in_batches(
+        {"token": sa.bindparam("placeholder"), "is_active": False},
+        [{"row_id": row.id, "placeholder": row.token_hash.hex()} for row in rows],
+    )
+
+    with op.batch_alter_table("sessions") as batch_op:
+        batch_op.drop_index("ix_sessions_expires_at_active")
+        batch_op.drop_index("ix_sessions_user_id_active")
+        batch_op.drop_index("ix_sessions_token_hash")
+        batch_op.drop_column("token_hash")
+        batch_op.alter_column("token", existing_type=sa.String, nullable=False)
+        batch_op.create_unique_constraint("uq_sessions_token", ["token"])
@@ -5,9 +5,14 @@ API dependencies for authentication and authorization with RBAC.
 from typing import List
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.base import AsyncSessionLocal
+from app.db.session import get_async_db
+from app.core.config import settings
 from app.core.security import verify_token
+from app.core.timing import timed
+from app.core.revocation import is_token_revoked
+from app.core.principal import Principal, cache_principal, get_cached_principal
 from app.services.user_service import UserService
 from app.models.user import User
 from app.models.role import RoleType
@@ -20,7 +25,7 @@ active_refresh_tokens = set()
 
 
 async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
 ) -> User:
     """Get the current authenticated user."""
     credentials_exception = HTTPException(
@@ -40,13 +45,52 @@ async def get_current_user(
         raise credentials_exception
 
     # Get user from database
-    user = UserService.get_by_id(db, user_id=int(user_id))
+    user = await UserService.get_by_id_async(db, user_id=int(user_id))
     if user is None:
         raise credentials_exception
 
     return user
 
 
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    """Get a snapshot of the current user for authorization checks.
+
+    In claims-trusted mode the snapshot comes from the token itself (after a
+    revocation check). Otherwise it is cached per user, and the database is
+    only hit on a miss.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    payload = verify_token(token, token_type="access")
+    if payload is None:
+        raise credentials_exception
+
+    user_id = payload.get("sub")
+    if user_id is None:
+        raise credentials_exception
+
+    if settings.auth_trust_token_claims:
+        if is_token_revoked(payload):
+            raise credentials_exception
+        return Principal.from_claims(payload)
+
+    principal = get_cached_principal(int(user_id))
+    if principal is None:
+        with timed("user"):
+            async with AsyncSessionLocal() as db:
+                user = await UserService.get_by_id_async(db, user_id=int(user_id))
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+        cache_principal(principal)
+
+    return principal
+
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
@@ -58,9 +102,20 @@ async def get_current_active_user(
     return current_user
 
 
+async def get_current_active_principal(
+    principal: Principal = Depends(get_current_principal),
+) -> Principal:
+    """Get the current active principal (no database access when cached)."""
+    if not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user"
+        )
+    return principal
+
+
 async def get_current_admin_user(
-    current_user: User = Depends(get_current_active_user),
-) -> User:
+    current_user: Principal = Depends(get_current_active_principal),
+) -> Principal:
     """Get the current admin user (backward compatibility)."""
     is_admin = getattr(current_user, "is_admin", False)
     if not is_admin and not current_user.has_role(RoleType.ADMIN):
@@ -75,8 +130,8 @@ def require_roles(required_roles: List[str]):
     """Dependency factory for role-based access control."""
 
     async def role_checker(
-        current_user: User = Depends(get_current_active_user),
-    ) -> User:
+        current_user: Principal = Depends(get_current_active_principal),
+    ) -> Principal:
         user_roles = current_user.get_role_names()
 
         # Check if user has any of the required roles
@@ -5,14 +5,22 @@ Authentication endpoints.
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
 from app.core.config import settings
 from app.schemas.user import Token, LoginRequest, RefreshTokenRequest, UserCreate, User
 from app.services.user_service import UserService
 from app.services.session_service import SessionService
 from app.core.security import create_tokens, verify_token
-from app.api.deps import get_current_active_user, active_refresh_tokens
+from app.api.deps import (
+    get_current_active_principal,
+    get_current_active_user,
+    get_token_payload,
+    active_refresh_tokens,
+)
+from app.core.principal import Principal
+from app.core.revocation import revoke_session_tokens
 from app.core.custom_rate_limiting import rate_limit, CustomRateLimits
 from app.core.monitoring import logger
 
@@ -21,13 +29,15 @@ router = APIRouter()
 
 @router.post("/register", response_model=User, status_code=status.HTTP_201_CREATED)
 @rate_limit(CustomRateLimits.AUTH_REGISTER)
-def register(
-    request: Request, user_create: UserCreate, db: Session = Depends(get_db)
+async def register(
+    request: Request,
+    user_create: UserCreate,
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
     """Register a new user."""
     try:
         logger.info("User registration attempt", email=user_create.email)
-        user = UserService.create(db, user_create)
+        user = await UserService.create_async(db, user_create)
         logger.info("User registered successfully", user_id=user.id, email=user.email)
         return user
     except ValueError as e:
@@ -39,15 +49,17 @@ def register(
 
 @router.post("/login", response_model=Token)
 @rate_limit(CustomRateLimits.AUTH_LOGIN)
-def login_json(
+async def login_json(
     request: Request,
     login_request: LoginRequest,
     response: Response,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
     """Login with JSON payload."""
     logger.info("Login attempt", email=login_request.email)
-    user = UserService.authenticate(db, login_request.email, login_request.password)
+    user = await UserService.authenticate_async(
+        db, login_request.email, login_request.password
+    )
     if not user:
         logger.warning("Login failed - invalid credentials", email=login_request.email)
         raise HTTPException(
@@ -57,13 +69,18 @@ def login_json(
         )
 
     tokens = create_tokens(
-        getattr(user, "id"), getattr(user, "email"), user.get_role_names()
+        getattr(user, "id"),
+        getattr(user, "email"),
+        user.get_role_names(),
+        is_active=bool(user.is_active),
     )
     active_refresh_tokens.add(tokens["refresh_token"])
     # Create session and set cookie
     user_agent = request.headers.get("user-agent", "")
     ip_address = request.client.host if request.client else ""
-    session_obj = SessionService.create_session(db, user, user_agent, ip_address)
+    session_obj = await SessionService.create_session_async(
+        db, user, user_agent, ip_address
+    )
     response.set_cookie(
         key="session_token",
         value=getattr(session_obj, "token"),
@@ -79,15 +96,17 @@ def login_json(
 
 @router.post("/login-form", response_model=Token)
 @rate_limit(CustomRateLimits.AUTH_LOGIN)
-def login_form(
+async def login_form(
     request: Request,
     response: Response,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
     """Login with form data (OAuth2 compatible)."""
     logger.info("Form login attempt", username=form_data.username)
-    user = UserService.authenticate(db, form_data.username, form_data.password)
+    user = await UserService.authenticate_async(
+        db, form_data.username, form_data.password
+    )
     if not user:
         logger.warning(
             "Form login failed - invalid credentials", username=form_data.username
@@ -99,13 +118,18 @@ def login_form(
         )
 
     tokens = create_tokens(
-        getattr(user, "id"), getattr(user, "email"), user.get_role_names()
+        getattr(user, "id"),
+        getattr(user, "email"),
+        user.get_role_names(),
+        is_active=bool(user.is_active),
     )
     active_refresh_tokens.add(tokens["refresh_token"])
     # Create session and set cookie
     user_agent = request.headers.get("user-agent", "")
     ip_address = request.client.host if request.client else ""
-    session_obj = SessionService.create_session(db, user, user_agent, ip_address)
+    session_obj = await SessionService.create_session_async(
+        db, user, user_agent, ip_address
+    )
     response.set_cookie(
         key="session_token",
         value=getattr(session_obj, "token"),
@@ -165,7 +189,10 @@ def refresh_token(
     # Remove old refresh token and create new tokens
     active_refresh_tokens.discard(refresh_request.refresh_token)
     tokens = create_tokens(
-        getattr(user, "id"), getattr(user, "email"), user.get_role_names()
+        getattr(user, "id"),
+        getattr(user, "email"),
+        user.get_role_names(),
+        is_active=bool(user.is_active),
     )
     active_refresh_tokens.add(tokens["refresh_token"])
 
@@ -178,13 +205,19 @@ def refresh_token(
 def logout(
     request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_principal),
+    token_payload: dict = Depends(get_token_payload),
 ) -> Any:
     """Logout user and invalidate session."""
     session_token = request.cookies.get("session_token")
     if session_token:
         SessionService.delete_session_by_token(db, session_token)
 
+    # Claims-trusted authorization never reloads the user, so the access
+    # token itself has to be rejected until it expires
+    if token_payload.get("session_id"):
+        revoke_session_tokens(token_payload["session_id"], token_payload["exp"])
+
     logger.info("User logged out", user_id=current_user.id, email=current_user.email)
     response = Response(
         content='{"message": "Successfully logged out"}', media_type="application/json"
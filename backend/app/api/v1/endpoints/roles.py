@@ -9,7 +9,8 @@ from app.db.session import get_db
 from app.schemas.user import Role, UserRoleUpdate, User
 from app.services.role_service import RoleService
 from app.services.user_service import UserService
-from app.api.deps import require_admin, get_current_active_user
+from app.api.deps import require_admin, get_current_active_principal
+from app.core.principal import Principal
 from app.core.custom_rate_limiting import rate_limit, CustomRateLimits
 from app.core.monitoring import logger
 from app.models.role import RoleType
@@ -22,7 +23,7 @@ router = APIRouter()
 def get_all_roles(
     request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_principal)
 ) -> Any:
     """Get all available roles."""
     roles = RoleService.get_all_roles(db)
@@ -35,7 +36,7 @@ def assign_user_roles(
     request: Request,
     role_update: UserRoleUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin())
+    current_user: Principal = Depends(require_admin())
 ) -> Any:
     """Assign roles to a user (admin only)."""
     try:
@@ -74,7 +75,7 @@ def get_user_roles(
     request: Request,
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_principal)
 ) -> Any:
     """Get roles for a specific user."""
     # Users can view their own roles, admins can view any user's roles
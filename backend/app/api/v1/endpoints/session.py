@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
-from sqlalchemy.orm import Session as DBSession
-from app.db.session import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_db
 from app.services.session_service import SessionService
 from app.schemas.session import SessionOut
-from app.models.session import Session as SessionModel
-from app.api.deps import get_current_active_user
+from app.api.deps import get_current_active_principal
+from app.core.monitoring import logger
+from app.core.security import hash_session_token
 
 router = APIRouter()
 
@@ -12,32 +13,28 @@ router = APIRouter()
 @router.get("/", response_model=list[SessionOut])
 async def list_sessions(
     request: Request,
-    db: DBSession = Depends(get_db),
-    current_user=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_active_principal),
 ):
     """List active sessions for the current user."""
     current_session_token = request.cookies.get("session_token")
 
-    # Debug logging
-    print(f"DEBUG: User {current_user.id} requesting sessions")
-    print(f"DEBUG: Session cookie present: {bool(current_session_token)}")
-    print(f"DEBUG: All cookies: {dict(request.cookies)}")
-    if current_session_token:
-        print(f"DEBUG: Session token preview: {current_session_token[:16]}...")
+    logger.debug(
+        "Listing sessions",
+        user_id=current_user.id,
+        session_cookie=bool(current_session_token),
+    )
 
-    sessions = SessionService.get_sessions(db, current_user.id, current_session_token)
+    sessions = await SessionService.get_sessions_async(
+        db, current_user.id, current_session_token
+    )
 
-    print(f"DEBUG: Found {len(sessions)} sessions")
-    for i, session in enumerate(sessions):
-        is_current = getattr(session, "is_current", False)
-        token_preview = (
-            getattr(session, "token", "")[:16] + "..."
-            if getattr(session, "token", "")
-            else "No token"
-        )
-        print(
-            f"DEBUG: Session {i+1}: ID={session.id}, Current={is_current}, Token={token_preview}"
-        )
+    logger.debug(
+        "Sessions listed",
+        user_id=current_user.id,
+        count=len(sessions),
+        current=[s.id for s in sessions if getattr(s, "is_current", False)],
+    )
 
     return sessions
 
@@ -47,26 +44,27 @@ async def delete_session(
     session_id: int,
     request: Request,
     response: Response,
-    db: DBSession = Depends(get_db),
-    current_user=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_active_principal),
 ):
     """Delete a session (logout from device)."""
     current_session_token = request.cookies.get("session_token")
 
     # Check if user is trying to delete their current session
-    session_to_delete = (
-        db.query(SessionModel)
-        .filter(SessionModel.id == session_id, SessionModel.user_id == current_user.id)
-        .first()
+    session_to_delete = await SessionService.get_session_async(
+        db, session_id, current_user.id
     )
 
     is_current_session = (
         session_to_delete
-        and getattr(session_to_delete, "token") == current_session_token
+        and current_session_token
+        and session_to_delete.token_hash == hash_session_token(current_session_token)
     )
 
     # Delete the session
-    success = SessionService.delete_session(db, session_id, current_user.id)
+    success = await SessionService.delete_session_async(
+        db, session_id, current_user.id
+    )
     if not success:
         raise HTTPException(status_code=404, detail="Session not found")
 
@@ -85,28 +83,29 @@ async def delete_session(
 @router.delete("/")
 async def delete_all_other_sessions(
     request: Request,
-    db: DBSession = Depends(get_db),
-    current_user=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_active_principal),
 ):
     """Delete all sessions except the current one (logout from all other devices)."""
     current_session_token = request.cookies.get("session_token")
 
-    print(f"DEBUG: Deleting other sessions for user {current_user.id}")
-    print(f"DEBUG: Session cookie present: {bool(current_session_token)}")
-    if current_session_token:
-        print(f"DEBUG: Current session token: {current_session_token[:16]}...")
+    logger.debug(
+        "Deleting other sessions",
+        user_id=current_user.id,
+        session_cookie=bool(current_session_token),
+    )
 
     if current_session_token:
         # If we have a session cookie, exclude the current session
-        print("DEBUG: Using exclude current session logic")
-        deleted_count = SessionService.delete_all_sessions_except_current(
+        deleted_count = await SessionService.delete_all_sessions_except_current_async(
             db, current_user.id, current_session_token
         )
     else:
         # If no session cookie, just delete all sessions for this user
         # This happens when user is authenticated via JWT only
-        print("DEBUG: Using delete all sessions logic (no session cookie)")
-        deleted_count = SessionService.delete_all_user_sessions(db, current_user.id)
+        deleted_count = await SessionService.delete_all_user_sessions_async(
+            db, current_user.id
+        )
 
-    print(f"DEBUG: Deleted {deleted_count} sessions")
+    logger.debug("Other sessions deleted", user_id=current_user.id, count=deleted_count)
     return {"success": True, "deleted_count": deleted_count}
@@ -4,14 +4,20 @@ User management endpoints.
 
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import os
 import uuid
 from pathlib import Path
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
 from app.schemas.user import User, UserUpdate, PasswordChangeRequest
 from app.services.user_service import UserService
-from app.api.deps import get_current_active_user, get_current_admin_user
+from app.api.deps import (
+    get_current_active_principal,
+    get_current_active_user,
+    get_current_admin_user,
+)
+from app.core.principal import Principal
 from app.core.custom_rate_limiting import rate_limit, CustomRateLimits
 from app.core.monitoring import logger
 
@@ -33,7 +39,7 @@ def get_current_user_profile(
 def update_current_user_profile(
     request: Request,
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_principal),
     db: Session = Depends(get_db),
 ) -> Any:
     """Update current user profile."""
@@ -60,11 +66,11 @@ def update_current_user_profile(
 
 @router.post("/me/change-password")
 @rate_limit(CustomRateLimits.API_GENERAL)
-def change_password(
+async def change_password(
     request: Request,
     password_change: PasswordChangeRequest,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
     """Change current user's password."""
     try:
@@ -73,7 +79,7 @@ def change_password(
             user_id=current_user.id,
             email=current_user.email,
         )
-        success = UserService.change_password(
+        success = await UserService.change_password_async(
             db,
             current_user.id,
             password_change.current_password,
@@ -104,7 +110,7 @@ def change_password(
 def upload_avatar(
     request: Request,
     avatar: UploadFile = File(...),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_principal),
     db: Session = Depends(get_db),
 ) -> Any:
     """Upload user avatar."""
@@ -203,7 +209,7 @@ def get_all_users(
     request: Request,
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_admin_user),
+    current_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db),
 ) -> Any:
     """Get all users (admin only)."""
@@ -220,7 +226,7 @@ def get_all_users(
 @router.get("/{user_id}", response_model=User)
 def get_user_by_id(
     user_id: int,
-    current_user: User = Depends(get_current_admin_user),
+    current_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db),
 ) -> Any:
     """Get user by ID (admin only)."""
@@ -236,7 +242,7 @@ def get_user_by_id(
 def update_user(
     user_id: int,
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_admin_user),
+    current_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db),
 ) -> Any:
     """Update user by ID (admin only)."""
@@ -291,7 +297,7 @@ def update_user(
 @router.delete("/{user_id}")
 def delete_user(
     user_id: int,
-    current_user: User = Depends(get_current_admin_user),
+    current_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db),
 ) -> Any:
     """Delete user by ID (admin only)."""
@@ -0,0 +1,150 @@
+"""
+Cross-worker invalidation of per-process caches over Redis pub/sub.
+
+Session validations, principals and access-token revocations are kept per
+process for speed. Changes made by one worker are published on a Redis
+channel, and one subscription per worker applies them to its own state:
+handlers registered with ``on`` get each message's decoded JSON payload.
+
+Messages published while a worker is not subscribed are lost, so handlers
+may also register a ``resync`` callback, run whenever the subscription is
+(re)established, to drop or reload state that may be stale. Without Redis
+every worker only sees its own changes.
+"""
+
+import asyncio
+import inspect
+import json
+from typing import Any, Callable, Optional
+from anyio import from_thread
+from app.core.monitoring import logger
+from app.core.redis_client import get_redis
+
+RESUBSCRIBE_DELAY_SECONDS = 5
+
+
+class InvalidationBroadcast:
+    """One pub/sub subscription per process, dispatching to channel handlers."""
+
+    def __init__(self):
+        self._handlers: dict[str, Callable[[Any], None]] = {}
+        self._resync: list[Callable] = []
+        self.subscribed = False
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Fire-and-forget Redis writes, referenced until done
+        self._pending: set[asyncio.Task] = set()
+
+    def on(
+        self,
+        channel: str,
+        handler: Callable[[Any], None],
+        resync: Optional[Callable] = None,
+    ):
+        """Apply messages of ``channel`` with ``handler``.
+
+        ``resync`` (sync or async) runs on every (re)subscription. Register
+        before ``start``.
+        """
+        self._handlers[channel] = handler
+        if resync is not None:
+            self._resync.append(resync)
+
+    def run_soon(self, func: Callable, *args):
+        """Run a best-effort Redis coroutine function from sync or async code.
+
+        On the event loop it is scheduled as a task; from a worker thread of
+        the loop (sync endpoints) it runs there; elsewhere (scripts) it is
+        skipped.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            try:
+                from_thread.run(func, *args)
+            except RuntimeError:
+                pass
+            return
+        task = loop.create_task(func(*args))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def publish(self, channel: str, payload: Any):
+        """Publish a message to every worker, this one included (best effort)."""
+        try:
+            await get_redis().publish(channel, json.dumps(payload))
+        except Exception:
+            pass  # Redis is optional
+
+    def start(self):
+        """Start applying messages published by any worker."""
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        """Stop listening; call before the Redis client is closed.
+
+        The listener is signalled rather than cancelled: cancelling a pub/sub
+        read can be swallowed by redis-py's read timeout, leaving the task
+        running and hanging shutdown.
+        """
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+    async def _run_resync(self):
+        for resync in self._resync:
+            result = resync()
+            if inspect.isawaitable(result):
+                await result
+
+    def _dispatch(self, message: dict):
+        channel = message["channel"]
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        handler = self._handlers.get(channel)
+        if handler is None:
+            return
+        try:
+            handler(json.loads(message["data"]))
+        except Exception as e:
+            logger.warning(
+                "Invalid invalidation message", channel=channel, error=str(e)
+            )
+
+    async def listen(self):
+        """Apply published messages until stopped; resubscribe on errors."""
+        while not self._stopping.is_set():
+            try:
+                async with get_redis().pubsub() as pubsub:
+                    await pubsub.subscribe(*self._handlers)
+                    # Messages published while unsubscribed were missed
+                    await self._run_resync()
+                    self.subscribed = True
+                    logger.info(
+                        "Subscribed to invalidations", channels=list(self._handlers)
+                    )
+                    while not self._stopping.is_set():
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=1.0
+                        )
+                        if message is not None and message["type"] == "message":
+                            self._dispatch(message)
+                self.subscribed = False
+                return
+            except Exception as e:
+                if self.subscribed:
+                    self.subscribed = False
+                    logger.warning("Invalidation subscription lost", error=str(e))
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), timeout=RESUBSCRIBE_DELAY_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+
+
+# Global invalidation broadcast
+invalidation_broadcast = InvalidationBroadcast()
@@ -23,6 +23,47 @@ class Settings(BaseSettings):
     )
     refresh_token_expire_days: int = Field(default=7, alias="REFRESH_TOKEN_EXPIRE_DAYS")
 
+    # Authenticated principal cache (per process)
+    principal_cache_ttl_seconds: int = Field(
+        default=60, alias="PRINCIPAL_CACHE_TTL_SECONDS"
+    )
+    principal_cache_max_size: int = Field(
+        default=10_000, alias="PRINCIPAL_CACHE_MAX_SIZE"
+    )
+
+    # Claims-trusted authorization: authorize from verified access-token claims
+    # without loading the user; access tokens then use the shorter lifetime
+    auth_trust_token_claims: bool = Field(
+        default=False, alias="AUTH_TRUST_TOKEN_CLAIMS"
+    )
+    claims_access_token_expire_minutes: int = Field(
+        default=5, alias="CLAIMS_ACCESS_TOKEN_EXPIRE_MINUTES"
+    )
+
+    # Session validation cache (per process, in front of Redis and the DB);
+    # revocations reach other workers via Redis pub/sub, else within the TTL
+    session_cache_ttl_seconds: int = Field(
+        default=30, alias="SESSION_CACHE_TTL_SECONDS"
+    )
+    session_cache_negative_ttl_seconds: int = Field(
+        default=300, alias="SESSION_CACHE_NEGATIVE_TTL_SECONDS"
+    )
+    session_cache_max_size: int = Field(
+        default=10_000, alias="SESSION_CACHE_MAX_SIZE"
+    )
+
+    # Verified access/refresh token cache (per process)
+    jwt_verify_cache_max_size: int = Field(
+        default=10_000, alias="JWT_VERIFY_CACHE_MAX_SIZE"
+    )
+
+    @property
+    def access_token_lifetime_minutes(self) -> int:
+        """Lifetime of newly issued access tokens for the active auth mode."""
+        if self.auth_trust_token_claims:
+            return self.claims_access_token_expire_minutes
+        return self.access_token_expire_minutes
+
     @property
     def secret_key(self) -> str:
         """Get secret key (backward compatibility)."""
@@ -31,6 +72,13 @@ class Settings(BaseSettings):
     # Database
     database_url: str = Field(default="sqlite:///./data/auth.db", alias="DATABASE_URL")
 
+    # Database connection pool (applies to both the sync and async engines)
+    db_pool_size: int = Field(default=5, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=10, alias="DB_MAX_OVERFLOW")
+    db_pool_timeout: int = Field(default=30, alias="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(default=1800, alias="DB_POOL_RECYCLE")
+    db_pool_pre_ping: bool = Field(default=True, alias="DB_POOL_PRE_PING")
+
     # CORS - Include Expo development ports and Android emulator
     backend_cors_origins: List[str] = Field(
         default_factory=lambda: [
@@ -65,8 +113,47 @@ class Settings(BaseSettings):
     createmin: bool = Field(
         default=False, alias="CREATEMIN"
     )  # If True, create admin user on startup
+
+    # Password hashing policy. With a target time set, the cost is calibrated
+    # at startup; 0 uses the configured rounds / time cost as is
+    password_hash_scheme: str = Field(default="bcrypt", alias="PASSWORD_HASH_SCHEME")
+    password_hash_target_ms: int = Field(default=250, alias="PASSWORD_HASH_TARGET_MS")
+    password_hash_bcrypt_rounds: int = Field(
+        default=12, alias="PASSWORD_HASH_BCRYPT_ROUNDS"
+    )
+    password_hash_argon2_time_cost: int = Field(
+        default=3, alias="PASSWORD_HASH_ARGON2_TIME_COST"
+    )
+    password_hash_argon2_memory_kib: int = Field(
+        default=65536, alias="PASSWORD_HASH_ARGON2_MEMORY_KIB"
+    )
+    password_hash_argon2_parallelism: int = Field(
+        default=2, alias="PASSWORD_HASH_ARGON2_PARALLELISM"
+    )
+
+    # Password hashing worker pool; requests beyond workers + queue get a 503
+    password_hash_workers: int = Field(default=4, alias="PASSWORD_HASH_WORKERS")
+    password_hash_max_queue: int = Field(
+        default=32, alias="PASSWORD_HASH_MAX_QUEUE"
+    )
+    password_hash_retry_after_seconds: int = Field(
+        default=1, alias="PASSWORD_HASH_RETRY_AFTER_SECONDS"
+    )
+
     # Redis configuration
     redis_url: str = Field(default="redis://localhost:6379", alias="REDIS_URL")
+    # Shared session cache client (app.core.redis_client): pool size, wait for
+    # a free connection, socket timeouts and idle connection health checks
+    redis_max_connections: int = Field(default=50, alias="REDIS_MAX_CONNECTIONS")
+    redis_pool_timeout_seconds: float = Field(
+        default=1.0, alias="REDIS_POOL_TIMEOUT_SECONDS"
+    )
+    redis_socket_timeout_seconds: float = Field(
+        default=1.0, alias="REDIS_SOCKET_TIMEOUT_SECONDS"
+    )
+    redis_health_check_interval_seconds: int = Field(
+        default=30, alias="REDIS_HEALTH_CHECK_INTERVAL_SECONDS"
+    )
 
     # SSL/Security Configuration
     secure_cookies: bool = Field(default=False, alias="SECURE_COOKIES")
@@ -74,6 +161,13 @@ class Settings(BaseSettings):
 
     # Rate Limiting Configuration
     default_rate_limit: str = Field(default="1000 per hour", alias="DEFAULT_RATE_LIMIT")
+    # Limiter algorithm: "gcra" or "token_bucket"
+    rate_limit_algorithm: str = Field(default="gcra", alias="RATE_LIMIT_ALGORITHM")
+    # Limiter storage: "memory" (per process) or "redis" (shared via REDIS_URL)
+    rate_limit_storage: str = Field(default="memory", alias="RATE_LIMIT_STORAGE")
+    # In-memory storage: lock-sharded partitions and total key cap (LRU evicted)
+    rate_limit_shards: int = Field(default=16, alias="RATE_LIMIT_SHARDS")
+    rate_limit_max_keys: int = Field(default=100_000, alias="RATE_LIMIT_MAX_KEYS")
 
     # Authentication Rate Limits
     auth_login_rate_limit: str = Field(
@@ -99,12 +193,76 @@ class Settings(BaseSettings):
         default="50 per minute", alias="ADMIN_OPERATIONS_RATE_LIMIT"
     )
 
+    # Structured logging: JSON lines on stdout. LOG_ASYNC hands events to a
+    # writer thread through a bounded queue (full queue: events are dropped
+    # and counted); LOG_JSON_SERIALIZER "auto" uses orjson when installed
+    log_level: str = Field(default="INFO", alias="LOG_LEVEL")
+    log_async: bool = Field(default=True, alias="LOG_ASYNC")
+    log_queue_size: int = Field(default=10000, alias="LOG_QUEUE_SIZE")
+    log_batch_size: int = Field(default=256, alias="LOG_BATCH_SIZE")
+    log_json_serializer: str = Field(default="auto", alias="LOG_JSON_SERIALIZER")
+
+    # Access log sampling: 4xx/5xx and requests slower than ACCESS_LOG_SLOW_MS
+    # are always logged, others with the route's rate from
+    # ACCESS_LOG_ROUTE_SAMPLE_RATES ("GET /status=0.01,/api/v1/users/=0.1")
+    # or ACCESS_LOG_SAMPLE_RATE. Up to ACCESS_LOG_BUFFER_SIZE debug/info events
+    # per request are held back and only written if the request is logged
+    access_log_sample_rate: float = Field(default=1.0, alias="ACCESS_LOG_SAMPLE_RATE")
+    access_log_route_sample_rates: str = Field(
+        default="", alias="ACCESS_LOG_ROUTE_SAMPLE_RATES"
+    )
+    access_log_slow_ms: int = Field(default=1000, alias="ACCESS_LOG_SLOW_MS")
+    access_log_buffer_size: int = Field(default=50, alias="ACCESS_LOG_BUFFER_SIZE")
+
+    # Per-request phase timings (jwt, user, db, hash, redis, serialize) are
+    # always collected into the metrics; this enables the Server-Timing header,
+    # which only carries the jwt, serialize and total timings
+    server_timing_header: bool = Field(default=False, alias="SERVER_TIMING_HEADER")
+
+    # Query inspection: requests running more than DB_QUERY_BUDGET statements,
+    # or one statement shape more than DB_REPEATED_QUERY_THRESHOLD times (N+1),
+    # are counted and logged (0 disables a check). DB_REPEATED_QUERY_RAISE
+    # raises on the repeated statement instead; meant for development and tests
+    db_query_budget: int = Field(default=20, alias="DB_QUERY_BUDGET")
+    db_repeated_query_threshold: int = Field(
+        default=10, alias="DB_REPEATED_QUERY_THRESHOLD"
+    )
+    db_repeated_query_raise: bool = Field(
+        default=False, alias="DB_REPEATED_QUERY_RAISE"
+    )
+
     # Monitoring Rate Limits
     health_check_rate_limit: str = Field(
         default="60 per minute", alias="HEALTH_CHECK_RATE_LIMIT"
     )
     metrics_rate_limit: str = Field(default="10 per minute", alias="METRICS_RATE_LIMIT")
 
+    # /health serves a report refreshed in the background at this interval;
+    # database checks (there and in /readyz) give up after the timeout
+    health_sample_interval_seconds: float = Field(
+        default=5.0, alias="HEALTH_SAMPLE_INTERVAL_SECONDS"
+    )
+    health_db_timeout_seconds: float = Field(
+        default=2.0, alias="HEALTH_DB_TIMEOUT_SECONDS"
+    )
+
+    # Distinct "METHOD /route" labels kept in metrics; the rest share "other"
+    metrics_max_endpoints: int = Field(default=200, alias="METRICS_MAX_ENDPOINTS")
+
+    # Prometheus/OpenMetrics scraping: /metrics/openmetrics on the app port
+    # needs this bearer token; METRICS_PORT > 0 also serves /metrics on a
+    # separate listener (token still required there if set)
+    metrics_scrape_token: str = Field(default="", alias="METRICS_SCRAPE_TOKEN")
+    metrics_host: str = Field(default="127.0.0.1", alias="METRICS_HOST")
+    metrics_port: int = Field(default=0, alias="METRICS_PORT")
+
+    # Aggregate metrics across worker processes through per-worker mmap files
+    # in this directory (empty: each worker reports only its own metrics)
+    metrics_multiproc_dir: str = Field(default="", alias="METRICS_MULTIPROC_DIR")
+    metrics_multiproc_flush_seconds: float = Field(
+        default=1.0, alias="METRICS_MULTIPROC_FLUSH_SECONDS"
+    )
+
     @field_validator("backend_cors_origins", mode="before")
     @classmethod
     def assemble_cors_origins(cls, v: Union[str, List[str]]) -> Union[List[str], str]:
@@ -4,10 +4,17 @@ Custom rate limiting implementation without SlowAPI dependency.
 
 import time
 import asyncio
-from typing import Dict, Optional, Callable
-from collections import defaultdict, deque
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional, Callable
 from fastapi import Request, HTTPException
-from functools import wraps
+from fastapi.exception_handlers import http_exception_handler
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.core.route_utils import iter_routes
+from app.core.timing import timed
+from functools import lru_cache, partial, wraps
 import logging
 
 logger = logging.getLogger(__name__)
@@ -42,54 +49,416 @@ def get_rate_limits():
         }
 
 
-class RateLimiter:
-    """Custom rate limiter with in-memory storage."""
+class RateLimitAlgorithm:
+    """Base class for rate limiting algorithms.
+
+    Algorithms are pure functions over a small, constant-size per-key state, so
+    a check never grows with the number of requests in the window.
+    """
+
+    name = ""
+
+    def check(
+        self, state: Any, now: float, limit: int, window_seconds: int
+    ) -> tuple[bool, float, Any]:
+        """Return (allowed, retry_after, new_state) for one request."""
+        raise NotImplementedError
+
+    def expires_at(self, state: Any, limit: int, window_seconds: int) -> float:
+        """Return the time after which the state equals that of a fresh key."""
+        raise NotImplementedError
+
+
+class GCRAAlgorithm(RateLimitAlgorithm):
+    """Generic Cell Rate Algorithm; state is the theoretical arrival time (TAT).
+
+    Allows bursts of up to ``limit`` requests, then one request every
+    ``window_seconds / limit`` seconds.
+    """
+
+    name = "gcra"
+
+    # KEYS: one per limit; ARGV: limit, window pairs. Returns one retry_after
+    # per key ("0" when allowed); state is only written if every key allows.
+    lua_script = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local results = {}
+local new_tats = {}
+local all_allowed = true
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[2 * i - 1])
+    local window = tonumber(ARGV[2 * i])
+    local tat = tonumber(redis.call('GET', key))
+    if not tat or tat < now then
+        tat = now
+    end
+    local new_tat = tat + window / limit
+    local allow_at = new_tat - window
+    if now < allow_at then
+        all_allowed = false
+        results[i] = string.format('%.6f', allow_at - now)
+    else
+        results[i] = '0'
+        new_tats[i] = new_tat
+    end
+end
+if all_allowed then
+    for i, key in ipairs(KEYS) do
+        local ttl = math.max(1, math.ceil((new_tats[i] - now) * 1000))
+        redis.call('SET', key, string.format('%.6f', new_tats[i]), 'PX', ttl)
+    end
+end
+return results
+"""
+
+    def check(self, state, now, limit, window_seconds):
+        emission_interval = window_seconds / limit
+        tat = now if state is None else max(state, now)
+        new_tat = tat + emission_interval
+        allow_at = new_tat - window_seconds
+
+        if now < allow_at:
+            return False, allow_at - now, tat
+
+        return True, 0.0, new_tat
+
+    def expires_at(self, state, limit, window_seconds):
+        return state
+
+
+class TokenBucketAlgorithm(RateLimitAlgorithm):
+    """Token bucket holding ``limit`` tokens, refilled at ``limit / window``.
+
+    State is a ``(tokens, updated_at)`` pair.
+    """
+
+    name = "token_bucket"
+
+    # Same calling convention as the GCRA script; state is a hash holding
+    # the remaining tokens and the time they were last updated.
+    lua_script = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local results = {}
+local new_tokens = {}
+local all_allowed = true
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[2 * i - 1])
+    local window = tonumber(ARGV[2 * i])
+    local rate = limit / window
+    local state = redis.call('HMGET', key, 'tokens', 'updated_at')
+    local tokens = limit
+    if state[1] then
+        tokens = math.min(limit, tonumber(state[1]) + (now - tonumber(state[2])) * rate)
+    end
+    if tokens < 1 then
+        all_allowed = false
+        results[i] = string.format('%.6f', (1 - tokens) / rate)
+    else
+        results[i] = '0'
+        new_tokens[i] = tokens - 1
+    end
+end
+if all_allowed then
+    for i, key in ipairs(KEYS) do
+        local limit = tonumber(ARGV[2 * i - 1])
+        local window = tonumber(ARGV[2 * i])
+        local ttl = math.max(1, math.ceil((limit - new_tokens[i]) * window / limit * 1000))
+        redis.call('HSET', key, 'tokens', string.format('%.6f', new_tokens[i]),
+            'updated_at', string.format('%.6f', now))
+        redis.call('PEXPIRE', key, ttl)
+    end
+end
+return results
+"""
+
+    def check(self, state, now, limit, window_seconds):
+        refill_rate = limit / window_seconds
+        if state is None:
+            tokens = float(limit)
+        else:
+            tokens, updated_at = state
+            tokens = min(float(limit), tokens + (now - updated_at) * refill_rate)
+
+        if tokens < 1:
+            return False, (1 - tokens) / refill_rate, (tokens, now)
+
+        return True, 0.0, (tokens - 1, now)
+
+    def expires_at(self, state, limit, window_seconds):
+        tokens, updated_at = state
+        return updated_at + (limit - tokens) * window_seconds / limit
+
+
+RATE_LIMIT_ALGORITHMS: Dict[str, type[RateLimitAlgorithm]] = {
+    GCRAAlgorithm.name: GCRAAlgorithm,
+    TokenBucketAlgorithm.name: TokenBucketAlgorithm,
+}
+
+
+def get_rate_limit_algorithm(name: Optional[str] = None) -> RateLimitAlgorithm:
+    """Get a rate limiting algorithm by name, defaulting to the configured one."""
+    if name is None:
+        name = settings.rate_limit_algorithm
+
+    try:
+        return RATE_LIMIT_ALGORITHMS[name.lower()]()
+    except KeyError:
+        raise ValueError(f"Unknown rate limit algorithm: {name}")
+
+
+class _RateLimitShard:
+    """One partition of the in-memory store, in least-recently-used order."""
+
+    __slots__ = ("lock", "entries")
 
     def __init__(self):
-        self.requests: Dict[str, deque] = defaultdict(deque)
-        self.lock = asyncio.Lock()
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, tuple[Any, float]]" = OrderedDict()
+
+
+class MemoryRateLimitStorage:
+    """In-process rate limit state, hash-sharded into independently locked
+    partitions.
+
+    Each key holds one ``(state, expires_at)`` entry whose size is independent
+    of the limit. Shards are kept in LRU order and capped at
+    ``max_keys // shards`` entries; expired entries are dropped from the LRU end
+    opportunistically on write and by ``cleanup``, which does so in small
+    batches so no lock is held for longer than one batch.
+    """
+
+    # Expired entries dropped from the LRU end of a shard on each write
+    expire_on_write = 2
+
+    def __init__(
+        self,
+        algorithm: RateLimitAlgorithm,
+        shards: int = 16,
+        max_keys: int = 100_000,
+        sweep_batch_size: int = 500,
+    ):
+        self.algorithm = algorithm
+        self.shards = [_RateLimitShard() for _ in range(shards)]
+        self.max_keys_per_shard = max(1, max_keys // shards)
+        self.sweep_batch_size = sweep_batch_size
+
+    def _shard_index(self, key: str) -> int:
+        return hash(key) % len(self.shards)
+
+    def __len__(self) -> int:
+        return sum(len(shard.entries) for shard in self.shards)
+
+    async def check(
+        self, checks: list[tuple[str, int, int]]
+    ) -> list[tuple[bool, float]]:
+        """Check several limits at once; state is only consumed if all allow."""
+        # Lock every shard involved, in index order so callers can't deadlock
+        shard_indexes = sorted({self._shard_index(key) for key, _, _ in checks})
+        locks = [self.shards[index].lock for index in shard_indexes]
+        for lock in locks:
+            lock.acquire()
+        try:
+            return self._check_locked(checks)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _check_locked(
+        self, checks: list[tuple[str, int, int]]
+    ) -> list[tuple[bool, float]]:
+        now = time.time()
+        results = []
+        new_entries = []
+
+        for key, limit, window_seconds in checks:
+            shard = self.shards[self._shard_index(key)]
+            entry = shard.entries.get(key)
+            state = entry[0] if entry is not None else None
+            allowed, retry_after, state = self.algorithm.check(
+                state, now, limit, window_seconds
+            )
+            results.append((allowed, max(0, retry_after)))
+            new_entries.append(
+                (
+                    shard,
+                    key,
+                    state,
+                    self.algorithm.expires_at(state, limit, window_seconds),
+                )
+            )
+
+        if all(allowed for allowed, _ in results):
+            for shard, key, state, expires_at in new_entries:
+                shard.entries[key] = (state, expires_at)
+                shard.entries.move_to_end(key)
+                self._trim(shard, now)
+
+        return results
+
+    @staticmethod
+    def _expire_oldest(shard: _RateLimitShard, now: float, limit: int) -> int:
+        """Drop up to ``limit`` expired entries from the LRU end (lock held).
+
+        Stops at the first live entry; returns how many were dropped.
+        """
+        entries = shard.entries
+        dropped = 0
+        while dropped < limit and entries:
+            oldest_key = next(iter(entries))
+            if entries[oldest_key][1] > now:
+                break
+            del entries[oldest_key]
+            dropped += 1
+        return dropped
+
+    def _trim(self, shard: _RateLimitShard, now: float):
+        """Drop a few expired entries, then evict LRU entries over the cap."""
+        self._expire_oldest(shard, now, self.expire_on_write)
+
+        entries = shard.entries
+        while len(entries) > self.max_keys_per_shard:
+            entries.popitem(last=False)
+
+    async def cleanup(self):
+        """Drop expired entries from the LRU end of each shard, in batches.
+
+        Each batch holds only its shard's lock for at most
+        ``sweep_batch_size`` entries, and control returns to the event loop
+        between batches, so a sweep never stalls concurrent checks for longer
+        than one batch. Entries expire in roughly LRU order; an expired entry
+        behind a live one (with a longer window) waits until that one expires
+        too, and the per-shard key cap bounds memory meanwhile.
+        """
+        for shard in self.shards:
+            while True:
+                with shard.lock:
+                    dropped = self._expire_oldest(
+                        shard, time.time(), self.sweep_batch_size
+                    )
+                await asyncio.sleep(0)
+                if dropped < self.sweep_batch_size:
+                    break
+
+
+class RedisRateLimitStorage:
+    """Redis-backed rate limit state shared by every worker.
+
+    All limits for a request are checked and consumed atomically by one
+    server-side script call. On connection failure the limiter degrades to the
+    in-memory storage and retries Redis after ``retry_interval`` seconds.
+    """
+
+    key_prefix = "ratelimit"
+
+    def __init__(
+        self,
+        algorithm: RateLimitAlgorithm,
+        client=None,
+        retry_interval: float = 30.0,
+    ):
+        self.algorithm = algorithm
+        # Defaults to the process-wide client (and its connection pool)
+        self.client = client
+        self.retry_interval = retry_interval
+        self.fallback = create_memory_rate_limit_storage(algorithm)
+        self._script = None
+        self._unavailable_until = 0.0
+
+    def _get_client(self):
+        return self.client if self.client is not None else get_redis()
+
+    def _get_script(self):
+        if self._script is None:
+            self._script = self._get_client().register_script(self.algorithm.lua_script)
+        return self._script
+
+    async def check(
+        self, checks: list[tuple[str, int, int]]
+    ) -> list[tuple[bool, float]]:
+        """Check several limits at once; state is only consumed if all allow."""
+        if time.monotonic() < self._unavailable_until:
+            return await self.fallback.check(checks)
+
+        prefix = f"{self.key_prefix}:{self.algorithm.name}"
+        keys = [f"{prefix}:{key}" for key, _, _ in checks]
+        args = []
+        for _, limit, window_seconds in checks:
+            args.extend((limit, window_seconds))
+
+        try:
+            with timed("redis"):
+                # The shared client is recreated after a shutdown, so pass
+                # the current one rather than the one the script was bound to
+                retry_afters = await self._get_script()(
+                    keys=keys, args=args, client=self._get_client()
+                )
+        except Exception as e:
+            logger.warning(
+                f"Redis unavailable for rate limiting, using in-memory storage: {e}"
+            )
+            self._unavailable_until = time.monotonic() + self.retry_interval
+            return await self.fallback.check(checks)
+
+        results = []
+        for retry_after in retry_afters:
+            retry_after = float(retry_after)
+            results.append((retry_after == 0, retry_after))
+        return results
+
+    async def cleanup(self):
+        """Redis expires keys itself; only the fallback needs sweeping."""
+        await self.fallback.cleanup()
+
+
+def create_memory_rate_limit_storage(algorithm: RateLimitAlgorithm):
+    """Create an in-memory storage sized by the configured shards and key cap."""
+    return MemoryRateLimitStorage(
+        algorithm,
+        shards=settings.rate_limit_shards,
+        max_keys=settings.rate_limit_max_keys,
+    )
+
+
+def create_rate_limit_storage(algorithm: RateLimitAlgorithm):
+    """Create the configured rate limit storage backend."""
+    if settings.rate_limit_storage.lower() == "redis":
+        return RedisRateLimitStorage(algorithm)
+    return create_memory_rate_limit_storage(algorithm)
+
+
+class RateLimiter:
+    """Custom rate limiter with pluggable algorithm and storage."""
+
+    def __init__(
+        self, algorithm: Optional[RateLimitAlgorithm] = None, storage=None
+    ):
+        self.algorithm = algorithm or get_rate_limit_algorithm()
+        self.storage = storage or create_rate_limit_storage(self.algorithm)
+        # Rejected requests by which limit rejected them ("global"/"endpoint")
+        self.rejections: Dict[str, int] = defaultdict(int)
 
     async def is_allowed(
         self, key: str, limit: int, window_seconds: int
     ) -> tuple[bool, float]:
         """Check if request is allowed under rate limit."""
-        async with self.lock:
-            now = time.time()
-            window_start = now - window_seconds
-
-            # Clean old requests outside the window
-            request_times = self.requests[key]
-            while request_times and request_times[0] < window_start:
-                request_times.popleft()
-
-            # Check if limit is exceeded
-            if len(request_times) >= limit:
-                # Calculate retry_after based on oldest request in window
-                oldest_request = request_times[0]
-                retry_after = (oldest_request + window_seconds) - now
-                return False, max(0, retry_after)
-
-            # Add current request
-            request_times.append(now)
-            return True, 0
-
-    async def cleanup_old_entries(self):
-        """Cleanup old entries to prevent memory leaks."""
-        async with self.lock:
-            now = time.time()
-            keys_to_remove = []
+        (result,) = await self.storage.check([(key, limit, window_seconds)])
+        return result
 
-            for key, request_times in self.requests.items():
-                # Remove entries older than 1 hour
-                while request_times and request_times[0] < now - 3600:
-                    request_times.popleft()
+    async def check_many(
+        self, checks: list[tuple[str, int, int]]
+    ) -> list[tuple[bool, float]]:
+        """Check several ``(key, limit, window_seconds)`` limits in one call.
 
-                # Remove empty entries
-                if not request_times:
-                    keys_to_remove.append(key)
+        Returns one ``(allowed, retry_after)`` per limit; nothing is consumed
+        unless every limit allows the request.
+        """
+        return await self.storage.check(checks)
 
-            for key in keys_to_remove:
-                del self.requests[key]
+    async def cleanup_old_entries(self):
+        """Cleanup expired entries to prevent memory leaks."""
+        await self.storage.cleanup()
 
 
 # Global rate limiter instance
@@ -151,12 +520,72 @@ def parse_rate_limit(rate_string: str) -> tuple[int, int]:
     return limit, window_seconds
 
 
+# (method, path) pairs whose endpoint limit is remembered; paths include ids
+# and client-chosen values, so the cache is bounded
+ENDPOINT_LIMIT_CACHE_SIZE = 4096
+
+
+def get_endpoint_rate_limits(app) -> list[tuple]:
+    """List ``(path_regex, methods, settings)`` for ``rate_limit``-decorated routes."""
+    endpoint_limits = []
+    for route in iter_routes(getattr(getattr(app, "router", None), "routes", [])):
+        spec = getattr(getattr(route, "endpoint", None), "__rate_limit__", None)
+        if spec is not None:
+            endpoint_limits.append((route.path_regex, route.methods, spec))
+    return endpoint_limits
+
+
+def match_endpoint_rate_limit(
+    endpoint_limits: list[tuple], method: Optional[str], path: str
+) -> Optional[tuple]:
+    """Return the ``rate_limit`` settings of the route a request resolves to."""
+    for path_regex, methods, spec in endpoint_limits:
+        if (not methods or method in methods) and path_regex.match(path):
+            return spec
+    return None
+
+
+def rate_limit_exceeded_error(retry_after: float) -> HTTPException:
+    """Build the 429 error for an exceeded limit.
+
+    Used by both the middleware and the ``rate_limit`` decorator, so clients
+    get the same ``{"detail": {...}}`` body whichever layer rejects them.
+    """
+    retry_after_seconds = int(retry_after) + 1
+    return HTTPException(
+        status_code=429,
+        detail={
+            "error": "Rate limit exceeded",
+            "message": "Too many requests. Please try again later.",
+            "retry_after": retry_after_seconds,
+        },
+        headers={"Retry-After": str(retry_after_seconds)},
+    )
+
+
 class CustomRateLimitMiddleware:
     """Custom rate limiting middleware."""
 
     def __init__(self, app, default_rate: str = "1000 per hour"):
         self.app = app
         self.default_limit, self.default_window = parse_rate_limit(default_rate)
+        # Built from the app's routes on first request, once routers are included
+        self._match_endpoint_limit = None
+
+    def get_endpoint_rate_limit(self, scope) -> Optional[tuple]:
+        """Find the ``rate_limit`` decorator settings of the route for scope.
+
+        Routing hasn't happened yet when limits are checked, so the route
+        table is scanned, once per distinct method and path.
+        """
+        if self._match_endpoint_limit is None:
+            self._match_endpoint_limit = lru_cache(maxsize=ENDPOINT_LIMIT_CACHE_SIZE)(
+                partial(
+                    match_endpoint_rate_limit,
+                    get_endpoint_rate_limits(scope.get("app")),
+                )
+            )
+        return self._match_endpoint_limit(scope.get("method"), scope.get("path", ""))
 
     async def __call__(self, scope, receive, send):
         if scope["type"] != "http":
@@ -165,21 +594,41 @@ class CustomRateLimitMiddleware:
 
         # Skip rate limiting for health checks and static files
         path = scope.get("path", "")
-        if path in ["/health", "/favicon.ico", "/metrics"]:
+        if path in [
+            "/health",
+            "/livez",
+            "/readyz",
+            "/favicon.ico",
+            "/metrics",
+            "/metrics/openmetrics",
+        ]:
             await self.app(scope, receive, send)
             return
 
         # Create request object to get client info
-        from fastapi import Request
-
         request = Request(scope, receive)
 
         identifier = get_user_identifier(request)
-        allowed, retry_after = await rate_limiter.is_allowed(
-            identifier, self.default_limit, self.default_window
-        )
+        checks = [(identifier, self.default_limit, self.default_window)]
+
+        # Check the endpoint's own limit in the same storage call, and tell
+        # the rate_limit decorator it has already been applied
+        endpoint_limit = self.get_endpoint_rate_limit(scope)
+        if endpoint_limit:
+            name, limit, window_seconds, key_func = endpoint_limit
+            endpoint_identifier = key_func(request) if key_func else identifier
+            checks.append((f"{endpoint_identifier}:{name}", limit, window_seconds))
+            request.state.rate_limit_checked = True
+
+        results = await rate_limiter.check_many(checks)
+        allowed = all(result_allowed for result_allowed, _ in results)
+        retry_after = max(result_retry_after for _, result_retry_after in results)
 
         if not allowed:
+            for scope_name, (result_allowed, _) in zip(("global", "endpoint"), results):
+                if not result_allowed:
+                    rate_limiter.rejections[scope_name] += 1
+
             # Log rate limit exceeded
             logger.warning(
                 f"Rate limit exceeded for {identifier} on {path}",
@@ -191,32 +640,12 @@ class CustomRateLimitMiddleware:
                 },
             )
 
-            # Send rate limit exceeded response
-            response = {
-                "error": "Rate limit exceeded",
-                "message": "Too many requests. Please try again later.",
-                "retry_after": int(retry_after) + 1,
-            }
-
-            await send(
-                {
-                    "type": "http.response.start",
-                    "status": 429,
-                    "headers": [
-                        (b"content-type", b"application/json"),
-                        (b"retry-after", str(int(retry_after) + 1).encode()),
-                    ],
-                }
-            )
-
-            import json
-
-            await send(
-                {
-                    "type": "http.response.body",
-                    "body": json.dumps(response).encode(),
-                }
+            # Send rate limit exceeded response, rendered as FastAPI renders
+            # the decorator's exception
+            response = await http_exception_handler(
+                request, rate_limit_exceeded_error(retry_after)
             )
+            await response(scope, receive, send)
             return
 
         await self.app(scope, receive, send)
@@ -240,12 +669,14 @@ def rate_limit(rate_string: str, key_func: Optional[Callable] = None):
                 # Look in kwargs
                 request = kwargs.get("request")
 
-            if request is None:
-                # No request found, skip rate limiting
+            if request is None or getattr(
+                request.state, "rate_limit_checked", False
+            ):
+                # No request found, or already checked by the middleware
                 return (
                     await func(*args, **kwargs)
                     if asyncio.iscoroutinefunction(func)
-                    else func(*args, **kwargs)
+                    else await run_in_threadpool(func, *args, **kwargs)
                 )
 
             # Get identifier
@@ -260,6 +691,7 @@ def rate_limit(rate_string: str, key_func: Optional[Callable] = None):
             )
 
             if not allowed:
+                rate_limiter.rejections["endpoint"] += 1
                 logger.warning(
                     f"Rate limit exceeded for {identifier} on {func.__name__}",
                     extra={
@@ -270,23 +702,17 @@ def rate_limit(rate_string: str, key_func: Optional[Callable] = None):
                     },
                 )
 
-                raise HTTPException(
-                    status_code=429,
-                    detail={
-                        "error": "Rate limit exceeded",
-                        "message": "Too many requests. Please try again later.",
-                        "retry_after": int(retry_after) + 1,
-                    },
-                    headers={"Retry-After": str(int(retry_after) + 1)},
-                )
+                raise rate_limit_exceeded_error(retry_after)
 
-            # Call the function
+            # Call the function; the async wrapper hides sync endpoints from
+            # FastAPI, so run them in the threadpool as it would have
             return (
                 await func(*args, **kwargs)
                 if asyncio.iscoroutinefunction(func)
-                else func(*args, **kwargs)
+                else await run_in_threadpool(func, *args, **kwargs)
             )
 
+        wrapper.__rate_limit__ = (func.__name__, limit, window_seconds, key_func)
         return wrapper
 
     return decorator
@@ -0,0 +1,127 @@
+"""
+Background health sampling and the health probe payloads.
+
+Load balancers and orchestrators poll health endpoints constantly, so nothing
+expensive happens per request: a background task refreshes system usage
+(psutil, off the event loop) and database liveness every
+``HEALTH_SAMPLE_INTERVAL_SECONDS`` and builds the ``/health`` payload, which
+the endpoint then serves as is.
+
+- ``/livez``: the process is up and its event loop responsive; no I/O.
+- ``/readyz``: the database answers now and the sampler is keeping up.
+- ``/health``: the cached detailed report.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+import psutil
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.monitoring import logger, system_stats
+from app.core.multiprocess_metrics import get_metrics_collector
+from app.db.base import async_engine
+
+# A snapshot older than this many intervals means the sampler is stuck
+STALE_AFTER_INTERVALS = 3
+
+
+async def _select_one():
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def check_database(timeout: float) -> Optional[str]:
+    """Run ``SELECT 1``; return ``None`` if it worked, else the error."""
+    try:
+        await asyncio.wait_for(_select_one(), timeout)
+    except asyncio.TimeoutError:
+        return f"no response within {timeout}s"
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def sample_system() -> Dict[str, float]:
+    """Read system usage (blocking; call off the event loop).
+
+    ``cpu_percent`` is the average since the previous call, i.e. over the
+    last sampling interval.
+    """
+    return {
+        "cpu_percent": psutil.cpu_percent(),
+        "memory_percent": psutil.virtual_memory().percent,
+        "disk_percent": psutil.disk_usage("/").percent,
+    }
+
+
+class HealthSampler:
+    """Keeps a recent health report for the probe endpoints."""
+
+    def __init__(self, interval: float, db_timeout: float):
+        self.interval = interval
+        self.db_timeout = db_timeout
+        self.report: Dict[str, Any] = {
+            "status": "starting",
+            "timestamp": datetime.now().isoformat(),
+            "issues": ["Health not sampled yet"],
+        }
+        self.status_code = 503
+        self.database_error: Optional[str] = "not checked yet"
+        self.sampled_at = 0.0
+
+    @property
+    def stale(self) -> bool:
+        return (
+            time.monotonic() - self.sampled_at > STALE_AFTER_INTERVALS * self.interval
+        )
+
+    async def sample(self):
+        """Refresh system usage, database liveness and the health report."""
+        system_stats.update(await asyncio.to_thread(sample_system))
+        self.database_error = await check_database(self.db_timeout)
+
+        collector = await get_metrics_collector()
+        report = collector.get_health_status()
+        if self.database_error is None:
+            report["database"] = "healthy"
+        else:
+            report["database"] = "unhealthy"
+            report["database_error"] = self.database_error
+            if report["status"] == "healthy":
+                report["status"] = "degraded"
+
+        self.report = report
+        # Degraded is still operational
+        self.status_code = 503 if report["status"] == "unhealthy" else 200
+        self.sampled_at = time.monotonic()
+
+    async def run(self):
+        """Sample every ``interval`` seconds."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sample()
+            except Exception as e:
+                logger.error("Health sampling error", error=str(e))
+
+    async def readiness(self) -> tuple[Dict[str, Any], int]:
+        """Check what the app needs to serve traffic, right now."""
+        checks = {}
+        database_error = await check_database(self.db_timeout)
+        checks["database"] = database_error or "ok"
+        checks["health_sampler"] = "stale" if self.stale else "ok"
+
+        ready = database_error is None and not self.stale
+        return (
+            {"status": "ready" if ready else "not ready", "checks": checks},
+            200 if ready else 503,
+        )
+
+
+# Global health sampler
+health_sampler = HealthSampler(
+    interval=settings.health_sample_interval_seconds,
+    db_timeout=settings.health_db_timeout_seconds,
+)
@@ -0,0 +1,228 @@
+"""
+Constant-memory latency histograms.
+
+``LatencyHistogram`` uses log-linear buckets: each power-of-two range of
+durations is split into ``SUB_BUCKETS`` equal buckets, so recording is O(1),
+memory is fixed, and any reported percentile is within ~1/SUB_BUCKETS (about
+6%) of the true value. ``WindowedLatencyHistogram`` keeps one histogram per
+minute for the last 15 minutes next to an all-time one, which gives 1m/5m/15m
+views.
+
+Both serialize to plain dicts (skipping empty leading and trailing buckets) so per-worker
+histograms can be shipped between processes and merged.
+"""
+
+import math
+import time
+from array import array
+from typing import Iterable, Optional
+
+# Durations are in seconds. Resolution floor is 10us; 24 octaves reach ~168s
+MIN_VALUE = 1e-5
+OCTAVES = 24
+SUB_BUCKETS = 16
+# Bucket 0 collects everything below MIN_VALUE; the last one everything above
+BUCKET_COUNT = 1 + OCTAVES * SUB_BUCKETS
+
+PERCENTILES = {"p50": 0.50, "p90": 0.90, "p99": 0.99, "p999": 0.999}
+
+SLOT_SECONDS = 60
+WINDOWS = {"1m": 1, "5m": 5, "15m": 15}  # window name -> minute slots
+
+
+def bucket_index(value: float) -> int:
+    """Return the bucket a duration falls into."""
+    scaled = value / MIN_VALUE
+    if scaled < 1:
+        return 0
+    # scaled == mantissa * 2**exponent with mantissa in [0.5, 1)
+    mantissa, exponent = math.frexp(scaled)
+    index = 1 + (exponent - 1) * SUB_BUCKETS + int((mantissa * 2 - 1) * SUB_BUCKETS)
+    return min(index, BUCKET_COUNT - 1)
+
+
+def bucket_upper_bound(index: int) -> float:
+    """Return the largest duration a bucket can hold."""
+    if index == 0:
+        return MIN_VALUE
+    octave, sub = divmod(index - 1, SUB_BUCKETS)
+    return MIN_VALUE * 2**octave * (1 + (sub + 1) / SUB_BUCKETS)
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of durations with count, sum and extremes."""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = array("q", bytes(8 * BUCKET_COUNT))
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value: float):
+        """Record one duration in seconds."""
+        self.counts[bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram"):
+        """Add another histogram's samples to this one."""
+        counts = self.counts
+        for index, value in enumerate(other.counts):
+            if value:
+                counts[index] += value
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_dict(self) -> dict:
+        """Serialize to a JSON-compatible dict.
+
+        Only the run of buckets between the first and last non-empty one is
+        kept; it is located on the raw bytes so this stays cheap.
+        """
+        raw = self.counts.tobytes()
+        start = (len(raw) - len(raw.lstrip(b"\0"))) // 8
+        end = -(-len(raw.rstrip(b"\0")) // 8)
+        return {
+            "offset": start,
+            "counts": self.counts[start:end].tolist(),
+            "count": self.count,
+            "total": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        """Rebuild a histogram serialized by ``to_dict``."""
+        histogram = cls()
+        offset = data["offset"]
+        counts = data["counts"]
+        histogram.counts[offset : offset + len(counts)] = array("q", counts)
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = math.inf if data["min"] is None else data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+    def percentile(self, fraction: float) -> float:
+        """Return the duration below which ``fraction`` of samples fall."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for index, value in enumerate(self.counts):
+            seen += value
+            if seen >= rank:
+                # Bucket bounds can overshoot what was actually observed
+                return min(max(bucket_upper_bound(index), self.min), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        """Return count, mean, percentiles and max."""
+        result = {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+        }
+        for name, fraction in PERCENTILES.items():
+            result[name] = self.percentile(fraction)
+        result["max"] = self.max
+        return result
+
+
+class WindowedLatencyHistogram:
+    """All-time histogram plus per-minute slots for recent windows.
+
+    Windows are minute-aligned: "1m" covers the current (partial) minute,
+    "5m" the current minute and the four before it, and so on.
+    """
+
+    def __init__(self):
+        self.total = LatencyHistogram()
+        slot_count = max(WINDOWS.values())
+        # Each slot holds (minute number, histogram) and is reused in a ring
+        self._slots: list[Optional[tuple[int, LatencyHistogram]]] = [None] * slot_count
+
+    def record(self, value: float, now: Optional[float] = None):
+        """Record one duration in seconds."""
+        minute = int((time.time() if now is None else now) // SLOT_SECONDS)
+        index = minute % len(self._slots)
+        slot = self._slots[index]
+        if slot is None or slot[0] != minute:
+            slot = (minute, LatencyHistogram())
+            self._slots[index] = slot
+        slot[1].record(value)
+        self.total.record(value)
+
+    def merge(self, other: "WindowedLatencyHistogram"):
+        """Add another windowed histogram's samples to this one.
+
+        Slots are keyed by absolute minute, so histograms from different
+        processes line up; a slot older than the one it would replace is
+        dropped.
+        """
+        self.total.merge(other.total)
+        for slot in other._slots:
+            if slot is None:
+                continue
+            minute, histogram = slot
+            index = minute % len(self._slots)
+            current = self._slots[index]
+            if current is None or current[0] < minute:
+                current = (minute, LatencyHistogram())
+                self._slots[index] = current
+            if current[0] == minute:
+                current[1].merge(histogram)
+
+    def to_dict(self, now: Optional[float] = None) -> dict:
+        """Serialize the all-time histogram and the slots still in a window."""
+        current = int((time.time() if now is None else now) // SLOT_SECONDS)
+        return {
+            "total": self.total.to_dict(),
+            "slots": [
+                [slot[0], slot[1].to_dict()]
+                for slot in self._slots
+                if slot is not None and current - len(self._slots) < slot[0] <= current
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "WindowedLatencyHistogram":
+        """Rebuild a windowed histogram serialized by ``to_dict``."""
+        histogram = cls()
+        histogram.total = LatencyHistogram.from_dict(data["total"])
+        for minute, slot in data["slots"]:
+            histogram._slots[minute % len(histogram._slots)] = (
+                minute,
+                LatencyHistogram.from_dict(slot),
+            )
+        return histogram
+
+    def _recent(self, minutes: int, now: float) -> Iterable[LatencyHistogram]:
+        current = int(now // SLOT_SECONDS)
+        for slot in self._slots:
+            if slot is not None and current - minutes < slot[0] <= current:
+                yield slot[1]
+
+    def window(self, minutes: int, now: Optional[float] = None) -> LatencyHistogram:
+        """Merge the slots of the last ``minutes`` minutes."""
+        merged = LatencyHistogram()
+        for histogram in self._recent(minutes, time.time() if now is None else now):
+            merged.merge(histogram)
+        return merged
+
+    def summary(self, now: Optional[float] = None) -> dict:
+        """Return all-time and windowed summaries."""
+        now = time.time() if now is None else now
+        result = {"all": self.total.summary()}
+        for name, minutes in WINDOWS.items():
+            result[name] = self.window(minutes, now).summary()
+        return result
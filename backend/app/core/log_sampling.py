@@ -0,0 +1,153 @@
+"""
+Access log sampling.
+
+Logging every successful request is most of the log volume, and little of it
+is ever read. ``AccessLogSampler`` decides per request, once it has finished,
+whether its "Request completed" line is written:
+
+- responses with status >= 400 and requests slower than
+  ``ACCESS_LOG_SLOW_MS`` are always kept,
+- other requests are kept with the probability configured for their route
+  (``ACCESS_LOG_ROUTE_SAMPLE_RATES``), else ``ACCESS_LOG_SAMPLE_RATE``.
+
+Tail sampling: debug/info events logged while a request is being handled are
+held in a per-request buffer (``buffer_request_logs`` processor) and only
+written if the request is kept, so a failing request comes with its full
+context while a sampled-out one costs no I/O at all. Warnings and errors are
+never buffered.
+"""
+
+import random
+from collections import defaultdict
+from contextvars import ContextVar, Token
+from typing import Dict, List, Optional
+import structlog
+from app.core.config import settings
+
+# Levels held back until the request's sampling decision
+BUFFERED_LEVELS = frozenset({"debug", "info"})
+
+# Events buffered for the request being handled in this context, if any
+_request_log_buffer: ContextVar[Optional[list]] = ContextVar(
+    "request_log_buffer", default=None
+)
+
+
+def parse_route_sample_rates(value: str) -> Dict[str, float]:
+    """Parse ``"GET /status=0.01,/api/v1/users/{user_id}=0.1"``.
+
+    Keys are route templates, optionally prefixed with the method.
+    """
+    rates = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        route, separator, rate = item.rpartition("=")
+        if not separator or not route.strip():
+            raise ValueError(f"Invalid ACCESS_LOG_ROUTE_SAMPLE_RATES entry {item!r}")
+        rates[route.strip()] = float(rate)
+    return rates
+
+
+class AccessLogSampler:
+    """Decide which finished requests get an access log line."""
+
+    def __init__(
+        self,
+        default_rate: float = 1.0,
+        route_rates: Optional[Dict[str, float]] = None,
+        slow_threshold: float = 1.0,
+        buffer_size: int = 50,
+    ):
+        self.default_rate = default_rate
+        self.route_rates = route_rates or {}
+        self.slow_threshold = slow_threshold
+        self.buffer_size = buffer_size
+
+        # Metrics
+        self.kept: Dict[str, int] = defaultdict(int)
+        self.dropped = 0
+        self.buffer_overflow = 0
+
+    @property
+    def samples(self) -> bool:
+        """Whether any successful, fast request can be left out."""
+        return self.default_rate < 1 or any(
+            rate < 1 for rate in self.route_rates.values()
+        )
+
+    def sample_rate(self, method: str, route: str) -> float:
+        """Return the keep probability for a route template."""
+        rate = self.route_rates.get(f"{method} {route}")
+        if rate is None:
+            rate = self.route_rates.get(route, self.default_rate)
+        return rate
+
+    def keep_reason(
+        self, method: str, route: str, status_code: int, duration: float
+    ) -> Optional[str]:
+        """Return why a request is logged ("error", "slow", "sampled") or None."""
+        if status_code >= 400:
+            reason = "error"
+        elif duration >= self.slow_threshold:
+            reason = "slow"
+        elif random.random() < self.sample_rate(method, route):
+            reason = "sampled"
+        else:
+            self.dropped += 1
+            return None
+        self.kept[reason] += 1
+        return reason
+
+    def stats(self) -> dict:
+        return {
+            "kept": dict(self.kept),
+            "dropped": self.dropped,
+            "buffer_overflow": self.buffer_overflow,
+        }
+
+
+def start_request_logs() -> Optional[Token]:
+    """Start buffering this request's debug/info events.
+
+    Returns ``None`` (nothing to buffer) when every request is logged anyway.
+    """
+    if access_log_sampler.buffer_size <= 0 or not access_log_sampler.samples:
+        return None
+    return _request_log_buffer.set([])
+
+
+def finish_request_logs(token: Optional[Token], keep: bool):
+    """Stop buffering; write the buffered events if the request is kept."""
+    if token is None:
+        return
+    buffered = _request_log_buffer.get()
+    _request_log_buffer.reset(token)
+    if keep:
+        for logger, method_name, event in buffered:
+            # Same hand-off structlog does after the last processor
+            if isinstance(event, dict):
+                getattr(logger, method_name)(**event)
+            else:
+                getattr(logger, method_name)(event)
+
+
+def buffer_request_logs(logger, method_name: str, event):
+    """structlog processor (must be last) holding back in-request events."""
+    buffered: Optional[List] = _request_log_buffer.get()
+    if buffered is None or method_name not in BUFFERED_LEVELS:
+        return event
+    if len(buffered) < access_log_sampler.buffer_size:
+        buffered.append((logger, method_name, event))
+    else:
+        access_log_sampler.buffer_overflow += 1
+    raise structlog.DropEvent
+
+
+# Global access log sampler
+access_log_sampler = AccessLogSampler(
+    default_rate=settings.access_log_sample_rate,
+    route_rates=parse_route_sample_rates(settings.access_log_route_sample_rates),
+    slow_threshold=settings.access_log_slow_ms / 1000,
+    buffer_size=settings.access_log_buffer_size,
+)
@@ -0,0 +1,207 @@
+"""
+Queue-based sink for structured logs.
+
+Request handling only pushes the processed event dict onto a bounded queue;
+a background thread serializes events to JSON lines and writes them to stdout
+in batches (one write per batch). When the queue is full new events are
+dropped and counted per level rather than blocking the event loop, and the
+writer reports how many were lost.
+
+JSON serialization uses ``orjson`` when it is installed (``pip install
+orjson``), which is several times faster than the standard library.
+"""
+
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Callable, Dict, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LOG_JSON_SERIALIZERS = ("auto", "orjson", "json")
+
+# Sentinel asking the writer thread to drain and exit
+_STOP = object()
+
+
+def _orjson_dumps(event_dict: Dict[str, Any]) -> bytes:
+    return orjson.dumps(event_dict, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _json_dumps(event_dict: Dict[str, Any]) -> bytes:
+    return json.dumps(event_dict, default=str).encode()
+
+
+def get_json_serializer(name: str = "auto") -> Callable[[Dict[str, Any]], bytes]:
+    """Return a function serializing an event dict to JSON bytes."""
+    if name not in LOG_JSON_SERIALIZERS:
+        raise ValueError(
+            f"Unknown LOG_JSON_SERIALIZER {name!r}, "
+            f"expected one of: {', '.join(LOG_JSON_SERIALIZERS)}"
+        )
+    if name == "orjson" and orjson is None:
+        raise RuntimeError(
+            "LOG_JSON_SERIALIZER=orjson requires orjson (pip install orjson)"
+        )
+    if name == "json" or orjson is None:
+        return _json_dumps
+    return _orjson_dumps
+
+
+class QueueLogSink:
+    """Bounded queue of log events drained by a writer thread."""
+
+    def __init__(
+        self,
+        stream: Optional[BinaryIO] = None,
+        max_queue: int = 10000,
+        batch_size: int = 256,
+        serializer: Callable[[Dict[str, Any]], bytes] = _json_dumps,
+        processors: Sequence[Callable] = (),
+    ):
+        self.stream = stream
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.serializer = serializer
+        # structlog processors that don't need the caller's context (no
+        # timestamps, stacks or exception info) can run on the writer thread
+        self.processors = processors
+
+        # Metrics
+        self.written = 0
+        self.batches = 0
+        self.dropped: Dict[str, int] = defaultdict(int)
+        self._reported_dropped = 0
+
+        self._start()
+        atexit.register(self.close)
+        if hasattr(os, "register_at_fork"):
+            # The writer thread does not survive a fork (gunicorn --preload)
+            os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue: queue.Queue = queue.Queue(maxsize=self.max_queue)
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+
+    def put(self, event_dict: Dict[str, Any]):
+        """Queue an event without blocking; drop it if the queue is full."""
+        try:
+            self._queue.put_nowait(event_dict)
+        except queue.Full:
+            self.dropped[event_dict.get("level", "unknown")] += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Take whatever else is already waiting, up to a batch
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = _STOP in batch
+            self._write([event for event in batch if event is not _STOP])
+            if stop:
+                return
+
+    def _write(self, batch: list):
+        lines = []
+        for event_dict in batch:
+            try:
+                for processor in self.processors:
+                    event_dict = processor(None, event_dict.get("level"), event_dict)
+                lines.append(self.serializer(event_dict))
+            except Exception as e:
+                lines.append(
+                    _json_dumps({"event": repr(event_dict), "serializer_error": str(e)})
+                )
+
+        dropped = sum(self.dropped.values())
+        if dropped > self._reported_dropped:
+            lines.append(
+                self.serializer(
+                    {
+                        "event": "Log events dropped, queue full",
+                        "count": dropped - self._reported_dropped,
+                        "level": "warning",
+                        "timestamp": datetime.now(timezone.utc).strftime(
+                            "%Y-%m-%dT%H:%M:%S.%fZ"
+                        ),
+                    }
+                )
+            )
+            self._reported_dropped = dropped
+
+        if not lines:
+            return
+        stream = self.stream or sys.stdout.buffer
+        try:
+            stream.write(b"\n".join(lines) + b"\n")
+            stream.flush()
+        except (OSError, ValueError):
+            # Stream closed (e.g. at interpreter exit); nothing left to report to
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    @property
+    def queued(self) -> int:
+        """Events waiting to be written."""
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        """Return queue depth and write/drop counters."""
+        return {
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": dict(self.dropped),
+        }
+
+    def close(self, timeout: float = 5.0):
+        """Write out queued events and stop the writer thread."""
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+class SinkLogger:
+    """structlog logger handing each processed event dict to the sink.
+
+    The processor chain ends without a renderer, so structlog calls these
+    methods with the event dict as keyword arguments; serialization happens
+    on the sink's thread.
+    """
+
+    def __init__(self, sink: QueueLogSink):
+        self._sink = sink
+
+    def msg(self, **event_dict):
+        self._sink.put(event_dict)
+
+    log = debug = info = warn = warning = error = critical = exception = fatal = msg
+
+
+class SinkLoggerFactory:
+    """structlog logger factory returning ``SinkLogger``s for one sink."""
+
+    def __init__(self, sink: QueueLogSink):
+        self._logger = SinkLogger(sink)
+
+    def __call__(self, *args) -> SinkLogger:
+        return self._logger
@@ -2,49 +2,120 @@
 Monitoring and observability utilities for the FastAPI application.
 """
 
+import logging
 import time
-import psutil
+from bisect import bisect_left
 import structlog
 from datetime import datetime
 from typing import Dict, Any, Optional
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from collections import defaultdict, deque
+from functools import lru_cache, partial
+from app.core.config import settings
+from app.core.histogram import LatencyHistogram, WindowedLatencyHistogram
+from app.core.log_sampling import (
+    access_log_sampler,
+    buffer_request_logs,
+    finish_request_logs,
+    start_request_logs,
+)
+from app.core.log_sink import QueueLogSink, SinkLoggerFactory, get_json_serializer
+from app.core.route_utils import (
+    HTTP_METHODS,
+    get_route_paths,
+    get_route_templates,
+    get_scope_route_template,
+    match_route_template,
+)
+from app.core.query_inspection import query_inspector
+from app.core.timing import current_request_timings, request_phases
+
+# Configure structured logging. Events are filtered by LOG_LEVEL up front; by
+# default they go through a queue to a writer thread that serializes and
+# writes them in batches, keeping JSON encoding and stdout writes off the
+# request path (LOG_ASYNC=false writes inline)
+json_serializer = get_json_serializer(settings.log_json_serializer)
+log_sink: Optional[QueueLogSink] = None
+log_processors = [
+    structlog.processors.add_log_level,
+    structlog.processors.TimeStamper(fmt="iso"),
+    structlog.processors.StackInfoRenderer(),
+    structlog.processors.format_exc_info,
+]
+if settings.log_async:
+    log_sink = QueueLogSink(
+        max_queue=settings.log_queue_size,
+        batch_size=settings.log_batch_size,
+        serializer=json_serializer,
+        processors=[structlog.processors.UnicodeDecoder()],
+    )
+    log_logger_factory = SinkLoggerFactory(log_sink)
+else:
+    log_processors.append(structlog.processors.UnicodeDecoder())
+    log_processors.append(
+        structlog.processors.JSONRenderer(
+            serializer=lambda event_dict, **kw: json_serializer(event_dict)
+        )
+    )
+    log_logger_factory = structlog.BytesLoggerFactory()
+
+# Holds back debug/info events logged during a request until its access log
+# sampling decision (see app.core.log_sampling); must stay last
+log_processors.append(buffer_request_logs)
 
-# Configure structured logging
 structlog.configure(
-    processors=[
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer(),
-    ],
+    processors=log_processors,
     context_class=dict,
-    logger_factory=structlog.stdlib.LoggerFactory(),
-    wrapper_class=structlog.stdlib.BoundLogger,
+    logger_factory=log_logger_factory,
+    wrapper_class=structlog.make_filtering_bound_logger(
+        getattr(logging, settings.log_level.upper())
+    ),
     cache_logger_on_first_use=True,
 )
 
 logger = structlog.get_logger()
 
+# Prometheus histogram bucket bounds (seconds) for exported request durations
+EXPORT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Latest system usage, refreshed in the background by app.core.health
+system_stats = {"cpu_percent": 0.0, "memory_percent": 0.0, "disk_percent": 0.0}
+
+# Label for requests no route matched, and for endpoints beyond the cap
+UNMATCHED_ROUTE = "<unmatched>"
+OVERFLOW_ENDPOINT = "other"
+# (method, path) pairs no route handled whose label is remembered; such paths
+# are client-chosen, so the cache is bounded
+UNROUTED_LABEL_CACHE_SIZE = 1024
+
 
 class MetricsCollector:
     """Collect and store application metrics."""
 
-    def __init__(self):
+    def __init__(self, max_endpoints: int = settings.metrics_max_endpoints):
+        # Hard cap on distinct endpoint labels; later ones share "other"
+        self.max_endpoints = max_endpoints
         self.request_count = defaultdict(int)
-        self.request_times = defaultdict(list)
+        # Per-endpoint latency histograms (constant memory, windowed views)
+        self.latency = defaultdict(WindowedLatencyHistogram)
+        # Per-endpoint, per-phase histograms of the Server-Timing phases
+        self.phase_latency = defaultdict(lambda: defaultdict(LatencyHistogram))
+        # Per-endpoint counts per EXPORT_BUCKETS bound (last one is +Inf)
+        self.duration_buckets = defaultdict(lambda: [0] * (len(EXPORT_BUCKETS) + 1))
         self.error_count = defaultdict(int)
         self.status_codes = defaultdict(int)
         self.active_connections = 0
         self.start_time = datetime.now()
         self.endpoint_stats = defaultdict(
-            lambda: {"count": 0, "total_time": 0.0, "errors": 0, "avg_time": 0.0}
+            lambda: {
+                "count": 0,
+                "total_time": 0.0,
+                "errors": 0,
+                "avg_time": 0.0,
+                "queries": 0,
+                "avg_queries": 0.0,
+            }
         )
 
         # Store recent requests (last 1000)
@@ -57,24 +128,42 @@ class MetricsCollector:
         status_code: int,
         duration: float,
         user_id: Optional[str] = None,
+        phases: Optional[Dict[str, float]] = None,
+        queries: Optional[int] = None,
     ):
-        """Record a request with its metrics."""
+        """Record a request with its metrics.
+
+        ``path`` should be the matched route template, not the raw URL path.
+        ``phases`` maps phase names (see ``app.core.timing``) to the seconds
+        the request spent in them; ``queries`` is its number of SQL queries.
+        """
         endpoint = f"{method} {path}"
+        if (
+            endpoint not in self.request_count
+            and len(self.request_count) >= self.max_endpoints
+        ):
+            endpoint = OVERFLOW_ENDPOINT
 
         # Basic counters
         self.request_count[endpoint] += 1
         self.status_codes[status_code] += 1
 
         # Timing
-        self.request_times[endpoint].append(duration)
-        if len(self.request_times[endpoint]) > 100:  # Keep only last 100
-            self.request_times[endpoint].pop(0)
+        self.latency[endpoint].record(duration)
+        self.duration_buckets[endpoint][bisect_left(EXPORT_BUCKETS, duration)] += 1
+        if phases:
+            phase_latency = self.phase_latency[endpoint]
+            for phase, phase_duration in phases.items():
+                phase_latency[phase].record(phase_duration)
 
         # Endpoint stats
         stats = self.endpoint_stats[endpoint]
         stats["count"] += 1
         stats["total_time"] += duration
         stats["avg_time"] = stats["total_time"] / stats["count"]
+        if queries:
+            stats["queries"] += queries
+        stats["avg_queries"] = stats["queries"] / stats["count"]
 
         if status_code >= 400:
             self.error_count[endpoint] += 1
@@ -92,22 +181,94 @@ class MetricsCollector:
             }
         )
 
+    def snapshot(self) -> Dict[str, Any]:
+        """Serialize the counters to a JSON-compatible dict.
+
+        Used to share this process's metrics with the other workers (see
+        ``app.core.multiprocess_metrics``); ``merge_snapshot`` adds one back.
+        """
+        now = time.time()
+        return {
+            "start_time": self.start_time.timestamp(),
+            "active_connections": self.active_connections,
+            "request_count": dict(self.request_count),
+            "error_count": dict(self.error_count),
+            "status_codes": {str(code): n for code, n in self.status_codes.items()},
+            "duration_buckets": {
+                endpoint: list(buckets)
+                for endpoint, buckets in self.duration_buckets.items()
+            },
+            "latency": {
+                endpoint: histogram.to_dict(now)
+                for endpoint, histogram in self.latency.items()
+            },
+            "phase_latency": {
+                endpoint: {
+                    phase: histogram.to_dict() for phase, histogram in phases.items()
+                }
+                for endpoint, phases in self.phase_latency.items()
+            },
+            "endpoint_stats": {
+                endpoint: dict(stats) for endpoint, stats in self.endpoint_stats.items()
+            },
+            "recent_requests": list(self.recent_requests)[-10:],
+        }
+
+    def merge_snapshot(self, snapshot: Dict[str, Any]):
+        """Add the counters of a ``snapshot()`` to this collector.
+
+        Endpoints are merged as is, without applying ``max_endpoints``.
+        """
+        self.start_time = min(
+            self.start_time, datetime.fromtimestamp(snapshot["start_time"])
+        )
+        self.active_connections += snapshot["active_connections"]
+        for endpoint, count in snapshot["request_count"].items():
+            self.request_count[endpoint] += count
+        for endpoint, count in snapshot["error_count"].items():
+            self.error_count[endpoint] += count
+        for code, count in snapshot["status_codes"].items():
+            self.status_codes[int(code)] += count
+        for endpoint, buckets in snapshot["duration_buckets"].items():
+            merged = self.duration_buckets[endpoint]
+            for index, count in enumerate(buckets):
+                merged[index] += count
+        for endpoint, histogram in snapshot["latency"].items():
+            self.latency[endpoint].merge(WindowedLatencyHistogram.from_dict(histogram))
+        for endpoint, phases in snapshot.get("phase_latency", {}).items():
+            for phase, histogram in phases.items():
+                self.phase_latency[endpoint][phase].merge(
+                    LatencyHistogram.from_dict(histogram)
+                )
+        for endpoint, other in snapshot["endpoint_stats"].items():
+            stats = self.endpoint_stats[endpoint]
+            stats["count"] += other["count"]
+            stats["total_time"] += other["total_time"]
+            stats["errors"] += other["errors"]
+            stats["queries"] += other.get("queries", 0)
+            stats["avg_time"] = stats["total_time"] / stats["count"]
+            stats["avg_queries"] = stats["queries"] / stats["count"]
+        self.recent_requests = deque(
+            sorted(
+                [*self.recent_requests, *snapshot["recent_requests"]],
+                key=lambda request: request["timestamp"],
+            ),
+            maxlen=self.recent_requests.maxlen,
+        )
+
     def get_metrics(self) -> Dict[str, Any]:
         """Get all collected metrics."""
         uptime = datetime.now() - self.start_time
 
-        # System metrics
-        system_metrics = {
-            "cpu_percent": psutil.cpu_percent(),
-            "memory_percent": psutil.virtual_memory().percent,
-            "disk_percent": psutil.disk_usage("/").percent,
+        # Latency percentiles, all-time and over the last 1/5/15 minutes
+        now = time.time()
+        latency = {
+            endpoint: histogram.summary(now)
+            for endpoint, histogram in self.latency.items()
+        }
+        avg_response_times = {
+            endpoint: summary["all"]["avg"] for endpoint, summary in latency.items()
         }
-
-        # Calculate average response times
-        avg_response_times = {}
-        for endpoint, times in self.request_times.items():
-            if times:
-                avg_response_times[endpoint] = sum(times) / len(times)
 
         return {
             "uptime_seconds": uptime.total_seconds(),
@@ -116,9 +277,16 @@ class MetricsCollector:
             "errors_by_endpoint": dict(self.error_count),
             "status_codes": dict(self.status_codes),
             "average_response_times": avg_response_times,
+            "latency": latency,
+            "phases": {
+                endpoint: {
+                    phase: histogram.summary() for phase, histogram in phases.items()
+                }
+                for endpoint, phases in self.phase_latency.items()
+            },
             "endpoint_stats": dict(self.endpoint_stats),
             "active_connections": self.active_connections,
-            "system": system_metrics,
+            "system": dict(system_stats),
             "recent_requests": list(self.recent_requests)[-10:],  # Last 10 requests
         }
 
@@ -172,74 +340,145 @@ class MetricsCollector:
 metrics_collector = MetricsCollector()
 
 
-class MonitoringMiddleware(BaseHTTPMiddleware):
+class MonitoringMiddleware:
     """Middleware to collect request metrics and logging."""
 
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # Built from the app's routes on first request, once routers are included
+        self._route_paths: Optional[dict] = None
+        self._match_unrouted = None
+
+    def get_route_label(self, scope: Scope) -> str:
+        """Label a request by its route template, e.g. ``/api/v1/users/{user_id}``.
+
+        Call after the app has run: the template comes from the route the
+        router stored in the scope. Only requests no route handled are matched
+        against the route table, once per distinct method and path.
+        """
+        if self._route_paths is None:
+            app = scope.get("app")
+            self._route_paths = get_route_paths(app)
+            self._match_unrouted = lru_cache(maxsize=UNROUTED_LABEL_CACHE_SIZE)(
+                partial(match_route_template, get_route_templates(app))
+            )
+        template = get_scope_route_template(self._route_paths, scope)
+        if template is None:
+            template = self._match_unrouted(scope["method"], scope["path"])
+        return template or UNMATCHED_ROUTE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        method = scope["method"]
+        path = scope["path"]
+        # Bounded labels for metrics; logs keep the raw method and path
+        method_label = method if method in HTTP_METHODS else "OTHER"
+        client = scope.get("client")
+        client_ip = client[0] if client else None
+        status_code = 500
 
         # Get user info if available
         user_id = None
-        if hasattr(request.state, "user"):
-            user_id = str(request.state.user.id)
+        state = scope.get("state") or {}
+        if "user" in state:
+            user_id = str(state["user"].id)
+
+        async def send_with_timing(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Add response headers for monitoring
+                headers = MutableHeaders(scope=message)
+                headers["X-Response-Time"] = str(time.perf_counter() - start_time)
+            await send(message)
 
         # Increment active connections
         metrics_collector.active_connections += 1
+        log_buffer = start_request_logs()
+        # Phase timings and statement counts, filled in while the request runs
+        timings = current_request_timings()
 
         try:
             # Process request
-            response = await call_next(request)
+            await self.app(scope, receive, send_with_timing)
 
             # Calculate duration
-            duration = time.time() - start_time
+            duration = time.perf_counter() - start_time
+            route = self.get_route_label(scope)
 
             # Record metrics
             metrics_collector.record_request(
-                method=request.method,
-                path=request.url.path,
-                status_code=response.status_code,
+                method=method_label,
+                path=route,
+                status_code=status_code,
                 duration=duration,
                 user_id=user_id,
+                phases=request_phases(),
+                queries=timings.phase_count("db") if timings is not None else None,
             )
 
-            # Log request
-            logger.info(
-                "Request completed",
-                method=request.method,
-                path=request.url.path,
-                status_code=response.status_code,
-                duration=duration,
-                user_id=user_id,
-                client_ip=request.client.host if request.client else None,
+            # Flag requests running too many or repeated queries (N+1)
+            if timings is not None:
+                query_report = query_inspector.inspect_request(
+                    f"{method_label} {route}", timings
+                )
+                if query_report is not None:
+                    logger.warning(
+                        "Excessive database queries",
+                        method=method,
+                        path=path,
+                        **query_report,
+                    )
+
+            # Log request (errors and slow requests always, others sampled)
+            log_reason = access_log_sampler.keep_reason(
+                method_label, route, status_code, duration
             )
-
-            # Add response headers for monitoring
-            response.headers["X-Response-Time"] = str(duration)
-
-            return response
+            finish_request_logs(log_buffer, keep=log_reason is not None)
+            log_buffer = None
+            if log_reason is not None:
+                logger.info(
+                    "Request completed",
+                    method=method,
+                    path=path,
+                    status_code=status_code,
+                    duration=duration,
+                    user_id=user_id,
+                    client_ip=client_ip,
+                    log_reason=log_reason,
+                )
 
         except Exception as e:
             # Calculate duration even for errors
-            duration = time.time() - start_time
+            duration = time.perf_counter() - start_time
+            route = self.get_route_label(scope)
 
             # Record error metrics
             metrics_collector.record_request(
-                method=request.method,
-                path=request.url.path,
+                method=method_label,
+                path=route,
                 status_code=500,
                 duration=duration,
                 user_id=user_id,
+                phases=request_phases(),
+                queries=timings.phase_count("db") if timings is not None else None,
             )
 
-            # Log error
+            # Log error, with everything the request logged before failing
+            finish_request_logs(log_buffer, keep=True)
+            log_buffer = None
             logger.error(
                 "Request failed",
-                method=request.method,
-                path=request.url.path,
+                method=method,
+                path=path,
                 duration=duration,
                 user_id=user_id,
                 error=str(e),
-                client_ip=request.client.host if request.client else None,
+                client_ip=client_ip,
             )
 
             raise
@@ -247,6 +486,7 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
         finally:
             # Decrement active connections
             metrics_collector.active_connections -= 1
+            finish_request_logs(log_buffer, keep=False)
 
 
 def log_security_event(
@@ -0,0 +1,308 @@
+"""
+Metrics aggregation across worker processes.
+
+``metrics_collector`` lives in process memory, so under ``uvicorn --workers N``
+or gunicorn ``/metrics`` and ``/health`` would only describe whichever worker
+answered. When ``METRICS_MULTIPROC_DIR`` is set, every worker periodically
+publishes a snapshot of its collector into its own memory-mapped file in that
+directory, and the metrics endpoints merge the snapshots of all workers (with
+their own live counters instead of their file).
+
+Each file is written by one process only. Readers use a sequence counter in
+the header (odd while a write is in progress) to detect torn reads, so no
+cross-process lock is needed on the hot path.
+
+Files of workers that have exited are folded into a single archive file and
+removed, so request counters keep increasing when workers are recycled.
+Clear the directory when deploying, as the archive otherwise carries counters
+over from the previous deployment.
+"""
+
+import asyncio
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+import psutil
+from app.core.config import settings
+from app.core.monitoring import MetricsCollector, logger, metrics_collector
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock; archiving is then best effort
+    fcntl = None
+
+# magic, write sequence, pid, process create time, payload length
+HEADER = struct.Struct("<8sQIdI")
+MAGIC = b"FSMETRC1"
+INITIAL_FILE_SIZE = 64 * 1024
+READ_RETRIES = 5
+
+WORKER_FILE_PATTERN = "worker_*.metrics"
+ARCHIVE_FILE = "archive.metrics"
+LOCK_FILE = ".lock"
+
+
+def _process_create_time(pid: int) -> Optional[float]:
+    try:
+        return psutil.Process(pid).create_time()
+    except psutil.Error:
+        return None
+
+
+class MetricsFile:
+    """A memory-mapped file holding the latest snapshot of one process."""
+
+    def __init__(self, path: Path, pid: int, create_time: float):
+        self.path = path
+        self.pid = pid
+        self.create_time = create_time
+        self._sequence = 0
+        self._lock = threading.Lock()
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, INITIAL_FILE_SIZE)
+            self._mmap = mmap.mmap(fd, INITIAL_FILE_SIZE)
+        finally:
+            os.close(fd)
+
+    def write(self, snapshot: Dict[str, Any]):
+        """Replace the published snapshot."""
+        payload = json.dumps(snapshot, separators=(",", ":")).encode()
+        needed = HEADER.size + len(payload)
+        with self._lock:
+            if needed > len(self._mmap):
+                # Only ever grows: a reader mapping the old size stays valid
+                self._mmap.resize(max(needed, 2 * len(self._mmap)))
+
+            self._sequence += 1
+            self._write_header(0)
+            self._mmap[HEADER.size : needed] = payload
+            self._sequence += 1
+            self._write_header(len(payload))
+
+    def _write_header(self, length: int):
+        HEADER.pack_into(
+            self._mmap,
+            0,
+            MAGIC,
+            self._sequence,
+            self.pid,
+            self.create_time,
+            length,
+        )
+
+    def close(self):
+        with self._lock:
+            self._mmap.close()
+
+    @staticmethod
+    def read(path: Path) -> Optional[tuple[int, float, Dict[str, Any]]]:
+        """Return ``(pid, create_time, snapshot)`` from a file, if readable."""
+        for _ in range(READ_RETRIES):
+            try:
+                with open(path, "rb") as f:
+                    size = os.fstat(f.fileno()).st_size
+                    if size < HEADER.size:
+                        return None
+                    with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                        magic, sequence, pid, create_time, length = HEADER.unpack_from(
+                            mm
+                        )
+                        if magic != MAGIC:
+                            return None
+                        end = HEADER.size + length
+                        # Odd sequence: write in progress; too long: file grew
+                        if sequence % 2 == 0 and end <= size:
+                            payload = mm[HEADER.size : end]
+                            if HEADER.unpack_from(mm)[1] == sequence:
+                                if not length:
+                                    return None
+                                return pid, create_time, json.loads(payload)
+            except FileNotFoundError:
+                return None
+            except (OSError, ValueError) as e:
+                logger.warning("Unreadable metrics file", path=str(path), error=str(e))
+                return None
+            time.sleep(0.001)
+        return None
+
+    @classmethod
+    def create_archive(cls, path: Path, snapshot: Dict[str, Any]):
+        """Write a snapshot to a file no live process owns."""
+        archive = cls(path.with_suffix(".tmp"), pid=0, create_time=0.0)
+        try:
+            archive.write(snapshot)
+        finally:
+            archive.close()
+        os.replace(archive.path, path)
+
+
+class MultiprocessMetrics:
+    """Publishes this worker's metrics and aggregates those of all workers."""
+
+    def __init__(
+        self,
+        directory: str,
+        collector: MetricsCollector,
+        flush_interval: float = 1.0,
+    ):
+        self.directory = Path(directory) if directory else None
+        self.collector = collector
+        self.flush_interval = flush_interval
+        self.file: Optional[MetricsFile] = None
+        self.workers = 1
+        self._last_flush: Optional[tuple[int, int]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def start(self):
+        """Create this worker's metrics file and start publishing to it.
+
+        Call from the worker's startup, i.e. after it was forked.
+        """
+        pid = os.getpid()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.file = MetricsFile(
+            self.directory / f"worker_{pid}.metrics",
+            pid,
+            _process_create_time(pid) or 0.0,
+        )
+        self.file.write(self._changed_snapshot(force=True))
+        self._task = asyncio.create_task(self.run())
+        logger.info(
+            "Multiprocess metrics enabled", directory=str(self.directory), pid=pid
+        )
+
+    def _changed_snapshot(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Snapshot the collector if anything changed since the last publish."""
+        state = (
+            sum(self.collector.request_count.values()),
+            self.collector.active_connections,
+        )
+        if not force and state == self._last_flush:
+            return None
+        self._last_flush = state
+        return self.collector.snapshot()
+
+    async def run(self):
+        """Publish snapshots every ``flush_interval`` seconds."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                # Snapshot on the event loop; encoding and writing off it
+                snapshot = self._changed_snapshot()
+                if snapshot is not None:
+                    await asyncio.to_thread(self.file.write, snapshot)
+            except Exception as e:
+                logger.error("Metrics flush error", error=str(e))
+
+    def stop(self):
+        """Publish a final snapshot; the file is archived once we have exited."""
+        if self.file is None:
+            return
+        self._task.cancel()
+        self.collector.active_connections = 0
+        self.file.write(self._changed_snapshot(force=True))
+        self.file.close()
+        self.file = None
+
+    async def aggregate(self) -> MetricsCollector:
+        """Return a collector holding the metrics of every worker."""
+        if self.file is None:
+            return self.collector
+        # Snapshot on the event loop, then read the other files off it
+        own = self.collector.snapshot()
+        return await asyncio.to_thread(self._aggregate, own)
+
+    def _aggregate(self, own: Dict[str, Any]) -> MetricsCollector:
+        merged = MetricsCollector()
+        merged.merge_snapshot(own)
+        workers = 1
+        dead = []
+
+        for path in self.directory.glob(WORKER_FILE_PATTERN):
+            if path == self.file.path:
+                continue
+            result = MetricsFile.read(path)
+            if result is None:
+                continue
+            pid, create_time, snapshot = result
+            if not self._is_alive(pid, create_time):
+                dead.append(path)
+                continue
+            merged.merge_snapshot(snapshot)
+            workers += 1
+
+        if dead:
+            self._archive(dead)
+        archived = MetricsFile.read(self.directory / ARCHIVE_FILE)
+        if archived is not None:
+            merged.merge_snapshot(archived[2])
+
+        self.workers = workers
+        return merged
+
+    @staticmethod
+    def _is_alive(pid: int, create_time: float) -> bool:
+        # The create time guards against the pid being reused
+        started = _process_create_time(pid)
+        return started is not None and abs(started - create_time) < 1.0
+
+    def _archive(self, paths: list[Path]):
+        """Fold the files of exited workers into the archive and delete them."""
+        with self._lock():
+            archive_path = self.directory / ARCHIVE_FILE
+            archive = MetricsCollector()
+            archived = MetricsFile.read(archive_path)
+            if archived is not None:
+                archive.merge_snapshot(archived[2])
+
+            removed = []
+            for path in paths:
+                # Another worker may have archived it while we waited
+                result = MetricsFile.read(path)
+                if result is not None and not self._is_alive(*result[:2]):
+                    archive.merge_snapshot(result[2])
+                    removed.append(path)
+            if not removed:
+                return
+
+            archive.active_connections = 0
+            archive.recent_requests.clear()
+            MetricsFile.create_archive(archive_path, archive.snapshot())
+            for path in removed:
+                path.unlink(missing_ok=True)
+            logger.info("Archived metrics of exited workers", count=len(removed))
+
+    @contextmanager
+    def _lock(self):
+        with open(self.directory / LOCK_FILE, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# Global multiprocess metrics (enabled when METRICS_MULTIPROC_DIR is set)
+multiprocess_metrics = MultiprocessMetrics(
+    settings.metrics_multiproc_dir,
+    metrics_collector,
+    flush_interval=settings.metrics_multiproc_flush_seconds,
+)
+
+
+async def get_metrics_collector() -> MetricsCollector:
+    """Return the collector to report from: all workers' or just this one's."""
+    return await multiprocess_metrics.aggregate()
@@ -0,0 +1,324 @@
+"""
+Prometheus / OpenMetrics text exposition of the in-process metrics.
+
+Everything is rendered from counters the request path already maintains (no
+database access, no psutil calls), so a scrape costs well under a
+millisecond. Scrapes are served either on the main app at
+``/metrics/openmetrics`` guarded by ``METRICS_SCRAPE_TOKEN``, or on a separate
+plain listener bound to ``METRICS_HOST:METRICS_PORT``.
+"""
+
+import asyncio
+import hmac
+from functools import lru_cache
+from typing import Optional
+from app.core.config import settings
+from app.core.custom_rate_limiting import rate_limiter
+from app.core.monitoring import (
+    EXPORT_BUCKETS,
+    MetricsCollector,
+    log_sink,
+    logger,
+    metrics_collector,
+)
+from app.core.multiprocess_metrics import get_metrics_collector
+from app.core.password_hashing import password_hashing_pool
+from app.core.query_inspection import query_inspector
+from app.db.base import async_engine, engine
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# "le" values of the exported duration histogram; +Inf takes the overflow slot
+BUCKET_BOUNDS = [*EXPORT_BUCKETS, "+Inf"]
+
+# Upper bound on a scrape request read by the standalone listener
+MAX_REQUEST_BYTES = 8192
+REQUEST_TIMEOUT_SECONDS = 5
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    """Format label pairs (without braces), e.g. ``code="200"``."""
+    return ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+
+
+@lru_cache(maxsize=4096)
+def _endpoint_labels(endpoint: str) -> str:
+    """Labels for a collector key like ``GET /api/v1/users/{user_id}``.
+
+    Cached: keys are bounded by ``METRICS_MAX_ENDPOINTS`` and formatting
+    them is most of the cost of a scrape.
+    """
+    method, _, route = endpoint.partition(" ")
+    if not route:
+        # Overflow bucket has no method
+        method, route = "", endpoint
+    return _labels(method=method, route=route)
+
+
+class _Exposition:
+    """Accumulates metric families in either text format."""
+
+    def __init__(self, openmetrics: bool):
+        self.openmetrics = openmetrics
+        self.lines: list[str] = []
+
+    def family(self, name: str, metric_type: str, help_text: str):
+        # OpenMetrics names counter families without the _total suffix
+        if metric_type == "counter" and not self.openmetrics:
+            name += "_total"
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {metric_type}")
+
+    def sample(self, name: str, value: float, labels: str = ""):
+        if labels:
+            self.lines.append(f"{name}{{{labels}}} {value}")
+        else:
+            self.lines.append(f"{name} {value}")
+
+    def render(self) -> str:
+        if self.openmetrics:
+            self.lines.append("# EOF")
+        return "\n".join(self.lines) + "\n"
+
+
+def _database_pools() -> list[tuple[str, object]]:
+    return [("sync", engine.pool), ("async", async_engine.sync_engine.pool)]
+
+
+def render_metrics(
+    openmetrics: bool = True, collector: Optional[MetricsCollector] = None
+) -> str:
+    """Render all metrics in OpenMetrics (or Prometheus 0.0.4) text format.
+
+    HTTP metrics come from ``collector`` (all workers' when aggregated); the
+    rate limiter, hashing pool and DB pool series are this process's own.
+    """
+    out = _Exposition(openmetrics)
+    collector = collector or metrics_collector
+
+    out.family("http_requests", "counter", "HTTP requests by route template.")
+    for endpoint, count in collector.request_count.items():
+        out.sample("http_requests_total", count, _endpoint_labels(endpoint))
+
+    out.family("http_request_errors", "counter", "HTTP requests answered with 4xx/5xx.")
+    for endpoint, count in collector.error_count.items():
+        out.sample("http_request_errors_total", count, _endpoint_labels(endpoint))
+
+    out.family("http_responses", "counter", "HTTP responses by status code.")
+    for status_code, count in collector.status_codes.items():
+        out.sample("http_responses_total", count, _labels(code=status_code))
+
+    out.family("http_request_duration_seconds", "histogram", "HTTP request duration.")
+    for endpoint, buckets in collector.duration_buckets.items():
+        labels = _endpoint_labels(endpoint)
+        cumulative = 0
+        for bound, count in zip(BUCKET_BOUNDS, buckets):
+            cumulative += count
+            out.sample(
+                "http_request_duration_seconds_bucket",
+                cumulative,
+                f'le="{bound}",{labels}',
+            )
+        histogram = collector.latency[endpoint].total
+        out.sample("http_request_duration_seconds_count", histogram.count, labels)
+        out.sample("http_request_duration_seconds_sum", histogram.total, labels)
+
+    out.family(
+        "http_request_phase_duration_seconds",
+        "summary",
+        "Time HTTP requests spent per phase (jwt, db, redis, serialize, ...).",
+    )
+    for endpoint, phases in collector.phase_latency.items():
+        labels = _endpoint_labels(endpoint)
+        for phase, histogram in phases.items():
+            phase_labels = f"{labels},{_labels(phase=phase)}"
+            out.sample(
+                "http_request_phase_duration_seconds_count",
+                histogram.count,
+                phase_labels,
+            )
+            out.sample(
+                "http_request_phase_duration_seconds_sum",
+                histogram.total,
+                phase_labels,
+            )
+
+    out.family("http_request_db_queries", "counter", "SQL queries run by requests.")
+    for endpoint, stats in collector.endpoint_stats.items():
+        out.sample(
+            "http_request_db_queries_total",
+            stats["queries"],
+            _endpoint_labels(endpoint),
+        )
+
+    out.family("http_active_requests", "gauge", "HTTP requests in progress.")
+    out.sample("http_active_requests", collector.active_connections)
+
+    out.family("app_start_time_seconds", "gauge", "Application start time.")
+    out.sample("app_start_time_seconds", collector.start_time.timestamp())
+
+    out.family("rate_limit_rejections", "counter", "Requests rejected by rate limits.")
+    for limit, count in rate_limiter.rejections.items():
+        out.sample("rate_limit_rejections_total", count, _labels(limit=limit))
+
+    out.family(
+        "db_query_budget_exceeded",
+        "counter",
+        "Requests running more queries than DB_QUERY_BUDGET.",
+    )
+    for endpoint, count in query_inspector.over_budget.items():
+        out.sample("db_query_budget_exceeded_total", count, _endpoint_labels(endpoint))
+    out.family(
+        "db_repeated_query_requests",
+        "counter",
+        "Requests repeating a statement more than DB_REPEATED_QUERY_THRESHOLD times.",
+    )
+    for endpoint, count in query_inspector.repeated.items():
+        out.sample(
+            "db_repeated_query_requests_total", count, _endpoint_labels(endpoint)
+        )
+
+    hashing = password_hashing_pool
+    out.family("password_hash_in_flight", "gauge", "Password hashes running or queued.")
+    out.sample("password_hash_in_flight", hashing.in_flight)
+    out.family(
+        "password_hash_rejections",
+        "counter",
+        "Password hashes rejected because the queue was full.",
+    )
+    out.sample("password_hash_rejections_total", hashing.rejected)
+    out.family(
+        "password_hash_queue_wait_seconds",
+        "summary",
+        "Time password hashes waited for a worker.",
+    )
+    out.sample("password_hash_queue_wait_seconds_count", hashing.started)
+    out.sample("password_hash_queue_wait_seconds_sum", hashing.total_wait)
+
+    if log_sink is not None:
+        out.family("log_events_queued", "gauge", "Log events waiting to be written.")
+        out.sample("log_events_queued", log_sink.queued)
+        out.family(
+            "log_events_dropped",
+            "counter",
+            "Log events dropped because the queue was full.",
+        )
+        for level, count in log_sink.dropped.items():
+            out.sample("log_events_dropped_total", count, _labels(level=level))
+
+    out.family("db_pool_size", "gauge", "Configured database pool size.")
+    pools = _database_pools()
+    for name, pool in pools:
+        if hasattr(pool, "size"):
+            out.sample("db_pool_size", pool.size(), _labels(pool=name))
+    out.family("db_pool_checked_out", "gauge", "Database connections currently in use.")
+    for name, pool in pools:
+        if hasattr(pool, "checkedout"):
+            out.sample("db_pool_checked_out", pool.checkedout(), _labels(pool=name))
+    out.family(
+        "db_pool_overflow", "gauge", "Database connections open beyond pool size."
+    )
+    for name, pool in pools:
+        if hasattr(pool, "overflow"):
+            out.sample("db_pool_overflow", max(0, pool.overflow()), _labels(pool=name))
+
+    return out.render()
+
+
+def wants_openmetrics(accept: Optional[str]) -> bool:
+    """Pick the OpenMetrics format when the scraper asks for it."""
+    return bool(accept) and "application/openmetrics-text" in accept
+
+
+def scrape_authorized(authorization: Optional[str]) -> bool:
+    """Check a scrape's ``Authorization: Bearer`` header against the token."""
+    token = settings.metrics_scrape_token
+    if not token:
+        return False
+    scheme, _, credentials = (authorization or "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(
+        credentials.encode(), token.encode()
+    )
+
+
+async def _handle_scrape(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Serve one request on the standalone metrics listener."""
+    try:
+        head = await asyncio.wait_for(
+            reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT_SECONDS
+        )
+        if len(head) > MAX_REQUEST_BYTES:
+            raise ValueError("request too large")
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = request_line.split(" ", 2)
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if method != "GET" or target.split("?", 1)[0] != "/metrics":
+            status, content_type, body = "404 Not Found", "text/plain", b"Not Found\n"
+        elif settings.metrics_scrape_token and not scrape_authorized(
+            headers.get("authorization")
+        ):
+            status, content_type, body = (
+                "401 Unauthorized",
+                "text/plain",
+                b"Unauthorized\n",
+            )
+        else:
+            openmetrics = wants_openmetrics(headers.get("accept"))
+            status = "200 OK"
+            content_type = (
+                OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE
+            )
+            collector = await get_metrics_collector()
+            body = render_metrics(openmetrics, collector).encode()
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (
+        asyncio.TimeoutError,
+        asyncio.IncompleteReadError,
+        asyncio.LimitOverrunError,
+        ValueError,
+    ):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server() -> Optional[asyncio.Server]:
+    """Start the standalone scrape listener if ``METRICS_PORT`` is set."""
+    if not settings.metrics_port:
+        return None
+    try:
+        server = await asyncio.start_server(
+            _handle_scrape,
+            settings.metrics_host,
+            settings.metrics_port,
+            limit=MAX_REQUEST_BYTES,
+        )
+    except OSError as e:
+        # With several workers only the first one can bind the port
+        logger.warning(
+            "Metrics listener not started",
+            host=settings.metrics_host,
+            port=settings.metrics_port,
+            error=str(e),
+        )
+        return None
+    logger.info(
+        "Metrics listener started",
+        host=settings.metrics_host,
+        port=settings.metrics_port,
+    )
+    return server
@@ -0,0 +1,274 @@
+"""
+Password hashing policy and the bounded worker pool that runs it.
+
+The policy picks the scheme (bcrypt or argon2id) and its cost. By default the
+cost is calibrated at startup so one verify takes about
+``PASSWORD_HASH_TARGET_MS`` on the current hardware; stored hashes outside the
+policy are upgraded transparently on the next successful login.
+
+bcrypt is deliberately slow (~250ms per call). Running it on the event loop
+stalls every request, and running it on the shared anyio threadpool lets a
+login storm starve unrelated sync endpoints. Hashing gets its own threads
+instead (bcrypt and argon2 release the GIL, so they run in parallel), with a
+bounded queue: once it is full, new work fails fast with a 503 rather than
+piling up.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from app.core.config import settings
+from app.core.timing import timed
+
+# Recent queue waits kept for percentile reporting
+WAIT_SAMPLES = 1000
+
+PASSWORD_HASH_SCHEMES = ("bcrypt", "argon2")
+
+# Calibration bounds: never go below current minimum guidance, and never so
+# high that a single login pins a core for seconds
+BCRYPT_ROUNDS_RANGE = (10, 16)
+ARGON2_TIME_COST_RANGE = (2, 10)
+CALIBRATION_SAMPLES = 3
+
+
+@dataclass(frozen=True)
+class PasswordHashPolicy:
+    """Hashing scheme and cost; ``cost`` is bcrypt log2 rounds or argon2 time_cost.
+
+    Stored hashes whose cost is within ``tolerance`` of ``cost`` are accepted
+    as is, so workers whose calibrations differ slightly don't keep rehashing
+    each other's hashes.
+    """
+
+    scheme: str
+    cost: int
+    tolerance: int = 0
+    argon2_memory_kib: int = 65536
+    argon2_parallelism: int = 2
+
+    def build_context(self) -> CryptContext:
+        """Build a context that hashes with this policy and verifies any scheme."""
+        options = {
+            f"{self.scheme}__default_rounds": self.cost,
+            f"{self.scheme}__min_rounds": max(1, self.cost - self.tolerance),
+            f"{self.scheme}__max_rounds": self.cost + self.tolerance,
+        }
+        if self.scheme == "argon2":
+            options.update(
+                argon2__type="ID",
+                argon2__memory_cost=self.argon2_memory_kib,
+                argon2__parallelism=self.argon2_parallelism,
+            )
+
+        # Other schemes stay verifiable but are deprecated, so their hashes
+        # are replaced on the next login
+        schemes = [self.scheme] + [s for s in PASSWORD_HASH_SCHEMES if s != self.scheme]
+        if self.scheme == "bcrypt" and not _argon2_available():
+            schemes = ["bcrypt"]
+        return CryptContext(schemes=schemes, deprecated="auto", **options)
+
+    def describe(self) -> dict:
+        """Return the policy as loggable fields."""
+        fields = {"scheme": self.scheme, "cost": self.cost, "tolerance": self.tolerance}
+        if self.scheme == "argon2":
+            fields.update(
+                memory_kib=self.argon2_memory_kib, parallelism=self.argon2_parallelism
+            )
+        return fields
+
+
+def _argon2_available() -> bool:
+    from passlib.hash import argon2
+
+    return argon2.has_backend()
+
+
+def get_configured_password_policy() -> PasswordHashPolicy:
+    """Build the uncalibrated policy straight from settings."""
+    scheme = settings.password_hash_scheme
+    if scheme not in PASSWORD_HASH_SCHEMES:
+        raise ValueError(
+            f"Unknown PASSWORD_HASH_SCHEME {scheme!r}, "
+            f"expected one of: {', '.join(PASSWORD_HASH_SCHEMES)}"
+        )
+    if scheme == "argon2" and not _argon2_available():
+        raise RuntimeError(
+            "PASSWORD_HASH_SCHEME=argon2 requires argon2-cffi "
+            "(pip install argon2-cffi)"
+        )
+
+    return PasswordHashPolicy(
+        scheme=scheme,
+        cost=(
+            settings.password_hash_bcrypt_rounds
+            if scheme == "bcrypt"
+            else settings.password_hash_argon2_time_cost
+        ),
+        argon2_memory_kib=settings.password_hash_argon2_memory_kib,
+        argon2_parallelism=settings.password_hash_argon2_parallelism,
+    )
+
+
+def _time_hash(policy: PasswordHashPolicy) -> float:
+    """Return the fastest of a few hash timings for a policy, in seconds."""
+    context = policy.build_context()
+    timings = []
+    for _ in range(CALIBRATION_SAMPLES):
+        start = time.perf_counter()
+        context.hash("calibration-password")
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def calibrate_password_policy(
+    policy: PasswordHashPolicy, target_ms: int
+) -> PasswordHashPolicy:
+    """Pick the cost that makes one hash take about ``target_ms`` here.
+
+    bcrypt cost is exponential (each round doubles the work) and argon2
+    time_cost is linear, so both are extrapolated from a single cheap timing.
+    Blocks for roughly a second; run it off the event loop.
+    """
+    target = target_ms / 1000
+    if policy.scheme == "bcrypt":
+        low, high = BCRYPT_ROUNDS_RANGE
+        elapsed = _time_hash(PasswordHashPolicy("bcrypt", low))
+        cost = low + round(math.log2(max(target / elapsed, 1)))
+    else:
+        low, high = ARGON2_TIME_COST_RANGE
+        probe = PasswordHashPolicy(
+            "argon2",
+            low,
+            argon2_memory_kib=policy.argon2_memory_kib,
+            argon2_parallelism=policy.argon2_parallelism,
+        )
+        cost = round(low * target / _time_hash(probe))
+
+    return PasswordHashPolicy(
+        scheme=policy.scheme,
+        cost=min(max(cost, low), high),
+        tolerance=1,
+        argon2_memory_kib=policy.argon2_memory_kib,
+        argon2_parallelism=policy.argon2_parallelism,
+    )
+
+
+class PasswordHashingUnavailable(HTTPException):
+    """Raised when the password hashing queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service is busy, please retry shortly",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class PasswordHashingPool:
+    """Dedicated thread pool with a queue-depth limit and wait-time metrics."""
+
+    def __init__(self, max_workers: int, max_queue: int, retry_after: int = 1):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="password-hash"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        # Metrics
+        self.started = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._recent_waits: deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """Run ``func(*args)`` on the pool without blocking the event loop."""
+        self._acquire()
+        try:
+            future = self._executor.submit(
+                self._timed, time.perf_counter(), func, args
+            )
+        except BaseException:
+            self._release()
+            raise
+        # Released on completion or cancellation (a cancelled request may
+        # cancel work that never started)
+        future.add_done_callback(self._release)
+        with timed("hash"):
+            return await asyncio.wrap_future(future)
+
+    def _acquire(self):
+        """Reserve a slot or fail fast if workers and queue are all taken."""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordHashingUnavailable(self.retry_after)
+            self._pending += 1
+
+    def _release(self, future: Optional[Future] = None):
+        """Free the slot taken by ``_acquire``."""
+        with self._lock:
+            self._pending -= 1
+
+    def _timed(self, enqueued_at: float, func: Callable[..., Any], args: tuple):
+        """Worker-side wrapper recording how long the call sat in the queue."""
+        wait = time.perf_counter() - enqueued_at
+        with self._lock:
+            self.started += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self._recent_waits.append(wait)
+        return func(*args)
+
+    @property
+    def in_flight(self) -> int:
+        """Hashes currently running or queued."""
+        return self._pending
+
+    def stats(self) -> dict:
+        """Return pool occupancy and queue wait metrics (seconds)."""
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            pending = self._pending
+            started = self.started
+
+        def percentile(fraction: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(len(waits) * fraction))]
+
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": pending,
+            "queued": max(0, pending - self.max_workers),
+            "started": started,
+            "rejected": self.rejected,
+            "wait_avg": self.total_wait / started if started else 0.0,
+            "wait_p50": percentile(0.50),
+            "wait_p99": percentile(0.99),
+            "wait_max": self.max_wait,
+        }
+
+    def shutdown(self):
+        """Stop the worker threads, cancelling hashes that have not started."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global password hashing pool
+password_hashing_pool = PasswordHashingPool(
+    max_workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue,
+    retry_after=settings.password_hash_retry_after_seconds,
+)
@@ -0,0 +1,102 @@
+"""
+Cached principal snapshots for authenticated requests.
+
+Authorization only needs a user's identity, status and role names. Those are
+cached per process as an immutable ``Principal`` so hot authenticated
+endpoints skip the user and role queries. Services that change any of them
+call ``invalidate_principal``, which drops the entry in every worker over
+Redis pub/sub (``app.core.broadcast``); without Redis the TTL bounds
+staleness in other workers.
+
+In claims-trusted mode (``AUTH_TRUST_TOKEN_CLAIMS``) the principal is built
+straight from the verified access token instead, see ``app.core.revocation``.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+from app.core.broadcast import invalidation_broadcast
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# Pub/sub channel carrying JSON lists of user ids whose principal changed
+PRINCIPAL_CHANNEL = "principal_invalidations"
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Immutable snapshot of the fields authorization checks rely on."""
+
+    id: int
+    email: str
+    is_active: bool
+    is_admin: bool
+    roles: tuple[str, ...]
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        """Build a snapshot from a ``User`` with its roles loaded."""
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=bool(user.is_active),
+            is_admin=bool(user.is_admin),
+            roles=tuple(user.get_role_names()),
+        )
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> "Principal":
+        """Build a snapshot from a verified access-token payload."""
+        return cls(
+            id=int(payload["sub"]),
+            email=payload.get("email", ""),
+            is_active=bool(payload.get("is_active", True)),
+            is_admin=bool(payload.get("is_admin", False)),
+            roles=tuple(payload.get("roles", ())),
+        )
+
+    def has_role(self, role_name: str) -> bool:
+        """Check if the principal has a specific role."""
+        return role_name in self.roles
+
+    def get_role_names(self) -> list[str]:
+        """Get list of role names for this principal."""
+        return list(self.roles)
+
+
+# user_id -> Principal
+principal_cache = TTLCache(
+    max_size=settings.principal_cache_max_size,
+    ttl=settings.principal_cache_ttl_seconds,
+)
+
+
+def get_cached_principal(user_id: int) -> Optional[Principal]:
+    """Return the cached principal of a user, if any."""
+    return principal_cache.get(user_id)
+
+
+def cache_principal(principal: Principal):
+    """Cache a principal until it is invalidated or expires."""
+    principal_cache.set(principal.id, principal)
+
+
+def _drop_principals(user_ids: list[int]):
+    for user_id in user_ids:
+        principal_cache.pop(user_id)
+
+
+def invalidate_principal(user_id: int):
+    """Drop a user's cached principal after their account or roles change.
+
+    Every worker drops it when the message arrives, this one included, which
+    also catches a stale snapshot cached here by a request racing the change.
+    """
+    principal_cache.pop(user_id)
+    invalidation_broadcast.run_soon(
+        invalidation_broadcast.publish, PRINCIPAL_CHANNEL, [user_id]
+    )
+
+
+invalidation_broadcast.on(
+    PRINCIPAL_CHANNEL, _drop_principals, resync=principal_cache.clear
+)
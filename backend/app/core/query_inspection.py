@@ -0,0 +1,154 @@
+"""
+Per-request SQL query inspection.
+
+Every statement executed while a request is being handled is counted per
+statement *shape* (the SQL text with IN-lists and multi-row VALUES collapsed,
+parameters being bound separately already). The number of queries and the
+time spent in them come from the request's timings (``db`` phase, see
+``app.core.timing``). When the request finishes:
+
+- more than ``DB_QUERY_BUDGET`` queries flags the request as over budget,
+- one shape executed more than ``DB_REPEATED_QUERY_THRESHOLD`` times flags a
+  likely N+1 pattern (lazy relationship loads in a loop).
+
+Flagged requests are counted per endpoint and logged as a warning with the
+repeated statements. With ``DB_REPEATED_QUERY_RAISE=true`` (meant for
+development and tests) the offending execution raises ``RepeatedQueryError``
+instead, so N+1 patterns fail loudly where they are introduced.
+"""
+
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, Optional
+from sqlalchemy import event
+from app.core.config import settings
+from app.core.timing import RequestTimings, current_request_timings
+
+# Bound parameter placeholders of the supported drivers: ?, $1, %s, %(name)s, :name
+_PLACEHOLDER = r"(?:\?|\$\d+|%s|%\(\w+\)s|:\w+)"
+_PARAMETER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_REPEATED_LISTS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+# Longest statement text put in logs and errors
+MAX_STATEMENT_LENGTH = 300
+
+
+class RepeatedQueryError(RuntimeError):
+    """A statement ran more often in one request than the threshold allows."""
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    """Normalize SQL so executions differing only in parameters compare equal.
+
+    Cached: statements come from SQLAlchemy's compiled cache, so the same few
+    strings are seen over and over.
+    """
+    shape = _PARAMETER_LIST.sub("(?)", statement)
+    shape = _REPEATED_LISTS.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def _truncate(statement: str) -> str:
+    if len(statement) <= MAX_STATEMENT_LENGTH:
+        return statement
+    return statement[:MAX_STATEMENT_LENGTH] + "..."
+
+
+class QueryInspector:
+    """Count statements per request and flag budget and N+1 violations."""
+
+    def __init__(
+        self,
+        query_budget: int = 20,
+        repeat_threshold: int = 10,
+        raise_on_repeat: bool = False,
+    ):
+        # 0 disables the corresponding check
+        self.query_budget = query_budget
+        self.repeat_threshold = repeat_threshold
+        self.raise_on_repeat = raise_on_repeat
+
+        # Metrics, per endpoint
+        self.over_budget: Dict[str, int] = defaultdict(int)
+        self.repeated: Dict[str, int] = defaultdict(int)
+        self.raised = 0
+
+    def instrument(self, engine):
+        """Count statements run on a (sync) SQLAlchemy engine.
+
+        For an ``AsyncEngine`` pass its ``sync_engine``. Instrument before
+        ``app.core.timing.instrument_engine`` so a raised error is not timed.
+        """
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def count_statement(conn, cursor, statement, parameters, context, many):
+            timings = current_request_timings()
+            if timings is None:
+                return
+            shape = statement_shape(statement)
+            count = timings.statements.get(shape, 0) + 1
+            timings.statements[shape] = count
+            if self.raise_on_repeat and count > self.repeat_threshold > 0:
+                self.raised += 1
+                raise RepeatedQueryError(
+                    f"Statement ran {count} times in one request "
+                    f"(DB_REPEATED_QUERY_THRESHOLD={self.repeat_threshold}), "
+                    f"likely an N+1 lazy load: {_truncate(shape)}"
+                )
+
+    def inspect_request(
+        self, endpoint: str, timings: RequestTimings
+    ) -> Optional[Dict[str, Any]]:
+        """Check a finished request's queries.
+
+        Returns ``None`` when it is within limits, else the details to log.
+        """
+        queries = timings.phase_count("db")
+        over_budget = 0 < self.query_budget < queries
+        repeated = []
+        if self.repeat_threshold > 0:
+            repeated = sorted(
+                (
+                    (count, shape)
+                    for shape, count in timings.statements.items()
+                    if count > self.repeat_threshold
+                ),
+                reverse=True,
+            )
+        if not over_budget and not repeated:
+            return None
+
+        if over_budget:
+            self.over_budget[endpoint] += 1
+        if repeated:
+            self.repeated[endpoint] += 1
+        db_time = timings.phases.get("db", (0.0,))[0]
+        return {
+            "queries": queries,
+            "query_budget": self.query_budget,
+            "db_time": db_time,
+            "repeated_statements": [
+                {"count": count, "statement": _truncate(shape)}
+                for count, shape in repeated[:3]
+            ],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "query_budget": self.query_budget,
+            "repeat_threshold": self.repeat_threshold,
+            "over_budget": dict(self.over_budget),
+            "repeated": dict(self.repeated),
+            "raised": self.raised,
+        }
+
+
+# Global query inspector
+query_inspector = QueryInspector(
+    query_budget=settings.db_query_budget,
+    repeat_threshold=settings.db_repeated_query_threshold,
+    raise_on_repeat=settings.db_repeated_query_raise,
+)
@@ -0,0 +1,47 @@
+"""
+Process-wide async Redis client.
+
+Session caching, session validation and Redis-backed rate limiting share one
+client and connection pool per process, instead of building a client (and
+pool) per operation. The pool is bounded (``REDIS_MAX_CONNECTIONS``); a
+request finding it exhausted waits up to ``REDIS_POOL_TIMEOUT_SECONDS`` for a
+connection. Socket timeouts are short so an unreachable Redis makes callers
+fall back to the database (or in-memory rate limits) quickly rather than
+stalling requests.
+
+The client is created on first use (or at startup) and closed on shutdown.
+"""
+
+from typing import Optional
+import redis.asyncio as redis
+from app.core.config import settings
+
+_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """Return the shared client, creating it on first use.
+
+    Creating it does not connect; connections are opened by the pool as
+    commands need them.
+    """
+    global _client
+    if _client is None:
+        pool = redis.BlockingConnectionPool.from_url(
+            settings.redis_url,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout_seconds,
+            socket_timeout=settings.redis_socket_timeout_seconds,
+            socket_connect_timeout=settings.redis_socket_timeout_seconds,
+            health_check_interval=settings.redis_health_check_interval_seconds,
+        )
+        _client = redis.Redis.from_pool(pool)
+    return _client
+
+
+async def close_redis():
+    """Close the shared client and its pool's connections."""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
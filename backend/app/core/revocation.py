@@ -0,0 +1,172 @@
+"""
+Access-token revocation for claims-trusted authorization.
+
+With ``AUTH_TRUST_TOKEN_CLAIMS`` enabled, access tokens are authorized from
+their claims alone, so logouts and changes to a user's roles or account
+status are recorded here to take effect before the token expires. Entries
+only need to outlive the tokens they reject and are purged after that.
+
+Checks read the in-process list only. In claims-trusted mode revocations are
+also stored in Redis (sorted sets scored by when they can be dropped) and
+announced to every worker over pub/sub (``app.core.broadcast``); a worker
+(re)subscribing reloads them from Redis, so none are missed while it was not
+listening.
+Without Redis, a revocation recorded in another worker is missed until the
+(short, claims-mode) access token expires.
+"""
+
+import json
+import threading
+import time
+from app.core.broadcast import invalidation_broadcast
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+# How often revocations are swept for entries that can no longer match
+PURGE_INTERVAL_SECONDS = 60
+
+# Redis: session_id scored by expiry, and "user_id:not_before_ms" scored by
+# when the cutoff can be dropped
+REVOKED_SESSIONS_KEY = "revoked_access_sessions"
+REVOKED_USERS_KEY = "revoked_access_users"
+# Pub/sub channel announcing new revocations
+REVOCATION_CHANNEL = "access_token_revocations"
+
+
+def issued_at_ms(payload: dict) -> int:
+    """Issue time of a token in milliseconds.
+
+    ``iat_ms`` is set by ``create_access_token``; ``iat`` (whole seconds,
+    rounded down) covers tokens minted before it was.
+    """
+    issued = payload.get("iat_ms")
+    if issued is None:
+        issued = payload.get("iat", 0) * 1000
+    return issued
+
+
+class TokenRevocationList:
+    """Revoked access-token sessions and per-user "not before" cutoffs."""
+
+    def __init__(self):
+        # session_id -> wall-clock time its access tokens expire
+        self._sessions: dict[str, float] = {}
+        # user_id -> (not_before in ms, wall-clock time the entry can be dropped)
+        self._users: dict[int, tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+
+    def revoke_session(self, session_id: str, expires_at: float):
+        """Reject access tokens of a session until they expire."""
+        self._add_session(session_id, expires_at)
+        if settings.auth_trust_token_claims:
+            invalidation_broadcast.run_soon(
+                self._store, REVOKED_SESSIONS_KEY, session_id, expires_at
+            )
+
+    def revoke_user(self, user_id: int):
+        """Reject every access token issued to a user until now."""
+        now = time.time()
+        not_before = int(now * 1000)
+        keep_until = now + settings.access_token_lifetime_minutes * 60
+        self._add_user(user_id, not_before, keep_until)
+        if settings.auth_trust_token_claims:
+            invalidation_broadcast.run_soon(
+                self._store, REVOKED_USERS_KEY, f"{user_id}:{not_before}", keep_until
+            )
+
+    def is_revoked(self, payload: dict) -> bool:
+        """Check a verified access-token payload against recorded revocations."""
+        session_id = payload.get("session_id")
+        if session_id is not None and session_id in self._sessions:
+            return True
+
+        entry = self._users.get(int(payload["sub"]))
+        # Inclusive: a token minted in the same millisecond may predate it
+        return entry is not None and issued_at_ms(payload) <= entry[0]
+
+    def _add_session(self, session_id: str, expires_at: float):
+        with self._lock:
+            self._sessions[session_id] = max(
+                expires_at, self._sessions.get(session_id, 0)
+            )
+            self._maybe_purge()
+
+    def _add_user(self, user_id: int, not_before: int, keep_until: float):
+        with self._lock:
+            current = self._users.get(user_id)
+            if current is not None:
+                not_before = max(not_before, current[0])
+                keep_until = max(keep_until, current[1])
+            self._users[user_id] = (not_before, keep_until)
+            self._maybe_purge()
+
+    def _add_member(self, key: str, member: str, score: float):
+        """Record a revocation stored under ``key`` in Redis."""
+        if key == REVOKED_SESSIONS_KEY:
+            self._add_session(member, score)
+        else:
+            user_id, not_before = member.split(":")
+            self._add_user(int(user_id), int(not_before), score)
+
+    def apply(self, message: list):
+        """Apply a revocation published by any worker."""
+        key, member, score = message
+        self._add_member(key, member, score)
+
+    async def _store(self, key: str, member: str, score: float):
+        """Persist a revocation in Redis and announce it (best effort)."""
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                pipe.zadd(key, {member: score})
+                pipe.zremrangebyscore(key, "-inf", time.time())
+                pipe.publish(REVOCATION_CHANNEL, json.dumps([key, member, score]))
+                await pipe.execute()
+        except Exception:
+            pass  # Redis is optional
+
+    async def load(self):
+        """Merge in the live revocations stored in Redis."""
+        now = time.time()
+        for key in (REVOKED_SESSIONS_KEY, REVOKED_USERS_KEY):
+            entries = await get_redis().zrangebyscore(
+                key, now, "+inf", withscores=True
+            )
+            for member, score in entries:
+                self._add_member(key, member.decode(), score)
+
+    def _maybe_purge(self):
+        """Drop entries that can no longer match a live token (lock held)."""
+        if time.monotonic() < self._next_purge:
+            return
+        self._next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+
+        now = time.time()
+        self._sessions = {
+            sid: exp for sid, exp in self._sessions.items() if exp > now
+        }
+        self._users = {
+            uid: entry for uid, entry in self._users.items() if entry[1] > now
+        }
+
+
+# Global revocation list, kept in sync across workers
+token_revocations = TokenRevocationList()
+invalidation_broadcast.on(
+    REVOCATION_CHANNEL, token_revocations.apply, resync=token_revocations.load
+)
+
+
+def revoke_session_tokens(session_id: str, expires_at: float):
+    """Revoke the access tokens of a login session (e.g. on logout)."""
+    token_revocations.revoke_session(session_id, expires_at)
+
+
+def revoke_user_tokens(user_id: int):
+    """Revoke a user's outstanding access tokens after their claims change."""
+    token_revocations.revoke_user(user_id)
+
+
+def is_token_revoked(payload: dict) -> bool:
+    """Check whether a verified access-token payload has been revoked."""
+    return token_revocations.is_revoked(payload)
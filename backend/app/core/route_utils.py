@@ -0,0 +1,87 @@
+"""
+Helpers for inspecting the application's routes from middleware.
+"""
+
+from typing import Iterable, Iterator, Optional
+
+# Methods kept as-is in metric labels; anything else is reported as "OTHER"
+HTTP_METHODS = frozenset(
+    {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "TRACE"}
+)
+
+
+def iter_routes(routes: Iterable) -> Iterator:
+    """Yield routes with included routers flattened.
+
+    Older FastAPI versions copy included routes into the parent router as
+    prefixed ``APIRoute`` objects; newer ones keep included routers as nested
+    objects exposing ``effective_route_contexts()``. Either way the yielded
+    objects carry the full ``path_format``, ``path_regex``, ``methods`` and
+    ``endpoint``.
+    """
+    for route in routes:
+        effective_route_contexts = getattr(route, "effective_route_contexts", None)
+        if effective_route_contexts is not None:
+            yield from effective_route_contexts()
+        else:
+            yield route
+
+
+def get_route_templates(app) -> list[tuple]:
+    """List ``(path_regex, methods, path_format)`` for every route and mount."""
+    return [
+        (route.path_regex, getattr(route, "methods", None), route.path_format)
+        for route in iter_routes(getattr(getattr(app, "router", None), "routes", []))
+        if hasattr(route, "path_regex")
+    ]
+
+
+def get_route_paths(app) -> dict:
+    """Map each route a request can be handled by (by ``id``) to its full template.
+
+    Routers store the matched route in ``scope["route"]``. With nested
+    included routers that is the router's own route, whose ``path_format``
+    lacks the include prefix, so it is looked up here instead. A route
+    included under several prefixes is ambiguous and maps to ``None``.
+    Routes compare by value, hence keyed by ``id``; they live as long as the
+    app.
+    """
+    route_paths = {}
+    for route in iter_routes(getattr(getattr(app, "router", None), "routes", [])):
+        if not hasattr(route, "path_format"):
+            continue
+        key = id(getattr(route, "original_route", route))
+        route_paths[key] = None if key in route_paths else route.path_format
+    return route_paths
+
+
+def get_scope_route_template(route_paths: dict, scope) -> Optional[str]:
+    """Return the template of the route that handled a request, if any.
+
+    Only set once the app has run; requests no route matched (404s, slash
+    redirects) have none.
+    """
+    route = scope.get("route")
+    if route is None:
+        return None
+    if id(route) in route_paths:
+        return route_paths[id(route)]
+    return getattr(route, "path_format", None)
+
+
+def match_route_template(
+    route_templates: list[tuple], method: str, path: str
+) -> Optional[str]:
+    """Return the template of the route a request path resolves to.
+
+    Routes whose method doesn't match are only used when no route does (the
+    request then gets a 405, but is still labelled by its template).
+    """
+    fallback = None
+    for path_regex, methods, path_format in route_templates:
+        if path_regex.match(path):
+            if not methods or method in methods:
+                return path_format
+            if fallback is None:
+                fallback = path_format
+    return fallback
@@ -2,15 +2,32 @@
 Security utilities for authentication and authorization.
 """
 
+import hashlib
+import time
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.timing import timed
+from app.core.password_hashing import (
+    PasswordHashPolicy,
+    get_configured_password_policy,
+    password_hashing_pool,
+)
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context, replaced by the calibrated policy at startup
+pwd_context = get_configured_password_policy().build_context()
+
+# sha256(token) -> verified payload, each entry dropped at the token's expiry
+verified_token_cache = TTLCache(max_size=settings.jwt_verify_cache_max_size, ttl=0)
+
+
+def configure_password_hashing(policy: PasswordHashPolicy):
+    """Hash new passwords with ``policy`` and flag other hashes for rehash."""
+    global pwd_context
+    pwd_context = policy.build_context()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -23,21 +40,53 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """Verify a password, also returning a new hash if the stored one is outdated."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the password hashing pool."""
+    return await password_hashing_pool.run(
+        verify_password, plain_password, hashed_password
+    )
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """Verify and possibly rehash a password on the password hashing pool."""
+    return await password_hashing_pool.run(
+        verify_and_update_password, plain_password, hashed_password
+    )
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the password hashing pool."""
+    return await password_hashing_pool.run(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token with enhanced payload."""
     to_encode = data.copy()
+    # Aware UTC datetimes so exp/iat are true epoch seconds (revocation
+    # cutoffs are compared against iat)
+    now = datetime.now(timezone.utc)
     if expires_delta:
-        expire = datetime.now() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.now() + timedelta(
-            minutes=settings.access_token_expire_minutes
-        )
+        expire = now + timedelta(minutes=settings.access_token_lifetime_minutes)
 
     to_encode.update(
         {
             "exp": expire,
             "type": "access",
-            "iat": datetime.now(),
+            "iat": now,
+            # Sub-second issue time, so revocations recorded later in the
+            # same second still reject the token
+            "iat_ms": int(now.timestamp() * 1000),
             "token_version": 1,  # For future token invalidation
         }
     )
@@ -50,13 +99,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT refresh token."""
     to_encode = data.copy()
+    now = datetime.now(timezone.utc)
     if expires_delta:
-        expire = datetime.now() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.now() + timedelta(days=settings.refresh_token_expire_days)
+        expire = now + timedelta(days=settings.refresh_token_expire_days)
 
     to_encode.update(
-        {"exp": expire, "type": "refresh", "iat": datetime.now(), "token_version": 1}
+        {"exp": expire, "type": "refresh", "iat": now, "token_version": 1}
     )
     encoded_jwt = jwt.encode(
         to_encode, settings.secret_key, algorithm=settings.algorithm
@@ -64,7 +114,9 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None)
     return encoded_jwt
 
 
-def create_tokens(user_id: int, email: str, roles: list[str]) -> dict:
+def create_tokens(
+    user_id: int, email: str, roles: list[str], is_active: bool = True
+) -> dict:
     """Create both access and refresh tokens with role and session information."""
     session_id = str(uuid.uuid4())  # Generate unique session ID
 
@@ -73,6 +125,7 @@ def create_tokens(user_id: int, email: str, roles: list[str]) -> dict:
         "email": email,
         "roles": roles,  # Include user roles in token
         "is_admin": "admin" in roles,  # Backward compatibility
+        "is_active": is_active,  # Authorized from claims in claims-trusted mode
         "session_id": session_id,  # Add session tracking
         "login_time": datetime.now().isoformat(),  # Track when token was created
     }
@@ -90,26 +143,57 @@ def create_tokens(user_id: int, email: str, roles: list[str]) -> dict:
     }
 
 
-def verify_token(token: str, token_type: str = "access") -> Optional[dict]:
-    """Verify and decode a JWT token."""
+def hash_session_token(token: str) -> bytes:
+    """Return the SHA-256 digest a session token is stored and cached under.
+
+    Session tokens carry 512 random bits, so an unsalted fast hash is enough
+    to keep a leaked database or cache from yielding usable cookies.
+    """
+    return hashlib.sha256(token.encode()).digest()
+
+
+def decode_token(token: str) -> Optional[dict]:
+    """Decode a JWT and check its signature, without any caching."""
     try:
-        payload = jwt.decode(
-            token, settings.secret_key, algorithms=[settings.algorithm]
-        )
+        return jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        return None
 
-        # Check token type
-        if payload.get("type") != token_type:
+
+@timed("jwt")
+def verify_token(token: str, token_type: str = "access") -> Optional[dict]:
+    """Verify and decode a JWT token.
+
+    Verified payloads are cached until the token expires, so repeat requests
+    with the same token skip signature checking and decoding. Callers get a
+    copy they are free to modify.
+    """
+    cache_key = hashlib.sha256(token.encode()).digest()
+    payload = verified_token_cache.get(cache_key)
+    if payload is None:
+        payload = decode_token(token)
+        if payload is None:
             return None
 
-        # Check expiration
         exp = payload.get("exp")
-        if exp is None or datetime.now() > datetime.fromtimestamp(exp):
-            return None
+        if isinstance(exp, (int, float)):
+            verified_token_cache.set(
+                cache_key,
+                payload,
+                expires_at=time.monotonic() + (exp - time.time()),
+            )
+
+    # Check token type
+    if payload.get("type") != token_type:
+        return None
 
-        return payload
-    except JWTError:
+    # Check expiration
+    exp = payload.get("exp")
+    if exp is None or time.time() > exp:
         return None
 
+    return dict(payload)
+
 
 def validate_password_strength(password: str) -> tuple[bool, str]:
     """Validate password meets security requirements."""
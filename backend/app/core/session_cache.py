@@ -0,0 +1,91 @@
+"""
+Per-process (L1) cache for session validation.
+
+``SessionValidationMiddleware`` checks the session token of every protected
+request. Tokens found valid are cached here as ``(user_id, expires_at)`` for
+up to ``SESSION_CACHE_TTL_SECONDS`` (never past the session's expiry), tokens
+found invalid for ``SESSION_CACHE_NEGATIVE_TTL_SECONDS`` in a separate cache
+so a flood of unknown tokens cannot evict valid ones. Misses go to the Redis
+session cache (L2), then the database. Tokens are identified by their
+SHA-256 digest (hex), as stored in the database and Redis.
+
+Revoking sessions drops them here and publishes their digests on a Redis
+channel every worker subscribes to (``app.core.broadcast``), so a revoked
+session stops validating in all workers at once. While the subscription is
+down, other workers' revocations take effect within the TTL; the cache is
+cleared whenever the subscription is re-established, since messages may
+have been missed.
+"""
+
+from datetime import datetime
+from typing import Iterable, Optional
+from app.core.broadcast import invalidation_broadcast
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# Redis pub/sub channel carrying JSON lists of revoked session token digests
+INVALIDATION_CHANNEL = "session_invalidations"
+
+# Cached result for tokens known not to belong to an active session
+SESSION_INVALID = object()
+
+
+class SessionValidationCache:
+    """Recently validated (and rejected) session tokens."""
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float):
+        self.valid = TTLCache(max_size=max_size, ttl=ttl)
+        self.invalid = TTLCache(max_size=max_size, ttl=negative_ttl)
+        self.invalidations = 0
+
+    def get(self, token: str):
+        """Return ``(user_id, expires_at)``, ``SESSION_INVALID`` or ``None``."""
+        entry = self.valid.get(token)
+        if entry is None and self.invalid.get(token) is not None:
+            return SESSION_INVALID
+        return entry
+
+    def set_valid(self, token: str, user_id: int, expires_at: Optional[datetime]):
+        """Cache a valid session, at most until it expires."""
+        ttl = self.valid.ttl
+        if expires_at is not None:
+            ttl = min(ttl, (expires_at - datetime.utcnow()).total_seconds())
+        if ttl > 0:
+            self.valid.set(token, (user_id, expires_at), ttl=ttl)
+
+    def set_invalid(self, token: str):
+        """Cache a token that does not belong to an active session."""
+        self.valid.pop(token)
+        self.invalid.set(token, True)
+
+    def invalidate(self, tokens: Iterable[str]):
+        """Mark revoked sessions invalid in this process."""
+        for token in tokens:
+            self.set_invalid(token)
+            self.invalidations += 1
+
+    def clear(self):
+        """Forget every cached validation."""
+        self.valid.clear()
+        self.invalid.clear()
+
+    def stats(self) -> dict:
+        return {
+            "valid": self.valid.stats(),
+            "invalid": self.invalid.stats(),
+            "invalidations": self.invalidations,
+            "subscribed": invalidation_broadcast.subscribed,
+        }
+
+
+# Global session validation cache, kept in sync across workers
+session_validation_cache = SessionValidationCache(
+    max_size=settings.session_cache_max_size,
+    ttl=settings.session_cache_ttl_seconds,
+    negative_ttl=settings.session_cache_negative_ttl_seconds,
+)
+invalidation_broadcast.on(
+    INVALIDATION_CHANNEL,
+    session_validation_cache.invalidate,
+    resync=session_validation_cache.clear,
+)
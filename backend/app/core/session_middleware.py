@@ -1,103 +1,118 @@
 """
 Secure session validation middleware for JWT and session token.
-Uses Redis for fast session lookup with fallback to DB.
+Uses a per-process cache and Redis for fast session lookup with fallback to DB.
 Only validates sessions for protected endpoints.
 """
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from app.db.session import get_db
+from typing import Optional
+from starlette.requests import HTTPConnection
+from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.db.base import AsyncSessionLocal
 from app.services.session_service import SessionService
-import redis.asyncio as redis
-import os
+from app.core.redis_client import get_redis
+from app.core.security import hash_session_token
+from app.core.session_cache import SESSION_INVALID, session_validation_cache
+from app.core.timing import timed
 import json
 from datetime import datetime
 
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-redis_pool = None
-
 # Protected endpoints that require session validation
 PROTECTED_PATHS = ["/api/v1/users", "/api/v1/sessions", "/api/v1/admin"]
 PUBLIC_PATHS = [
     "/api/v1/auth/login",
     "/api/v1/auth/register",
     "/health",
+    "/livez",
+    "/readyz",
     "/docs",
     "/openapi.json",
 ]
 
 
-async def get_redis_client():
-    global redis_pool
-    if redis_pool is None:
-        try:
-            redis_pool = redis.ConnectionPool.from_url(REDIS_URL, max_connections=20)
-        except Exception:
-            return None
-    return redis.Redis(connection_pool=redis_pool)
-
+class SessionValidationMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-class SessionValidationMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Skip validation for public endpoints
-        if any(request.url.path.startswith(path) for path in PUBLIC_PATHS):
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        session_token = request.cookies.get("session_token")
+        path = scope["path"]
 
-        # Only validate for protected endpoints
-        if (
-            any(request.url.path.startswith(path) for path in PROTECTED_PATHS)
-            and session_token
+        # Skip validation for public endpoints, and only validate protected
+        # endpoints that carry a session cookie
+        if not any(path.startswith(p) for p in PUBLIC_PATHS) and any(
+            path.startswith(p) for p in PROTECTED_PATHS
         ):
-            redis_client = await get_redis_client()
+            session_token = HTTPConnection(scope).cookies.get("session_token")
+            if session_token:
+                rejection = await self.validate_session(session_token)
+                if rejection is not None:
+                    await rejection(scope, receive, send)
+                    return
+
+        await self.app(scope, receive, send)
+
+    async def validate_session(self, session_token: str) -> Optional[Response]:
+        """Return an error response if the session is invalid or expired.
+
+        Checks the per-process validation cache first, then Redis, then the
+        database, caching what Redis or the database answered. Both caches
+        are keyed by the token's digest, as stored in the database.
+        """
+        token_key = hash_session_token(session_token).hex()
+        cached = session_validation_cache.get(token_key)
+        if cached is SESSION_INVALID:
+            return Response("Session invalid", status_code=401)
+        if cached is not None:
+            # Entries never outlive the session's expiry
+            return None
+
+        redis_client = get_redis()
+
+        if redis_client:
+            try:
+                with timed("redis"):
+                    session_data = await redis_client.get(f"session:{token_key}")
+                if session_data:
+                    session_info = json.loads(session_data)
+                    expires_at = datetime.fromisoformat(session_info["expires_at"])
+                    # Check expiration
+                    if expires_at < datetime.utcnow():
+                        with timed("redis"):
+                            await redis_client.delete(f"session:{token_key}")
+                        return Response("Session expired", status_code=401)
+                    session_validation_cache.set_valid(
+                        token_key, session_info["user_id"], expires_at
+                    )
+                else:
+                    # Fallback to DB check
+                    return await self.validate_session_in_db(session_token, token_key)
+            except Exception:
+                # Redis error, fallback to DB
+                return await self.validate_session_in_db(session_token, token_key)
 
-            if redis_client:
-                try:
-                    session_data = await redis_client.get(f"session:{session_token}")
-                    if session_data:
-                        session_info = json.loads(session_data)
-                        # Check expiration
-                        if (
-                            datetime.fromisoformat(session_info["expires_at"])
-                            < datetime.utcnow()
-                        ):
-                            await redis_client.delete(f"session:{session_token}")
-                            return Response("Session expired", status_code=401)
-                    else:
-                        # Fallback to DB check
-                        db_gen = get_db()
-                        db = next(db_gen)
-                        try:
-                            session_obj = SessionService.get_session_by_token(
-                                db, session_token
-                            )
-                            if not session_obj or not getattr(
-                                session_obj, "is_active", False
-                            ):
-                                return Response("Session invalid", status_code=401)
-                            # Check expiration
-                            expires_at = getattr(session_obj, "expires_at", None)
-                            if expires_at and expires_at < datetime.utcnow():
-                                SessionService.delete_session_by_token(
-                                    db, session_token
-                                )
-                                return Response("Session expired", status_code=401)
-                        finally:
-                            db.close()
-                except Exception:
-                    # Redis error, fallback to DB
-                    db_gen = get_db()
-                    db = next(db_gen)
-                    try:
-                        session_obj = SessionService.get_session_by_token(
-                            db, session_token
-                        )
-                        if not session_obj or not getattr(
-                            session_obj, "is_active", False
-                        ):
-                            return Response("Session invalid", status_code=401)
-                    finally:
-                        db.close()
+        return None
 
-        return await call_next(request)
+    async def validate_session_in_db(
+        self, session_token: str, token_key: str
+    ) -> Optional[Response]:
+        """Validate a session against the database and cache the outcome."""
+        async with AsyncSessionLocal() as db:
+            session_obj = await SessionService.get_session_by_token_async(
+                db, session_token
+            )
+            if not session_obj or not getattr(session_obj, "is_active", False):
+                session_validation_cache.set_invalid(token_key)
+                return Response("Session invalid", status_code=401)
+            # Check expiration
+            expires_at = getattr(session_obj, "expires_at", None)
+            if expires_at and expires_at < datetime.utcnow():
+                await SessionService.delete_session_by_token_async(db, session_token)
+                return Response("Session expired", status_code=401)
+            session_validation_cache.set_valid(
+                token_key, session_obj.user_id, expires_at
+            )
+        return None
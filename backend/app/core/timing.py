@@ -0,0 +1,214 @@
+"""
+Per-request timing breakdown.
+
+``ServerTimingMiddleware`` opens a timing context for each request; code on
+the request path adds spans to it with ``timed("phase")`` (a context manager
+and decorator), and database queries are timed through SQLAlchemy engine
+events. The totals per phase go into per-endpoint phase histograms in the
+metrics and, optionally, a ``Server-Timing`` header (readable in browser dev
+tools) that leaves out phases revealing account state.
+
+Phases may overlap (a user lookup includes its database query). Outside a
+request ``timed`` costs one context variable lookup.
+"""
+
+import inspect
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Optional
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Server-Timing descriptions of the phases recorded in this app
+PHASE_DESCRIPTIONS = {
+    "jwt": "JWT verification",
+    "user": "User lookup",
+    "db": "Database queries",
+    "hash": "Password hashing",
+    "redis": "Redis",
+    "serialize": "Response serialization",
+}
+
+# Phases kept out of the Server-Timing header: whether and how often they run
+# depends on account state (e.g. a login for an unknown email neither hashes a
+# password nor caches a session), so clients could probe for accounts
+PRIVATE_PHASES = frozenset({"user", "db", "hash", "redis"})
+
+_request_timings: ContextVar[Optional["RequestTimings"]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+class RequestTimings:
+    """Accumulated duration and count per phase for one request.
+
+    ``statements`` counts executions per statement shape, filled in by
+    ``app.core.query_inspection``.
+    """
+
+    __slots__ = ("start", "phases", "statements")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: Dict[str, list] = {}
+        self.statements: Dict[str, int] = {}
+
+    def add(self, phase: str, duration: float):
+        entry = self.phases.get(phase)
+        if entry is None:
+            self.phases[phase] = [duration, 1]
+        else:
+            entry[0] += duration
+            entry[1] += 1
+
+    def phase_count(self, phase: str) -> int:
+        """Return how many spans of ``phase`` were recorded (e.g. queries)."""
+        entry = self.phases.get(phase)
+        return entry[1] if entry is not None else 0
+
+    def durations(self) -> Dict[str, float]:
+        """Return total seconds per phase."""
+        return {phase: entry[0] for phase, entry in self.phases.items()}
+
+    def header(self) -> str:
+        """Format as a ``Server-Timing`` header value (milliseconds).
+
+        ``PRIVATE_PHASES`` are left out; they are reported in the metrics only.
+        """
+        parts = []
+        for phase, (duration, count) in self.phases.items():
+            if phase in PRIVATE_PHASES:
+                continue
+            description = PHASE_DESCRIPTIONS.get(phase, phase)
+            if count > 1:
+                description += f" ({count})"
+            parts.append(f'{phase};dur={duration * 1000:.2f};desc="{description}"')
+        total = time.perf_counter() - self.start
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+def current_request_timings() -> Optional[RequestTimings]:
+    """Return the timings of the request being handled, if any."""
+    return _request_timings.get()
+
+
+def request_phases() -> Optional[Dict[str, float]]:
+    """Return total seconds per phase of the current request, if timed."""
+    timings = _request_timings.get()
+    return timings.durations() if timings is not None else None
+
+
+class timed:
+    """Time a block or function as a phase of the current request.
+
+    Usable as ``with timed("redis"):`` or as ``@timed("jwt")`` on sync and
+    async functions.
+    """
+
+    __slots__ = ("phase", "_timings", "_start")
+
+    def __init__(self, phase: str):
+        self.phase = phase
+
+    def __enter__(self):
+        self._timings = _request_timings.get()
+        if self._timings is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._timings is not None:
+            self._timings.add(self.phase, time.perf_counter() - self._start)
+
+    def __call__(self, func: Callable) -> Callable:
+        phase = self.phase
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(phase):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(phase):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+def instrument_engine(engine):
+    """Time every query run on a (sync) SQLAlchemy engine as the "db" phase.
+
+    For an ``AsyncEngine`` pass its ``sync_engine``.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if _request_timings.get() is not None:
+            conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        timings = _request_timings.get()
+        starts = conn.info.get("query_start_time")
+        if timings is not None and starts:
+            timings.add("db", time.perf_counter() - starts.pop())
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # A failed query never reaches after_cursor_execute
+        connection = exception_context.connection
+        starts = connection.info.get("query_start_time") if connection else None
+        if starts:
+            starts.pop()
+
+
+def instrument_serialization():
+    """Time FastAPI's response model validation and serialization.
+
+    FastAPI exposes no hook around it, so its module-level
+    ``serialize_response`` (looked up at call time by the route handlers) is
+    wrapped.
+    """
+    from fastapi import routing
+
+    if not getattr(routing.serialize_response, "_timed", False):
+        routing.serialize_response = timed("serialize")(routing.serialize_response)
+        routing.serialize_response._timed = True
+
+
+class ServerTimingMiddleware:
+    """Collect request phase timings and report them in ``Server-Timing``.
+
+    Add it outermost so spans from the other middlewares (rate limiting,
+    session validation) are included.
+    """
+
+    def __init__(self, app: ASGIApp, header: bool = False):
+        self.app = app
+        self.header = header
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start" and self.header:
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timings.header())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
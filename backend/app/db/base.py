@@ -1,7 +1,15 @@
 """
 SQLAlchemy base configuration.
+
+Two engines are built from ``settings.database_url``: a sync engine used for
+startup tasks and sync endpoints (which FastAPI runs in its threadpool), and a
+pooled async engine used by every ``async def`` code path so database calls
+never block the event loop. The URL may name either a sync or an async driver;
+the counterpart is derived from it.
 """
 from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
@@ -10,12 +18,67 @@ import os
 # Create data directory if it doesn't exist
 os.makedirs("data", exist_ok=True)
 
+# Default async driver per backend, used when DATABASE_URL names a sync driver
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+
+
+def get_async_database_url(database_url: str) -> URL:
+    """Return the async-driver form of a database URL."""
+    url = make_url(database_url)
+    if url.get_dialect().is_async:
+        return url
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for database backend: {backend}")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def get_sync_database_url(database_url: str) -> URL:
+    """Return the sync-driver form of a database URL."""
+    url = make_url(database_url)
+    if not url.get_dialect().is_async:
+        return url
+    return url.set(drivername=url.get_backend_name())
+
+
+def _engine_options(url: URL) -> dict:
+    """Build pool options for an engine, skipping those its pool can't take."""
+    options = {
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+    if url.get_backend_name() == "sqlite":
+        if not url.get_dialect().is_async:
+            options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            # In-memory SQLite uses a single shared connection, not a sized pool
+            return options
+
+    options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+    )
+    return options
+
+
 # SQLAlchemy setup
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False}  # For SQLite
-)
+_sync_url = get_sync_database_url(settings.database_url)
+engine = create_engine(_sync_url, **_engine_options(_sync_url))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+_async_url = get_async_database_url(settings.database_url)
+async_engine = create_async_engine(_async_url, **_engine_options(_async_url))
+
+# expire_on_commit=False keeps loaded attributes usable after commit without
+# an implicit (and, under asyncio, disallowed) lazy refresh
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+Base = declarative_base(cls=AsyncAttrs)
@@ -2,11 +2,16 @@
 Database session management and dependencies with RBAC support.
 """
 
-from typing import Generator
+from typing import AsyncGenerator, Generator
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.base import SessionLocal
+from app.db.base import AsyncSessionLocal, SessionLocal
+from pathlib import Path
 import os
 
+# Alembic migration scripts (backend/alembic)
+ALEMBIC_DIR = Path(__file__).resolve().parents[2] / "alembic"
+
 
 def get_db() -> Generator[Session, None, None]:
     """Database dependency for FastAPI."""
@@ -17,11 +22,41 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Async database dependency for FastAPI (non-blocking on the event loop)."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def run_migrations(connection, revision: str = "head", stamp: bool = False):
+    """Apply Alembic migrations up to ``revision`` on ``connection``.
+
+    With ``stamp`` the database is only recorded as being at ``revision``.
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    config.attributes["connection"] = connection
+    if stamp:
+        command.stamp(config, revision)
+    else:
+        command.upgrade(config, revision)
+
+
 def create_tables():
-    """Create all database tables."""
+    """Create all database tables, or migrate existing ones.
+
+    A new database gets the current schema and is stamped as up to date; one
+    created by an earlier version (with or without Alembic history) is
+    upgraded first.
+    """
+    from sqlalchemy import inspect
     from app.db.base import Base, engine
     from app.models.user import User  # Import all models to register them
     from app.models.role import Role, user_roles  # Import role models
+    from app.models.session import Session as SessionModel
 
     # Ensure database directory exists
     db_path = os.getenv("DATABASE_URL", "sqlite:///./data/auth.db")
@@ -32,8 +67,14 @@ def create_tables():
             os.makedirs(db_dir, exist_ok=True)
 
     # Ensure all models are loaded
-    _ = User, Role, user_roles
-    Base.metadata.create_all(bind=engine)
+    _ = User, Role, user_roles, SessionModel
+    with engine.begin() as connection:
+        existing = inspect(connection).has_table(SessionModel.__tablename__)
+        if existing:
+            run_migrations(connection)
+        Base.metadata.create_all(bind=connection)
+        if not existing:
+            run_migrations(connection, stamp=True)
 
 
 def init_db():
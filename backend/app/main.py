@@ -3,7 +3,7 @@ Main FastAPI application entry point.
 """
 
 import asyncio
-from fastapi import FastAPI, Request, Depends
+from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response, JSONResponse
 from fastapi.staticfiles import StaticFiles
@@ -12,14 +12,46 @@ from pathlib import Path
 from app.core.config import settings
 from app.api.v1.api import api_router
 from app.db.session import create_tables, init_db
-from app.core.monitoring import MonitoringMiddleware, metrics_collector, logger
+from app.core.monitoring import (
+    MonitoringMiddleware,
+    metrics_collector,
+    logger,
+    log_sink,
+)
 from app.core.custom_rate_limiting import (
     CustomRateLimitMiddleware,
     cleanup_rate_limiter,
 )
+from app.core.password_hashing import (
+    calibrate_password_policy,
+    get_configured_password_policy,
+    password_hashing_pool,
+)
+from app.core.security import configure_password_hashing
+from app.core.openmetrics import (
+    OPENMETRICS_CONTENT_TYPE,
+    PROMETHEUS_CONTENT_TYPE,
+    render_metrics,
+    scrape_authorized,
+    start_metrics_server,
+    wants_openmetrics,
+)
+from app.core.health import health_sampler
+from app.core.log_sampling import access_log_sampler
+from app.core.query_inspection import query_inspector
+from app.core.redis_client import close_redis, get_redis
+from app.core.broadcast import invalidation_broadcast
+from app.core.session_cache import session_validation_cache
+from app.core.multiprocess_metrics import get_metrics_collector, multiprocess_metrics
 from app.core.security_middleware import SecurityHeadersMiddleware
 from app.api.deps import get_current_admin_user
 from app.core.session_middleware import SessionValidationMiddleware
+from app.core.timing import (
+    ServerTimingMiddleware,
+    instrument_engine,
+    instrument_serialization,
+)
+from app.db.base import async_engine, engine
 from datetime import datetime
 
 
@@ -60,6 +92,15 @@ def create_application() -> FastAPI:
     # Enable Gzip compression for responses
     app.add_middleware(GZipMiddleware, minimum_size=500)
 
+    # Time request phases (outermost, so every middleware's spans count) and
+    # inspect each request's queries
+    app.add_middleware(ServerTimingMiddleware, header=settings.server_timing_header)
+    query_inspector.instrument(engine)
+    query_inspector.instrument(async_engine.sync_engine)
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+    instrument_serialization()
+
     # Include API router
     app.include_router(api_router, prefix="/api/v1")
 
@@ -83,6 +124,21 @@ async def startup_event():
     init_db()
     logger.info("Database initialized successfully")
 
+    # Calibrate password hashing cost to this machine
+    policy = get_configured_password_policy()
+    if settings.password_hash_target_ms > 0:
+        policy = await password_hashing_pool.run(
+            calibrate_password_policy, policy, settings.password_hash_target_ms
+        )
+    configure_password_hashing(policy)
+    logger.info("Password hashing policy configured", **policy.describe())
+
+    # Shared Redis client for the session cache (connects on first command)
+    get_redis()
+
+    # Apply cache invalidations and revocations published by other workers
+    invalidation_broadcast.start()
+
     # Start rate limiter cleanup task
     asyncio.create_task(cleanup_rate_limiter())
     logger.info("Rate limiter cleanup task started")
@@ -92,13 +148,12 @@ async def startup_event():
         while True:
             try:
                 from app.services.session_service import SessionService
-                from app.db.session import SessionLocal
+                from app.db.base import AsyncSessionLocal
 
-                db = SessionLocal()
-                cleaned = SessionService.cleanup_expired_sessions(db)
+                async with AsyncSessionLocal() as db:
+                    cleaned = await SessionService.cleanup_expired_sessions_async(db)
                 if cleaned > 0:
                     logger.info(f"Cleaned up {cleaned} expired sessions")
-                db.close()
             except Exception as e:
                 logger.error(f"Session cleanup error: {e}")
             await asyncio.sleep(3600)  # Run every hour
@@ -106,12 +161,38 @@ async def startup_event():
     asyncio.create_task(cleanup_sessions())
     logger.info("Session cleanup task started")
 
+    # Share this worker's metrics with the others (if METRICS_MULTIPROC_DIR is set)
+    if multiprocess_metrics.enabled:
+        multiprocess_metrics.start()
+
+    # Keep /health served from a background sample
+    await health_sampler.sample()
+    asyncio.create_task(health_sampler.run())
+    logger.info("Health sampler started", interval=health_sampler.interval)
+
+    # Standalone metrics listener (if METRICS_PORT is set)
+    app.state.metrics_server = await start_metrics_server()
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown."""
     logger.info("Shutting down FastAPI application")
 
+    metrics_server = getattr(app.state, "metrics_server", None)
+    if metrics_server is not None:
+        metrics_server.close()
+    multiprocess_metrics.stop()
+
+    from app.db.base import async_engine
+
+    await async_engine.dispose()
+    await invalidation_broadcast.stop()
+    await close_redis()
+    password_hashing_pool.shutdown()
+    if log_sink is not None:
+        log_sink.close()
+
 
 @app.get("/")
 async def root(request: Request):
@@ -127,38 +208,64 @@ async def root(request: Request):
 
 @app.get("/health")
 async def health_check(request: Request):
-    """Enhanced health check endpoint with detailed system information."""
-    health_data = metrics_collector.get_health_status()
-
-    # Add database connectivity check
-    try:
-        from app.db.session import SessionLocal
-        from sqlalchemy import text
-
-        db = SessionLocal()
-        db.execute(text("SELECT 1"))
-        db.close()
-        health_data["database"] = "healthy"
-    except Exception as e:
-        health_data["database"] = "unhealthy"
-        health_data["database_error"] = str(e)
-        if health_data["status"] == "healthy":
-            health_data["status"] = "degraded"
-
-    # Return appropriate HTTP status code
-    status_code = 200
-    if health_data["status"] == "degraded":
-        status_code = 200  # Still operational
-    elif health_data["status"] == "unhealthy":
-        status_code = 503  # Service unavailable
-
-    return JSONResponse(content=health_data, status_code=status_code)
+    """Enhanced health check endpoint with detailed system information.
+
+    Served from the report the background sampler refreshes, so polling it
+    costs no system calls or database round trips.
+    """
+    return JSONResponse(
+        content=health_sampler.report, status_code=health_sampler.status_code
+    )
+
+
+@app.get("/livez")
+async def liveness():
+    """Liveness probe: the process is up and its event loop responsive."""
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readiness():
+    """Readiness probe: the database answers and health sampling keeps up."""
+    content, status_code = await health_sampler.readiness()
+    return JSONResponse(content=content, status_code=status_code)
 
 
 @app.get("/metrics")
 async def get_metrics(request: Request, current_user=Depends(get_current_admin_user)):
     """Get application metrics (for monitoring systems). Only accessible by admin users."""
-    return metrics_collector.get_metrics()
+    collector = await get_metrics_collector()
+    return {
+        **collector.get_metrics(),
+        "workers": multiprocess_metrics.workers,
+        "password_hashing": password_hashing_pool.stats(),
+        "logging": log_sink.stats() if log_sink is not None else None,
+        "access_log": access_log_sampler.stats(),
+        "queries": query_inspector.stats(),
+        "session_cache": session_validation_cache.stats(),
+    }
+
+
+@app.get("/metrics/openmetrics", include_in_schema=False)
+async def get_openmetrics(request: Request):
+    """Prometheus/OpenMetrics text metrics for scrapers (scrape token auth)."""
+    if not settings.metrics_scrape_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not scrape_authorized(request.headers.get("authorization")):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid scrape token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    openmetrics = wants_openmetrics(request.headers.get("accept"))
+    collector = await get_metrics_collector()
+    return Response(
+        content=render_metrics(openmetrics, collector),
+        media_type=(
+            OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE
+        ),
+    )
 
 
 @app.get("/status")
@@ -1,23 +1,73 @@
 """
 Session model for user session tracking.
+
+Only a SHA-256 digest of each session token is stored (``token_hash``); the
+raw token lives in the client's cookie and is never persisted.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    Boolean,
+    Index,
+    LargeBinary,
+    text,
+)
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.base import Base
 
+# Partial index predicate for active sessions. SQLite only uses a partial
+# index when the query repeats the predicate as written, and queries render
+# the boolean filter as "is_active = 1" there
+ACTIVE_SQLITE = text("is_active = 1")
+
+# Size of a SHA-256 digest; stored as BINARY(32) on MySQL (BLOB can't be
+# indexed without a prefix length)
+TOKEN_HASH_SIZE = 32
+TokenHash = LargeBinary(TOKEN_HASH_SIZE).with_variant(
+    mysql.BINARY(TOKEN_HASH_SIZE), "mysql"
+)
+
 
 class Session(Base):
     __tablename__ = "sessions"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    token = Column(String, unique=True, nullable=False)
+    token_hash = Column(TokenHash, nullable=False)
     user_agent = Column(String, nullable=True)
     ip_address = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime, nullable=True)
     is_active = Column(Boolean, default=True)
 
+    # Raw token, only known on a session just created (not a column)
+    token = None
+
     user = relationship("User", back_populates="sessions")
+
+    __table_args__ = (
+        # Validation: one probe of a fixed-size unique key
+        Index("ix_sessions_token_hash", "token_hash", unique=True),
+        # Listing and revoking a user's active sessions (partial where the
+        # database supports it)
+        Index(
+            "ix_sessions_user_id_active",
+            "user_id",
+            "expires_at",
+            postgresql_where=is_active,
+            sqlite_where=ACTIVE_SQLITE,
+        ),
+        # Expired session cleanup
+        Index(
+            "ix_sessions_expires_at_active",
+            "expires_at",
+            postgresql_where=is_active,
+            sqlite_where=ACTIVE_SQLITE,
+        ),
+    )
@@ -3,9 +3,13 @@ Role service for managing roles and permissions.
 """
 
 from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.role import Role, RoleType
 from app.models.user import User
+from app.core.principal import invalidate_principal
+from app.core.revocation import revoke_user_tokens
 
 
 class RoleService:
@@ -49,6 +53,8 @@ class RoleService:
         if role not in user.roles:
             user.roles.append(role)
             db.commit()
+            invalidate_principal(user.id)
+            revoke_user_tokens(user.id)
         
         return True
     
@@ -62,6 +68,8 @@ class RoleService:
         if role in user.roles:
             user.roles.remove(role)
             db.commit()
+            invalidate_principal(user.id)
+            revoke_user_tokens(user.id)
         
         return True
     
@@ -72,4 +80,63 @@ class RoleService:
         
         # If user is marked as admin, also assign ADMIN role
         if user.is_admin:
-            RoleService.assign_role_to_user(db, user, RoleType.ADMIN)
\ No newline at end of file
+            RoleService.assign_role_to_user(db, user, RoleType.ADMIN)
+
+    # Async variants (AsyncSession), used from async endpoints and dependencies
+
+    @staticmethod
+    async def get_role_by_name_async(db: AsyncSession, name: str) -> Optional[Role]:
+        """Get role by name."""
+        result = await db.execute(select(Role).where(Role.name == name))
+        return result.scalars().first()
+
+    @staticmethod
+    async def get_all_roles_async(db: AsyncSession) -> list[Role]:
+        """Get all roles."""
+        result = await db.execute(select(Role))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def assign_role_to_user_async(
+        db: AsyncSession, user: User, role_name: str
+    ) -> bool:
+        """Assign a role to a user."""
+        role = await RoleService.get_role_by_name_async(db, role_name)
+        if not role:
+            return False
+
+        roles = await user.awaitable_attrs.roles
+        if role not in roles:
+            roles.append(role)
+            await db.commit()
+            invalidate_principal(user.id)
+            revoke_user_tokens(user.id)
+
+        return True
+
+    @staticmethod
+    async def remove_role_from_user_async(
+        db: AsyncSession, user: User, role_name: str
+    ) -> bool:
+        """Remove a role from a user."""
+        role = await RoleService.get_role_by_name_async(db, role_name)
+        if not role:
+            return False
+
+        roles = await user.awaitable_attrs.roles
+        if role in roles:
+            roles.remove(role)
+            await db.commit()
+            invalidate_principal(user.id)
+            revoke_user_tokens(user.id)
+
+        return True
+
+    @staticmethod
+    async def assign_default_role_async(db: AsyncSession, user: User) -> None:
+        """Assign default USER role to a new user."""
+        await RoleService.assign_role_to_user_async(db, user, RoleType.USER)
+
+        # If user is marked as admin, also assign ADMIN role
+        if user.is_admin:
+            await RoleService.assign_role_to_user_async(db, user, RoleType.ADMIN)
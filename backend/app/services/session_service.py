@@ -1,17 +1,304 @@
 """
 Secure session service for creating, listing, and deleting user sessions.
+
+The database is the durable session store. Sessions are stored, cached and
+revoked by the SHA-256 digest of their token (``token_hash``); the raw token
+is only handed to the client. Redis, when available, caches each session
+under ``session:{digest}`` (hex) for validation and keeps a per-user index
+hash ``user_sessions:{user_id}`` (digest -> session details) that serves
+session listings in one call; writes go to both. Revocations also bump
+``user_sessions_revision:{user_id}``, so an index rebuilt from a database read
+that a revocation overtook is not written.
 """
 
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session as DBSession
 from app.models.session import Session as SessionModel
 from app.models.user import User
+from app.core.redis_client import get_redis
+from app.core.security import hash_session_token
+from app.core.session_cache import INVALIDATION_CHANNEL, session_validation_cache
+from app.core.timing import timed
 from datetime import datetime, timedelta
+from anyio import from_thread
 import secrets
-import redis.asyncio as redis
 import json
-import os
 
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Session cache keys removed per UNLINK command
+UNCACHE_CHUNK_SIZE = 500
+# Expired sessions deactivated per statement (and transaction) by the cleanup
+CLEANUP_BATCH_SIZE = 5000
+
+# Per-user session index: a hash of token digest -> session details. It is only
+# trusted for listings once rebuilt from the database, which sets this field
+INDEX_COMPLETE_FIELD = "_complete"
+# TTL of an index holding no sessions
+EMPTY_INDEX_TTL_SECONDS = 3600
+# TTL of a user's index revision; it only has to outlive a rebuild in flight
+INDEX_REVISION_TTL_SECONDS = 3600
+
+# Completes a user's index from a database read, merging into what is there
+# (sessions indexed by logins since). Nothing is written if the index is
+# already complete, or if a revocation bumped the revision since the read:
+# it may have removed a session the read still returned.
+# KEYS: index, revision; ARGV: revision at the read, TTL, field/value pairs
+# starting with the complete field
+INDEX_REBUILD_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+if redis.call('HEXISTS', KEYS[1], ARGV[3]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2], 'NX')
+redis.call('EXPIRE', KEYS[1], ARGV[2], 'GT')
+return 1
+"""
+
+
+def _index_key(user_id: int) -> str:
+    return f"user_sessions:{user_id}"
+
+
+def _index_revision_key(user_id: int) -> str:
+    return f"user_sessions_revision:{user_id}"
+
+
+def _index_entry(session: SessionModel) -> str:
+    return json.dumps(
+        {
+            "id": session.id,
+            "user_agent": session.user_agent,
+            "ip_address": session.ip_address,
+            "created_at": session.created_at.isoformat(),
+            "expires_at": session.expires_at.isoformat(),
+        }
+    )
+
+
+@timed("redis")
+async def _cache_session_async(session: SessionModel, expires_in: int):
+    """Cache a session and add it to its user's index (best effort).
+
+    Redis is optional. One pipelined round trip; the index TTL is raised to
+    cover its longest-lived session (EXPIRE NX/GT, Redis 7+).
+    """
+    index_key = _index_key(session.user_id)
+    session_data = {
+        "user_id": session.user_id,
+        "expires_at": session.expires_at.isoformat(),
+        "is_active": True,
+    }
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            token_key = session.token_hash.hex()
+            pipe.setex(f"session:{token_key}", expires_in, json.dumps(session_data))
+            pipe.hset(index_key, token_key, _index_entry(session))
+            pipe.expire(index_key, expires_in, nx=True)
+            pipe.expire(index_key, expires_in, gt=True)
+            await pipe.execute()
+    except Exception:
+        pass  # Redis is optional
+
+
+@timed("redis")
+async def _uncache_sessions_async(sessions: list[tuple[int, bytes]]):
+    """Remove ``(user_id, token_hash)`` sessions from the caches and index.
+
+    Other workers are told to drop them from their validation caches too.
+    """
+    if not sessions:
+        return
+    tokens = [token_hash.hex() for _, token_hash in sessions]
+    # Again once Redis no longer has them: a validation that read the Redis
+    # entry in between may have cached the session as valid
+    session_validation_cache.invalidate(tokens)
+    tokens_by_user: dict[int, list[str]] = {}
+    for (user_id, _), token in zip(sessions, tokens):
+        tokens_by_user.setdefault(user_id, []).append(token)
+    try:
+        # One round trip; UNLINK frees the values off Redis's main thread
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for start in range(0, len(tokens), UNCACHE_CHUNK_SIZE):
+                chunk = tokens[start : start + UNCACHE_CHUNK_SIZE]
+                pipe.unlink(*(f"session:{token}" for token in chunk))
+                pipe.publish(INVALIDATION_CHANNEL, json.dumps(chunk))
+            for user_id, user_tokens in tokens_by_user.items():
+                # Bumped first: a rebuild running between the two commands
+                # must not write the removed sessions back
+                revision_key = _index_revision_key(user_id)
+                pipe.incr(revision_key)
+                pipe.expire(revision_key, INDEX_REVISION_TTL_SECONDS)
+                pipe.hdel(_index_key(user_id), *user_tokens)
+            await pipe.execute()
+    except Exception:
+        pass
+    session_validation_cache.invalidate(tokens)
+
+
+@timed("redis")
+async def _get_indexed_sessions_async(
+    user_id: int,
+) -> tuple[list[SessionModel] | None, str | None]:
+    """Read a user's active sessions from the index in one call.
+
+    Returns ``(sessions, revision)``. ``sessions`` is ``None`` when the index
+    is missing, incomplete or unreachable; ``revision`` is then what to pass
+    to ``_index_sessions_async`` (``None`` if Redis is unreachable).
+    """
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.hgetall(_index_key(user_id))
+            pipe.get(_index_revision_key(user_id))
+            entries, revision = await pipe.execute()
+    except Exception:
+        return None, None
+    if INDEX_COMPLETE_FIELD.encode() not in entries:
+        return None, revision.decode() if revision is not None else ""
+
+    now = datetime.utcnow()
+    sessions = []
+    for token, entry in entries.items():
+        token = token.decode()
+        if token == INDEX_COMPLETE_FIELD:
+            continue
+        data = json.loads(entry)
+        expires_at = datetime.fromisoformat(data["expires_at"])
+        if expires_at <= now:
+            continue
+        sessions.append(
+            SessionModel(
+                id=data["id"],
+                user_id=user_id,
+                token_hash=bytes.fromhex(token),
+                user_agent=data["user_agent"],
+                ip_address=data["ip_address"],
+                created_at=datetime.fromisoformat(data["created_at"]),
+                expires_at=expires_at,
+                is_active=True,
+            )
+        )
+    sessions.sort(key=lambda session: session.id)
+    return sessions, None
+
+
+@timed("redis")
+async def _index_sessions_async(
+    user_id: int, sessions: list[SessionModel], revision: str | None
+):
+    """Complete a user's index from their active sessions in the database.
+
+    ``revision`` is the index revision read before the database query; see
+    ``INDEX_REBUILD_SCRIPT``.
+    """
+    if revision is None:
+        return  # Redis is unreachable
+    now = datetime.utcnow()
+    ttl = max(
+        [
+            int((session.expires_at - now).total_seconds()) + 1
+            for session in sessions
+            if session.expires_at
+        ],
+        default=EMPTY_INDEX_TTL_SECONDS,
+    )
+    args = [revision, max(ttl, 1), INDEX_COMPLETE_FIELD, "1"]
+    for session in sessions:
+        if session.expires_at:
+            args.extend((session.token_hash.hex(), _index_entry(session)))
+    try:
+        await get_redis().register_script(INDEX_REBUILD_SCRIPT)(
+            keys=[_index_key(user_id), _index_revision_key(user_id)], args=args
+        )
+    except Exception:
+        pass
+
+
+def _run_on_event_loop(func, *args):
+    """Run a best-effort Redis coroutine from a sync (threadpool) caller.
+
+    The shared client belongs to the event loop, so the sync service methods
+    hand their cache calls to it; outside a worker thread of the running
+    loop (e.g. scripts) the cache is skipped and ``None`` returned.
+    """
+    try:
+        return from_thread.run(func, *args)
+    except RuntimeError:
+        return None
+
+
+def _deactivate_statement(criteria: tuple, limit: int | None = None):
+    """``UPDATE sessions SET is_active = false ... RETURNING user_id, token_hash``.
+
+    Covers the active sessions matching ``criteria``, at most ``limit``.
+    """
+    where = (SessionModel.is_active, *criteria)
+    if limit is not None:
+        where = (
+            SessionModel.id.in_(select(SessionModel.id).where(*where).limit(limit)),
+        )
+    return (
+        update(SessionModel)
+        .where(*where)
+        .values(is_active=False)
+        .returning(SessionModel.user_id, SessionModel.token_hash)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _select_active_statement(criteria: tuple, limit: int | None = None):
+    """Ids, users and token hashes of matching active sessions (no RETURNING)."""
+    return (
+        select(SessionModel.id, SessionModel.user_id, SessionModel.token_hash)
+        .where(SessionModel.is_active, *criteria)
+        .limit(limit)
+    )
+
+
+def _deactivate_ids_statement(ids: list[int]):
+    return (
+        update(SessionModel)
+        .where(SessionModel.id.in_(ids))
+        .values(is_active=False)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _deactivate_sessions(
+    db: DBSession, *criteria, limit: int | None = None
+) -> list[tuple[int, bytes]]:
+    """Deactivate matching active sessions set-based.
+
+    Returns their ``(user_id, token_hash)`` pairs.
+    """
+    if db.get_bind().dialect.update_returning:
+        rows = db.execute(_deactivate_statement(criteria, limit)).all()
+    else:
+        # e.g. MySQL: select the rows, then update them by primary key
+        rows = db.execute(_select_active_statement(criteria, limit)).all()
+        if rows:
+            db.execute(_deactivate_ids_statement([row.id for row in rows]))
+    db.commit()
+    return [(row.user_id, row.token_hash) for row in rows]
+
+
+async def _deactivate_sessions_async(
+    db: AsyncSession, *criteria, limit: int | None = None
+) -> list[tuple[int, bytes]]:
+    """Deactivate matching active sessions set-based.
+
+    Returns their ``(user_id, token_hash)`` pairs.
+    """
+    if db.get_bind().dialect.update_returning:
+        rows = (await db.execute(_deactivate_statement(criteria, limit))).all()
+    else:
+        rows = (await db.execute(_select_active_statement(criteria, limit))).all()
+        if rows:
+            await db.execute(_deactivate_ids_statement([row.id for row in rows]))
+    await db.commit()
+    return [(row.user_id, row.token_hash) for row in rows]
 
 
 class SessionService:
@@ -28,27 +315,20 @@ class SessionService:
         expires_at = datetime.utcnow() + timedelta(seconds=expires_in)
         session = SessionModel(
             user_id=getattr(user, "id"),
-            token=token,
+            token_hash=hash_session_token(token),
             user_agent=user_agent,
             ip_address=ip_address,
             expires_at=expires_at,
             is_active=True,
         )
+        # Handed to the client once, never stored
+        session.token = token
         db.add(session)
         db.commit()
         db.refresh(session)
 
         # Cache in Redis for fast lookups
-        try:
-            redis_client = redis.Redis.from_url(REDIS_URL)
-            session_data = {
-                "user_id": getattr(user, "id"),
-                "expires_at": expires_at.isoformat(),
-                "is_active": True,
-            }
-            redis_client.setex(f"session:{token}", expires_in, json.dumps(session_data))
-        except Exception:
-            pass  # Redis is optional
+        _run_on_event_loop(_cache_session_async, session, expires_in)
 
         return session
 
@@ -56,25 +336,28 @@ class SessionService:
     def get_sessions(
         db: DBSession, user_id: int, current_session_token: str | None = None
     ):
-        sessions = (
-            db.query(SessionModel)
-            .filter(
-                SessionModel.user_id == user_id,
-                SessionModel.is_active,
-                SessionModel.expires_at > datetime.utcnow(),
+        # Served from the user's Redis index; the database rebuilds it
+        sessions, revision = _run_on_event_loop(
+            _get_indexed_sessions_async, user_id
+        ) or (None, None)
+        if sessions is None:
+            sessions = (
+                db.query(SessionModel)
+                .filter(
+                    SessionModel.user_id == user_id,
+                    SessionModel.is_active,
+                    SessionModel.expires_at > datetime.utcnow(),
+                )
+                .all()
             )
-            .all()
-        )
+            _run_on_event_loop(_index_sessions_async, user_id, sessions, revision)
 
         # Mark current session if token is provided
         if current_session_token:
+            current_hash = hash_session_token(current_session_token)
             for session in sessions:
                 # Add a temporary attribute to mark current session
-                setattr(
-                    session,
-                    "is_current",
-                    getattr(session, "token") == current_session_token,
-                )
+                setattr(session, "is_current", session.token_hash == current_hash)
 
         return sessions
 
@@ -90,11 +373,9 @@ class SessionService:
             db.commit()
 
             # Remove from Redis
-            try:
-                redis_client = redis.Redis.from_url(REDIS_URL)
-                redis_client.delete(f"session:{getattr(session, 'token')}")
-            except Exception:
-                pass
+            _run_on_event_loop(
+                _uncache_sessions_async, [(session.user_id, session.token_hash)]
+            )
 
             return True
         return False
@@ -103,7 +384,10 @@ class SessionService:
     def delete_session_by_token(db: DBSession, token: str):
         session = (
             db.query(SessionModel)
-            .filter(SessionModel.token == token, SessionModel.is_active)
+            .filter(
+                SessionModel.token_hash == hash_session_token(token),
+                SessionModel.is_active,
+            )
             .first()
         )
         if session:
@@ -111,11 +395,9 @@ class SessionService:
             db.commit()
 
             # Remove from Redis
-            try:
-                redis_client = redis.Redis.from_url(REDIS_URL)
-                redis_client.delete(f"session:{token}")
-            except Exception:
-                pass
+            _run_on_event_loop(
+                _uncache_sessions_async, [(session.user_id, session.token_hash)]
+            )
 
             return True
         return False
@@ -125,7 +407,7 @@ class SessionService:
         return (
             db.query(SessionModel)
             .filter(
-                SessionModel.token == token,
+                SessionModel.token_hash == hash_session_token(token),
                 SessionModel.is_active,
                 SessionModel.expires_at > datetime.utcnow(),
             )
@@ -135,89 +417,175 @@ class SessionService:
     @staticmethod
     def cleanup_expired_sessions(db: DBSession):
         """Clean up expired sessions from database"""
-        expired_sessions = (
-            db.query(SessionModel)
-            .filter(SessionModel.expires_at < datetime.utcnow())
-            .all()
-        )
-
-        for session in expired_sessions:
-            setattr(session, "is_active", False)
-            # Remove from Redis
-            try:
-                redis_client = redis.Redis.from_url(REDIS_URL)
-                redis_client.delete(f"session:{getattr(session, 'token')}")
-            except Exception:
-                pass
-
-        db.commit()
-        return len(expired_sessions)
+        now = datetime.utcnow()
+        cleaned = 0
+        while True:
+            # Batches keep each transaction (and its row locks) short
+            revoked = _deactivate_sessions(
+                db, SessionModel.expires_at < now, limit=CLEANUP_BATCH_SIZE
+            )
+            _run_on_event_loop(_uncache_sessions_async, revoked)
+            cleaned += len(revoked)
+            if len(revoked) < CLEANUP_BATCH_SIZE:
+                return cleaned
 
     @staticmethod
     def delete_all_sessions_except_current(
         db: DBSession, user_id: int, current_session_token: str
     ):
         """Delete all sessions for a user except the current one"""
-        sessions_to_delete = (
-            db.query(SessionModel)
-            .filter(
-                SessionModel.user_id == user_id,
-                SessionModel.is_active,
-                SessionModel.token != current_session_token,
-            )
-            .all()
+        revoked = _deactivate_sessions(
+            db,
+            SessionModel.user_id == user_id,
+            SessionModel.token_hash != hash_session_token(current_session_token),
         )
+        # Remove from Redis
+        _run_on_event_loop(_uncache_sessions_async, revoked)
+        return len(revoked)
 
-        deleted_count = 0
-        redis_client = None
-        try:
-            redis_client = redis.Redis.from_url(REDIS_URL)
-        except Exception:
-            pass
+    @staticmethod
+    def delete_all_user_sessions(db: DBSession, user_id: int):
+        """Delete all sessions for a user"""
+        revoked = _deactivate_sessions(db, SessionModel.user_id == user_id)
+        # Remove from Redis
+        _run_on_event_loop(_uncache_sessions_async, revoked)
+        return len(revoked)
 
-        for session in sessions_to_delete:
-            setattr(session, "is_active", False)
-            deleted_count += 1
+    # Async variants (AsyncSession), used from async endpoints and middleware
 
-            # Remove from Redis
-            if redis_client:
-                try:
-                    redis_client.delete(f"session:{getattr(session, 'token')}")
-                except Exception:
-                    pass
+    @staticmethod
+    async def create_session_async(
+        db: AsyncSession,
+        user: User,
+        user_agent: str,
+        ip_address: str,
+        expires_in: int = 86400,
+    ) -> SessionModel:
+        # Generate cryptographically secure token (64 bytes = 512 bits)
+        token = secrets.token_urlsafe(64)
+        expires_at = datetime.utcnow() + timedelta(seconds=expires_in)
+        session = SessionModel(
+            user_id=getattr(user, "id"),
+            token_hash=hash_session_token(token),
+            user_agent=user_agent,
+            ip_address=ip_address,
+            expires_at=expires_at,
+            is_active=True,
+        )
+        # Handed to the client once, never stored
+        session.token = token
+        db.add(session)
+        await db.commit()
 
-        db.commit()
-        return deleted_count
+        # Cache in Redis for fast lookups
+        await _cache_session_async(session, expires_in)
+
+        return session
 
     @staticmethod
-    def delete_all_user_sessions(db: DBSession, user_id: int):
-        """Delete all sessions for a user"""
-        sessions_to_delete = (
-            db.query(SessionModel)
-            .filter(
-                SessionModel.user_id == user_id,
-                SessionModel.is_active,
+    async def get_sessions_async(
+        db: AsyncSession, user_id: int, current_session_token: str | None = None
+    ):
+        # Served from the user's Redis index; the database rebuilds it
+        sessions, revision = await _get_indexed_sessions_async(user_id)
+        if sessions is None:
+            result = await db.execute(
+                select(SessionModel).where(
+                    SessionModel.user_id == user_id,
+                    SessionModel.is_active,
+                    SessionModel.expires_at > datetime.utcnow(),
+                )
+            )
+            sessions = list(result.scalars().all())
+            await _index_sessions_async(user_id, sessions, revision)
+
+        # Mark current session if token is provided
+        if current_session_token:
+            current_hash = hash_session_token(current_session_token)
+            for session in sessions:
+                setattr(session, "is_current", session.token_hash == current_hash)
+
+        return sessions
+
+    @staticmethod
+    async def get_session_async(db: AsyncSession, session_id: int, user_id: int):
+        result = await db.execute(
+            select(SessionModel).where(
+                SessionModel.id == session_id, SessionModel.user_id == user_id
             )
-            .all()
         )
+        return result.scalars().first()
 
-        deleted_count = 0
-        redis_client = None
-        try:
-            redis_client = redis.Redis.from_url(REDIS_URL)
-        except Exception:
-            pass
+    @staticmethod
+    async def delete_session_async(db: AsyncSession, session_id: int, user_id: int):
+        session = await SessionService.get_session_async(db, session_id, user_id)
+        if session:
+            setattr(session, "is_active", False)
+            await db.commit()
+
+            await _uncache_sessions_async([(session.user_id, session.token_hash)])
+            return True
+        return False
 
-        for session in sessions_to_delete:
+    @staticmethod
+    async def delete_session_by_token_async(db: AsyncSession, token: str):
+        result = await db.execute(
+            select(SessionModel).where(
+                SessionModel.token_hash == hash_session_token(token),
+                SessionModel.is_active,
+            )
+        )
+        session = result.scalars().first()
+        if session:
             setattr(session, "is_active", False)
-            deleted_count += 1
+            await db.commit()
 
-            # Remove from Redis
-            if redis_client:
-                try:
-                    redis_client.delete(f"session:{getattr(session, 'token')}")
-                except Exception:
-                    pass
+            await _uncache_sessions_async([(session.user_id, session.token_hash)])
+            return True
+        return False
 
-        db.commit()
-        return deleted_count
+    @staticmethod
+    async def get_session_by_token_async(db: AsyncSession, token: str):
+        result = await db.execute(
+            select(SessionModel).where(
+                SessionModel.token_hash == hash_session_token(token),
+                SessionModel.is_active,
+                SessionModel.expires_at > datetime.utcnow(),
+            )
+        )
+        return result.scalars().first()
+
+    @staticmethod
+    async def cleanup_expired_sessions_async(db: AsyncSession):
+        """Clean up expired sessions from database"""
+        now = datetime.utcnow()
+        cleaned = 0
+        while True:
+            # Batches keep each transaction (and its row locks) short
+            revoked = await _deactivate_sessions_async(
+                db, SessionModel.expires_at < now, limit=CLEANUP_BATCH_SIZE
+            )
+            await _uncache_sessions_async(revoked)
+            cleaned += len(revoked)
+            if len(revoked) < CLEANUP_BATCH_SIZE:
+                return cleaned
+
+    @staticmethod
+    async def delete_all_sessions_except_current_async(
+        db: AsyncSession, user_id: int, current_session_token: str
+    ):
+        """Delete all sessions for a user except the current one"""
+        revoked = await _deactivate_sessions_async(
+            db,
+            SessionModel.user_id == user_id,
+            SessionModel.token_hash != hash_session_token(current_session_token),
+        )
+        await _uncache_sessions_async(revoked)
+        return len(revoked)
+
+    @staticmethod
+    async def delete_all_user_sessions_async(db: AsyncSession, user_id: int):
+        """Delete all sessions for a user"""
+        revoked = await _deactivate_sessions_async(db, SessionModel.user_id == user_id)
+        await _uncache_sessions_async(revoked)
+        return len(revoked)
@@ -3,27 +3,66 @@ User service for managing user operations with RBAC support.
 """
 
 from typing import Optional, List
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
-from app.core.security import get_password_hash, verify_password
+from app.core.security import (
+    get_password_hash,
+    get_password_hash_async,
+    verify_and_update_password,
+    verify_and_update_password_async,
+    verify_password,
+    verify_password_async,
+)
+from app.core.principal import invalidate_principal
+from app.core.revocation import revoke_user_tokens
 from app.services.role_service import RoleService
 from app.models.role import RoleType
 from datetime import datetime
 
+# User fields carried in access-token claims; changing one revokes the user's
+# outstanding access tokens (see app.core.revocation)
+TOKEN_CLAIM_FIELDS = ("email", "is_active", "is_admin")
+
+
+def _claims_changed(user: User, update_data: dict) -> bool:
+    """Check whether an update touches fields embedded in access tokens."""
+    return "roles" in update_data or any(
+        field in update_data and update_data[field] != getattr(user, field)
+        for field in TOKEN_CLAIM_FIELDS
+    )
+
 
 class UserService:
-    """Service class for user operations with role management."""
+    """Service class for user operations with role management.
+
+    Users are returned with their roles loaded, since role checks and the
+    ``User`` response schema read them: single users join them in (one
+    query), lists load them with one extra ``IN`` query (``selectinload``)
+    instead of one lazy load per user.
+    """
 
     @staticmethod
     def get_by_email(db: Session, email: str) -> Optional[User]:
         """Get user by email."""
-        return db.query(User).filter(User.email == email).first()
+        return (
+            db.query(User)
+            .options(joinedload(User.roles))
+            .filter(User.email == email)
+            .first()
+        )
 
     @staticmethod
     def get_by_id(db: Session, user_id: int) -> Optional[User]:
         """Get user by ID."""
-        return db.query(User).filter(User.id == user_id).first()
+        return (
+            db.query(User)
+            .options(joinedload(User.roles))
+            .filter(User.id == user_id)
+            .first()
+        )
 
     @staticmethod
     def get_by_username(db: Session, username: str) -> Optional[User]:
@@ -33,7 +72,13 @@ class UserService:
     @staticmethod
     def get_all(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
         """Get all users with pagination."""
-        return db.query(User).offset(skip).limit(limit).all()
+        return (
+            db.query(User)
+            .options(selectinload(User.roles))
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
 
     @staticmethod
     def create(db: Session, user_create: UserCreate) -> User:
@@ -98,6 +143,7 @@ class UserService:
             if hasattr(user_update, "model_dump")
             else user_update.dict(exclude_unset=True)
         )
+        claims_changed = _claims_changed(user, update_data)
 
         if "roles" in update_data:
             roles_to_assign = update_data.pop("roles")
@@ -113,6 +159,9 @@ class UserService:
 
         user.updated_at = datetime.now()
         db.commit()
+        invalidate_principal(user.id)
+        if claims_changed:
+            revoke_user_tokens(user.id)
         db.refresh(user)
         return user
 
@@ -123,6 +172,8 @@ class UserService:
         if user:
             db.delete(user)
             db.commit()
+            invalidate_principal(user_id)
+            revoke_user_tokens(user_id)
             return True
         return False
 
@@ -130,9 +181,17 @@ class UserService:
     def authenticate(db: Session, email: str, password: str) -> Optional[User]:
         """Authenticate user and update last login."""
         user = UserService.get_by_email(db, email)
-        if not user or not verify_password(password, user.hashed_password):
+        if not user:
             return None
 
+        valid, new_hash = verify_and_update_password(password, user.hashed_password)
+        if not valid:
+            return None
+
+        # Upgrade hashes made under an older policy while we have the password
+        if new_hash:
+            user.hashed_password = new_hash
+
         # Update last login time
         user.last_logged_in = datetime.now()
         db.commit()
@@ -156,4 +215,185 @@ class UserService:
         user.hashed_password = get_password_hash(new_password)
         user.updated_at = datetime.now()
         db.commit()
+        invalidate_principal(user_id)
+        revoke_user_tokens(user_id)
+        return True
+
+    # Async variants (AsyncSession). Lazy loads are not allowed under asyncio,
+    # so every user returned from here has its roles loaded up front.
+
+    @staticmethod
+    async def get_by_email_async(db: AsyncSession, email: str) -> Optional[User]:
+        """Get user by email."""
+        result = await db.execute(
+            select(User).options(selectinload(User.roles)).where(User.email == email)
+        )
+        return result.scalars().first()
+
+    @staticmethod
+    async def get_by_id_async(db: AsyncSession, user_id: int) -> Optional[User]:
+        """Get user by ID."""
+        result = await db.execute(
+            select(User).options(selectinload(User.roles)).where(User.id == user_id)
+        )
+        return result.scalars().first()
+
+    @staticmethod
+    async def get_by_username_async(
+        db: AsyncSession, username: str
+    ) -> Optional[User]:
+        """Get user by username."""
+        result = await db.execute(
+            select(User)
+            .options(selectinload(User.roles))
+            .where(User.username == username)
+        )
+        return result.scalars().first()
+
+    @staticmethod
+    async def get_all_async(
+        db: AsyncSession, skip: int = 0, limit: int = 100
+    ) -> List[User]:
+        """Get all users with pagination."""
+        result = await db.execute(
+            select(User).options(selectinload(User.roles)).offset(skip).limit(limit)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def create_async(db: AsyncSession, user_create: UserCreate) -> User:
+        """Create a new user with role assignment."""
+        # Check if user already exists
+        if await UserService.get_by_email_async(db, user_create.email):
+            raise ValueError("User with this email already exists")
+
+        if await UserService.get_by_username_async(db, user_create.username):
+            raise ValueError("User with this username already exists")
+
+        # Create new user (hashing is CPU-bound, keep it off the event loop)
+        hashed_password = await get_password_hash_async(user_create.password)
+        db_user = User(
+            email=user_create.email,
+            username=user_create.username,
+            firstname=user_create.firstname,
+            lastname=user_create.lastname,
+            avatar=user_create.avatar,
+            hashed_password=hashed_password,
+            is_active=user_create.is_active,
+            is_admin=user_create.is_admin,
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+            roles=[],
+        )
+
+        db.add(db_user)
+        await db.commit()
+
+        # Assign roles
+        if hasattr(user_create, "roles") and user_create.roles:
+            for role in user_create.roles:
+                await RoleService.assign_role_to_user_async(
+                    db, db_user, role.value if isinstance(role, RoleType) else role
+                )
+        else:
+            # Assign default role
+            await RoleService.assign_default_role_async(db, db_user)
+
+        return db_user
+
+    @staticmethod
+    async def update_async(
+        db: AsyncSession, user_id: int, user_update: UserUpdate
+    ) -> Optional[User]:
+        """Update user with role management."""
+        user = await UserService.get_by_id_async(db, user_id)
+        if not user:
+            return None
+
+        # Check for conflicts with email/username
+        if user_update.email and user_update.email != user.email:
+            if await UserService.get_by_email_async(db, user_update.email):
+                raise ValueError("User with this email already exists")
+
+        if user_update.username and user_update.username != user.username:
+            if await UserService.get_by_username_async(db, user_update.username):
+                raise ValueError("User with this username already exists")
+
+        update_data = user_update.model_dump(exclude_unset=True)
+        claims_changed = _claims_changed(user, update_data)
+
+        if "roles" in update_data:
+            roles_to_assign = update_data.pop("roles")
+            # Clear existing roles and assign new ones
+            user.roles.clear()
+            for role in roles_to_assign:
+                role_name = role.value if isinstance(role, RoleType) else role
+                await RoleService.assign_role_to_user_async(db, user, role_name)
+
+        # Update other fields
+        for field, value in update_data.items():
+            setattr(user, field, value)
+
+        user.updated_at = datetime.now()
+        await db.commit()
+        invalidate_principal(user.id)
+        if claims_changed:
+            revoke_user_tokens(user.id)
+        return user
+
+    @staticmethod
+    async def delete_async(db: AsyncSession, user_id: int) -> bool:
+        """Delete user."""
+        user = await UserService.get_by_id_async(db, user_id)
+        if user:
+            await db.delete(user)
+            await db.commit()
+            invalidate_principal(user_id)
+            revoke_user_tokens(user_id)
+            return True
+        return False
+
+    @staticmethod
+    async def authenticate_async(
+        db: AsyncSession, email: str, password: str
+    ) -> Optional[User]:
+        """Authenticate user and update last login."""
+        user = await UserService.get_by_email_async(db, email)
+        if not user:
+            return None
+
+        valid, new_hash = await verify_and_update_password_async(
+            password, user.hashed_password
+        )
+        if not valid:
+            return None
+
+        # Upgrade hashes made under an older policy while we have the password
+        if new_hash:
+            user.hashed_password = new_hash
+
+        # Update last login time
+        user.last_logged_in = datetime.now()
+        await db.commit()
+        return user
+
+    @staticmethod
+    async def change_password_async(
+        db: AsyncSession, user_id: int, current_password: str, new_password: str
+    ) -> bool:
+        """Change user password after verifying current password."""
+        user = await UserService.get_by_id_async(db, user_id)
+        if not user:
+            return False
+
+        # Verify current password
+        if not await verify_password_async(current_password, user.hashed_password):
+            return False
+
+        # Update password
+        user.hashed_password = await get_password_hash_async(new_password)
+        user.updated_at = datetime.now()
+        await db.commit()
+        invalidate_principal(user_id)
+        revoke_user_tokens(user_id)
         return True
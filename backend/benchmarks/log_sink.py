@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark for request logging.
+
+Measures the time a ``logger.info`` call like the one ``MonitoringMiddleware``
+makes per request spends on the caller's thread, writing into a pipe drained
+by ``cat`` (like a container runtime or log shipper reading stdout):
+
+- the previous setup: stdlib logging with ``JSONRenderer`` and a handler,
+- rendering and writing inline (``LOG_ASYNC=false``),
+- the queue sink (``LOG_ASYNC=true``), where the caller only enqueues; the
+  time until the writer thread has drained everything is shown separately.
+
+Run from the backend directory:
+
+    python -m benchmarks.log_sink
+"""
+
+import logging
+import subprocess
+import time
+
+import structlog
+
+from app.core.log_sink import QueueLogSink, SinkLoggerFactory, get_json_serializer
+
+CALLS = 50_000
+
+COMMON_PROCESSORS = [
+    structlog.processors.add_log_level,
+    structlog.processors.TimeStamper(fmt="iso"),
+    structlog.processors.StackInfoRenderer(),
+    structlog.processors.format_exc_info,
+    structlog.processors.UnicodeDecoder(),
+]
+
+
+def log_requests(logger):
+    for i in range(CALLS):
+        logger.info(
+            "Request completed",
+            method="GET",
+            path=f"/api/v1/users/{i}",
+            status_code=200,
+            duration=0.0042,
+            user_id="42",
+            client_ip="203.0.113.7",
+        )
+
+
+def measure(label: str, logger, drain=None):
+    start = time.perf_counter()
+    log_requests(logger)
+    caller = time.perf_counter() - start
+    line = f"{label:<24} {caller / CALLS * 1e6:7.2f}us/call on caller"
+    if drain is not None:
+        drain()
+        line += f", drained after {(time.perf_counter() - start) * 1e3:,.0f}ms"
+    print(line)
+
+
+def main():
+    reader = subprocess.Popen(["cat"], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+    stream = reader.stdin
+
+    # Previous configuration, with INFO enabled on the stdlib side
+    handler = logging.StreamHandler(open(stream.fileno(), "w", closefd=False))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    structlog.configure(
+        processors=[
+            structlog.stdlib.filter_by_level,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            *COMMON_PROCESSORS[1:],
+            structlog.processors.JSONRenderer(),
+        ],
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=False,
+    )
+    measure("stdlib + JSONRenderer", structlog.get_logger("bench").bind())
+    root.removeHandler(handler)
+
+    for name in ("json", "orjson"):
+        try:
+            serializer = get_json_serializer(name)
+        except RuntimeError:
+            print(f"{name}: not installed, skipped")
+            continue
+
+        structlog.configure(
+            processors=[
+                *COMMON_PROCESSORS,
+                structlog.processors.JSONRenderer(
+                    serializer=lambda event_dict, **kw: serializer(event_dict)
+                ),
+            ],
+            context_class=dict,
+            logger_factory=structlog.BytesLoggerFactory(stream),
+            wrapper_class=structlog.make_filtering_bound_logger(logging.INFO),
+            cache_logger_on_first_use=False,
+        )
+        measure(f"inline {name}", structlog.get_logger().bind())
+
+        sink = QueueLogSink(
+            stream=stream,
+            max_queue=CALLS,
+            serializer=serializer,
+            processors=COMMON_PROCESSORS[-1:],
+        )
+        structlog.configure(
+            processors=COMMON_PROCESSORS[:-1],
+            context_class=dict,
+            logger_factory=SinkLoggerFactory(sink),
+            wrapper_class=structlog.make_filtering_bound_logger(logging.INFO),
+            cache_logger_on_first_use=False,
+        )
+        measure(f"queue sink {name}", structlog.get_logger().bind(), drain=sink.close)
+        print(f"  {sink.stats()}")
+
+    stream.close()
+    reader.wait()
+
+
+if __name__ == "__main__":
+    main()
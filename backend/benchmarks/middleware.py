@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the HTTP middleware stack.
+
+Measures ``GET /status`` requests/sec through the application with its
+pure-ASGI middlewares, and with the monitoring, session validation and
+security header middlewares swapped for ``BaseHTTPMiddleware`` versions
+doing the same work (how they were implemented before).
+
+Run from the backend directory:
+
+    python -m benchmarks.middleware
+"""
+
+import asyncio
+import os
+import time
+
+# Keep the global rate limit out of the way; must be set before app import
+os.environ["DEFAULT_RATE_LIMIT"] = "100000000 per hour"
+
+import httpx
+import structlog
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.monitoring import MonitoringMiddleware, metrics_collector
+from app.core.security_middleware import SECURITY_HEADERS, SecurityHeadersMiddleware
+from app.core.session_middleware import SessionValidationMiddleware
+from app.main import app
+
+REQUESTS = 5_000
+CONCURRENCY = 10
+
+
+class LegacyMonitoringMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        start_time = time.time()
+        metrics_collector.active_connections += 1
+        try:
+            response = await call_next(request)
+            duration = time.time() - start_time
+            metrics_collector.record_request(
+                request.method, request.url.path, response.status_code, duration
+            )
+            response.headers["X-Response-Time"] = str(duration)
+            return response
+        finally:
+            metrics_collector.active_connections -= 1
+
+
+class LegacySessionValidationMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        # /status is neither public nor protected: a plain passthrough
+        return await call_next(request)
+
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        for name, value in SECURITY_HEADERS.items():
+            response.headers[name] = value
+        return response
+
+
+LEGACY_MIDDLEWARES = {
+    MonitoringMiddleware: LegacyMonitoringMiddleware,
+    SessionValidationMiddleware: LegacySessionValidationMiddleware,
+    SecurityHeadersMiddleware: LegacySecurityHeadersMiddleware,
+}
+
+
+def use_middlewares(legacy: bool):
+    """Swap the app's middleware classes and have Starlette rebuild its stack."""
+    for middleware in app.user_middleware:
+        if legacy:
+            middleware.cls = LEGACY_MIDDLEWARES.get(middleware.cls, middleware.cls)
+        else:
+            for current, old in LEGACY_MIDDLEWARES.items():
+                if middleware.cls is old:
+                    middleware.cls = current
+    app.middleware_stack = None
+
+
+async def measure(label: str):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm up (builds the middleware stack and route tables)
+        for _ in range(100):
+            await client.get("/status")
+
+        async def worker(count: int):
+            for _ in range(count):
+                response = await client.get("/status")
+                assert response.status_code == 200, response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(worker(REQUESTS // CONCURRENCY) for _ in range(CONCURRENCY))
+        )
+        elapsed = time.perf_counter() - start
+
+    print(
+        f"{label:<22} {REQUESTS / elapsed:8,.0f} req/s "
+        f"{elapsed / REQUESTS * 1e6:8.1f}us/req"
+    )
+
+
+async def main():
+    # Request logging would dominate the measurement
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(50),
+        cache_logger_on_first_use=False,
+    )
+
+    use_middlewares(legacy=True)
+    await measure("BaseHTTPMiddleware")
+    use_middlewares(legacy=False)
+    await measure("pure ASGI")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
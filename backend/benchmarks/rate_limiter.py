@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the in-memory rate limiter.
+
+Measures per-call ``RateLimiter.is_allowed`` latency with 100k distinct
+client keys, with and without a concurrent cleanup sweep running.
+
+Run from the backend directory:
+
+    python -m benchmarks.rate_limiter
+"""
+
+import asyncio
+import random
+import time
+
+from app.core.custom_rate_limiting import (
+    MemoryRateLimitStorage,
+    RateLimiter,
+    get_rate_limit_algorithm,
+)
+
+DISTINCT_KEYS = 100_000
+CALLS = 300_000
+LIMIT, WINDOW_SECONDS = 1000, 3600
+
+
+def percentile(sorted_samples: list[int], fraction: float) -> float:
+    """Return a percentile of nanosecond samples, in microseconds."""
+    index = min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))
+    return sorted_samples[index] / 1000
+
+
+async def measure(limiter: RateLimiter, keys: list[str]) -> list[int]:
+    """Time ``is_allowed`` for random keys, yielding to the loop periodically."""
+    samples = []
+    for i in range(CALLS):
+        key = random.choice(keys)
+        start = time.perf_counter_ns()
+        await limiter.is_allowed(key, LIMIT, WINDOW_SECONDS)
+        samples.append(time.perf_counter_ns() - start)
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    return sorted(samples)
+
+
+async def sweep_continuously(limiter: RateLimiter, stop: asyncio.Event):
+    while not stop.is_set():
+        await limiter.cleanup_old_entries()
+
+
+def report(label: str, samples: list[int]):
+    print(
+        f"{label:<28} p50={percentile(samples, 0.50):7.2f}us "
+        f"p99={percentile(samples, 0.99):7.2f}us "
+        f"p999={percentile(samples, 0.999):7.2f}us "
+        f"max={samples[-1] / 1000:9.2f}us"
+    )
+
+
+async def main():
+    for algorithm_name in ("gcra", "token_bucket"):
+        algorithm = get_rate_limit_algorithm(algorithm_name)
+        limiter = RateLimiter(
+            algorithm, MemoryRateLimitStorage(algorithm, max_keys=DISTINCT_KEYS * 2)
+        )
+        keys = [
+            f"ip:10.{i >> 16}.{(i >> 8) & 255}.{i & 255}" for i in range(DISTINCT_KEYS)
+        ]
+        for key in keys:
+            await limiter.is_allowed(key, LIMIT, WINDOW_SECONDS)
+
+        print(f"{algorithm_name}: {len(limiter.storage)} keys")
+        report("  is_allowed", await measure(limiter, keys))
+
+        stop = asyncio.Event()
+        sweeper = asyncio.create_task(sweep_continuously(limiter, stop))
+        report("  is_allowed during cleanup", await measure(limiter, keys))
+        stop.set()
+        await sweeper
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
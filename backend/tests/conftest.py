@@ -0,0 +1,53 @@
+"""
+Shared test setup.
+
+Settings are read when ``app`` is imported, so the environment is prepared
+first: the app runs from a temporary directory (its SQLite database and
+``data/`` directory land there, and no local ``.env`` is picked up) with a
+default admin account and an unreachable Redis, which every Redis-backed
+feature treats as unavailable.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(tempfile.mkdtemp(prefix="fastapi-starter-tests-"))
+
+ADMIN_EMAIL = "admin@example.com"
+ADMIN_PASSWORD = "Admin123!"
+
+os.environ.update(
+    {
+        "DATABASE_URL": "sqlite:///./data/test.db",
+        "REDIS_URL": "redis://127.0.0.1:1",
+        "CREATEMIN": "True",
+        "ADMIN_EMAIL": ADMIN_EMAIL,
+        "ADMIN_USERNAME": "admin",
+        "ADMIN_PASSWORD": ADMIN_PASSWORD,
+    }
+)
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Client for the app, started once: shutdown stops shared worker pools."""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    """Authorization headers of the default admin account."""
+    response = client.post(
+        "/api/v1/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+    )
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
@@ -0,0 +1,67 @@
+"""
+Query-count regression test for the users list.
+
+Listing users must issue a fixed number of statements however many users
+(and role assignments) are returned, i.e. roles are eager-loaded rather than
+lazy-loaded one user at a time.
+"""
+
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.db.base import SessionLocal, engine
+from app.models.role import Role, RoleType
+from app.models.user import User
+
+
+def seed_users(count: int, prefix: str):
+    """Add ``count`` users, each with the user role."""
+    with SessionLocal() as db:
+        role = db.query(Role).filter(Role.name == RoleType.USER.value).one()
+        for i in range(count):
+            db.add(
+                User(
+                    email=f"{prefix}{i}@example.com",
+                    username=f"{prefix}{i}",
+                    hashed_password="not-a-real-hash",
+                    roles=[role],
+                )
+            )
+        db.commit()
+
+
+@contextmanager
+def count_statements():
+    """Count statements executed on the database engine."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def list_users_query_count(client, headers) -> tuple[int, int]:
+    # Warm up first, so per-worker caches (sessions, principals) are populated
+    # and only the listing itself is counted
+    assert client.get("/api/v1/users/", headers=headers).status_code == 200
+    with count_statements() as statements:
+        response = client.get("/api/v1/users/", headers=headers)
+    assert response.status_code == 200, response.text
+    return len(response.json()), len(statements)
+
+
+def test_list_users_query_count_is_constant(client, admin_headers):
+    seed_users(3, "few")
+    few_users, few_queries = list_users_query_count(client, admin_headers)
+
+    seed_users(20, "many")
+    many_users, many_queries = list_users_query_count(client, admin_headers)
+
+    assert many_users == few_users + 20
+    assert many_queries == few_queries
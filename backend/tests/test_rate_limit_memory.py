@@ -0,0 +1,44 @@
+"""
+In-memory rate limit storage: expiry sweeps.
+"""
+
+import asyncio
+import time
+
+from app.core.custom_rate_limiting import (
+    MemoryRateLimitStorage,
+    get_rate_limit_algorithm,
+)
+
+
+def test_cleanup_drops_expired_entries_in_batches():
+    async def scenario():
+        storage = MemoryRateLimitStorage(
+            get_rate_limit_algorithm("gcra"), shards=1, sweep_batch_size=3
+        )
+        # More expired entries than one batch, then a live one
+        for i in range(10):
+            await storage.check([(f"short:{i}", 1, 1)])
+        await storage.check([("long", 1, 3600)])
+        time.sleep(1.1)
+
+        await storage.cleanup()
+
+        assert list(storage.shards[0].entries) == ["long"]
+
+    asyncio.run(scenario())
+
+
+def test_cleanup_stops_at_the_first_live_entry():
+    async def scenario():
+        storage = MemoryRateLimitStorage(get_rate_limit_algorithm("gcra"), shards=1)
+        await storage.check([("long", 1, 3600)])
+        await storage.check([("short", 1, 1)])
+        time.sleep(1.1)
+
+        await storage.cleanup()
+
+        # Dropped once the live entry ahead of it expires, or by the key cap
+        assert list(storage.shards[0].entries) == ["long", "short"]
+
+    asyncio.run(scenario())
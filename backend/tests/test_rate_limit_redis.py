@@ -0,0 +1,90 @@
+"""
+Redis rate limit storage, run against fakeredis.
+
+Each algorithm's Lua script is exercised through ``RateLimiter.check_many``,
+as well as the fallback to in-memory state when Redis is unreachable.
+"""
+
+import asyncio
+from typing import Optional
+
+import fakeredis
+import pytest
+
+from app.core.config import settings
+from app.core.custom_rate_limiting import (
+    RATE_LIMIT_ALGORITHMS,
+    RateLimiter,
+    RedisRateLimitStorage,
+    get_rate_limit_algorithm,
+)
+
+
+def create_limiter(
+    client, algorithm_name: Optional[str] = None, retry_interval: float = 30.0
+) -> RateLimiter:
+    algorithm = get_rate_limit_algorithm(algorithm_name)
+    storage = RedisRateLimitStorage(
+        algorithm, client=client, retry_interval=retry_interval
+    )
+    return RateLimiter(algorithm, storage)
+
+
+@pytest.mark.parametrize("algorithm_name", sorted(RATE_LIMIT_ALGORITHMS))
+def test_check_many_runs_lua_script(algorithm_name):
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis()
+        limiter = create_limiter(client, algorithm_name)
+        checks = [("ip", 2, 60), ("endpoint", 5, 60)]
+
+        for _ in range(2):
+            assert await limiter.check_many(checks) == [(True, 0.0), (True, 0.0)]
+
+        (ip_allowed, ip_retry_after), (endpoint_allowed, _) = (
+            await limiter.check_many(checks)
+        )
+        assert not ip_allowed
+        assert 0 < ip_retry_after <= 60
+        assert endpoint_allowed
+
+        # The rejected call consumed nothing: 3 of 5 endpoint requests remain
+        for _ in range(3):
+            assert await limiter.is_allowed("endpoint", 5, 60) == (True, 0.0)
+        allowed, _ = await limiter.is_allowed("endpoint", 5, 60)
+        assert not allowed
+
+        keys = await client.keys(f"ratelimit:{algorithm_name}:*")
+        assert sorted(keys) == [
+            f"ratelimit:{algorithm_name}:endpoint".encode(),
+            f"ratelimit:{algorithm_name}:ip".encode(),
+        ]
+        assert len(limiter.storage.fallback) == 0
+
+    asyncio.run(scenario())
+
+
+def test_falls_back_to_memory_when_redis_is_unreachable():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        server.connected = False
+        client = fakeredis.FakeAsyncRedis(server=server)
+        limiter = create_limiter(client, retry_interval=0)
+        fallback = limiter.storage.fallback
+
+        # The fallback is sized like the configured in-memory storage
+        assert len(fallback.shards) == settings.rate_limit_shards
+        assert fallback.max_keys_per_shard == max(
+            1, settings.rate_limit_max_keys // settings.rate_limit_shards
+        )
+
+        assert await limiter.check_many([("ip", 1, 60)]) == [(True, 0.0)]
+        allowed, retry_after = await limiter.is_allowed("ip", 1, 60)
+        assert not allowed and retry_after > 0
+        assert len(fallback) == 1
+
+        # Once Redis is back (and the retry interval has passed) it is used again
+        server.connected = True
+        assert await limiter.check_many([("ip", 1, 60)]) == [(True, 0.0)]
+        assert await client.keys("ratelimit:*") != []
+
+    asyncio.run(scenario())
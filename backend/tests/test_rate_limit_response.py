@@ -0,0 +1,43 @@
+"""
+Rate limit rejections look the same whichever layer enforces the limit.
+"""
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.custom_rate_limiting import CustomRateLimitMiddleware, rate_limit
+
+
+def rejected_response(app: FastAPI, path: str):
+    with TestClient(app) as client:
+        assert client.get(path).status_code == 200
+        return client.get(path)
+
+
+def test_middleware_and_decorator_send_the_same_429():
+    # Endpoint limits are enforced by the middleware when it is installed...
+    middleware_app = FastAPI()
+    middleware_app.add_middleware(CustomRateLimitMiddleware)
+
+    @middleware_app.get("/limited")
+    @rate_limit("1 per minute")
+    async def limited_by_middleware(request: Request):
+        return {}
+
+    # ...and by the decorator itself otherwise
+    decorator_app = FastAPI()
+
+    @decorator_app.get("/limited")
+    @rate_limit("1 per minute")
+    async def limited_by_decorator(request: Request):
+        return {}
+
+    from_middleware = rejected_response(middleware_app, "/limited")
+    from_decorator = rejected_response(decorator_app, "/limited")
+
+    for response in (from_middleware, from_decorator):
+        assert response.status_code == 429
+        assert response.headers["content-type"] == "application/json"
+        assert int(response.headers["retry-after"]) > 0
+    assert from_middleware.json() == from_decorator.json()
+    assert from_middleware.json()["detail"]["error"] == "Rate limit exceeded"
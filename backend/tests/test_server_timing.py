@@ -0,0 +1,34 @@
+"""
+Server-Timing header: off by default, and never revealing account state.
+"""
+
+from app.core.timing import PRIVATE_PHASES, RequestTimings
+
+
+def test_header_is_off_by_default(client):
+    response = client.post(
+        "/api/v1/auth/login",
+        json={"email": "nobody@example.com", "password": "Wrong123!"},
+    )
+    assert response.status_code == 401
+    assert "server-timing" not in response.headers
+
+
+def test_header_leaves_out_private_phases():
+    timings = RequestTimings()
+    for phase in ("jwt", "user", "db", "db", "hash", "redis", "serialize"):
+        timings.add(phase, 0.001)
+
+    header_phases = [part.split(";")[0] for part in timings.header().split(", ")]
+
+    assert header_phases == ["jwt", "serialize", "total"]
+    assert not PRIVATE_PHASES & set(header_phases)
+    # The metrics still get every phase
+    assert set(timings.durations()) == {
+        "jwt",
+        "user",
+        "db",
+        "hash",
+        "redis",
+        "serialize",
+    }
@@ -0,0 +1,103 @@
+"""
+Per-user session index in Redis, run against fakeredis.
+
+A rebuild from the database must never undo index writes that land between
+its database read and its Redis write.
+"""
+
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+
+import fakeredis
+import pytest
+
+from app.models.session import Session as SessionModel
+from app.services import session_service
+from app.services.session_service import (
+    _cache_session_async,
+    _get_indexed_sessions_async,
+    _index_sessions_async,
+    _uncache_sessions_async,
+)
+
+USER_ID = 7
+
+
+def make_session(session_id: int) -> SessionModel:
+    now = datetime.utcnow()
+    return SessionModel(
+        id=session_id,
+        user_id=USER_ID,
+        token_hash=hashlib.sha256(str(session_id).encode()).digest(),
+        user_agent="pytest",
+        ip_address="127.0.0.1",
+        created_at=now,
+        expires_at=now + timedelta(hours=1),
+        is_active=True,
+    )
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(session_service, "get_redis", lambda: client)
+    return client
+
+
+def indexed_ids(sessions) -> list[int]:
+    return [session.id for session in sessions]
+
+
+def test_rebuild_keeps_sessions_indexed_since_the_database_read(redis_client):
+    async def scenario():
+        first, second = make_session(1), make_session(2)
+        sessions, revision = await _get_indexed_sessions_async(USER_ID)
+        assert sessions is None
+
+        # A login indexes its session after the listing read the database
+        await _cache_session_async(second, 3600)
+        await _index_sessions_async(USER_ID, [first], revision)
+
+        sessions, _ = await _get_indexed_sessions_async(USER_ID)
+        assert indexed_ids(sessions) == [1, 2]
+
+    asyncio.run(scenario())
+
+
+def test_rebuild_is_skipped_after_a_revocation(redis_client):
+    async def scenario():
+        first, second = make_session(1), make_session(2)
+        _, revision = await _get_indexed_sessions_async(USER_ID)
+
+        # The second session is revoked after the listing read the database
+        await _uncache_sessions_async([(USER_ID, second.token_hash)])
+        await _index_sessions_async(USER_ID, [first, second], revision)
+
+        sessions, revision = await _get_indexed_sessions_async(USER_ID)
+        assert sessions is None
+
+        # The next listing reads the database again and completes the index
+        await _index_sessions_async(USER_ID, [first], revision)
+        sessions, _ = await _get_indexed_sessions_async(USER_ID)
+        assert indexed_ids(sessions) == [1]
+
+    asyncio.run(scenario())
+
+
+def test_rebuild_leaves_a_complete_index_alone(redis_client):
+    async def scenario():
+        first, second = make_session(1), make_session(2)
+        _, revision = await _get_indexed_sessions_async(USER_ID)
+        await _index_sessions_async(USER_ID, [first], revision)
+
+        # Even with an up-to-date revision, a complete index is not rewritten
+        await _uncache_sessions_async([(USER_ID, first.token_hash)])
+        revision = await redis_client.get(f"user_sessions_revision:{USER_ID}")
+        await _index_sessions_async(USER_ID, [first, second], revision.decode())
+
+        sessions, _ = await _get_indexed_sessions_async(USER_ID)
+        assert sessions == []
+        assert await redis_client.ttl(f"user_sessions:{USER_ID}") > 0
+
+    asyncio.run(scenario())